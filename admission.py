@@ -0,0 +1,149 @@
+"""Admission control and deadline-aware load shedding for prediction endpoints
+
+Each process scores at most max_in_flight requests at once. Up to max_queue
+more wait for a turn, each no longer than its own deadline; anything beyond
+that is shed at once. A signal that arrives late is worse than none, so a
+request past its deadline is answered with an explicit HOLD and a reason
+instead of being scored.
+
+Callers set a deadline with either header:
+
+    X-Request-Deadline: 1718000000.250    absolute epoch time (s, ms or us)
+    X-Max-Age-Ms: 250                     age limit in milliseconds
+
+Age counts from the X-Request-Start header that proxies such as Heroku's
+router or nginx (t=${msec}) add, so time spent queued in front of the
+worker counts too, or else from when the worker picked the request up.
+PREDICT_DEADLINE_MS applies an age limit to requests that send neither.
+
+The in-flight and queue limits count requests within one process, so they
+only engage where a process serves requests concurrently: gunicorn's gthread
+workers (--threads) or the ASGI app (asgi_app.py). A sync worker handles one
+request at a time and never gets past one in flight; there gunicorn's
+backlog queues requests in front of the workers and only the deadlines
+apply.
+"""
+import math
+import threading
+import time
+
+from market_snapshot import SnapshotError
+
+# Reasons a request is shed, also the labels of trading_ai_shed_total
+SHED_REASONS = ('overloaded', 'deadline_exceeded')
+
+DEADLINE_HEADER = 'X-Request-Deadline'
+MAX_AGE_HEADER = 'X-Max-Age-Ms'
+REQUEST_START_HEADER = 'X-Request-Start'
+
+
+def parse_epoch(value):
+    """Epoch seconds from a header value in seconds, milliseconds or microseconds"""
+    value = value.strip()
+    if value.startswith('t='):
+        value = value[2:]
+    number = float(value)
+    if not math.isfinite(number) or number <= 0:
+        raise ValueError(f"expected a positive epoch time, got {value!r}")
+    while number > 1e11:  # milliseconds or microseconds
+        number /= 1000
+    return number
+
+
+class AdmissionController:
+    """Bounded in-flight requests with a bounded, deadline-aware wait queue"""
+
+    def __init__(self, max_in_flight=64, max_queue=64, default_max_age=0.0, metrics=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.default_max_age = default_max_age  # seconds, 0 for no default deadline
+        self.metrics = metrics
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+
+    def deadline(self, headers, now=None):
+        """Epoch deadline from the request headers, or None; raises SnapshotError on bad headers"""
+        now = time.time() if now is None else now
+        deadline = None
+        value = headers.get(DEADLINE_HEADER)
+        if value:
+            try:
+                deadline = parse_epoch(value)
+            except ValueError:
+                raise SnapshotError(DEADLINE_HEADER, f"expected an epoch time, got {value!r}")
+        value = headers.get(MAX_AGE_HEADER)
+        max_age = self.default_max_age if deadline is None else 0.0
+        if value:
+            try:
+                max_age = float(value) / 1000
+            except ValueError:
+                max_age = -1.0
+            if not max_age > 0 or not math.isfinite(max_age):
+                raise SnapshotError(MAX_AGE_HEADER, f"expected a positive number of milliseconds, got {value!r}")
+        if max_age > 0:
+            origin = now
+            value = headers.get(REQUEST_START_HEADER)
+            if value:
+                try:
+                    origin = min(parse_epoch(value), now)
+                except ValueError:
+                    pass  # a proxy's header is not the caller's fault
+            deadline = origin + max_age if deadline is None else min(deadline, origin + max_age)
+        return deadline
+
+    def _gauges(self):
+        if self.metrics is not None:
+            self.metrics.set_admission(self.in_flight, self.queued)
+
+    def shed(self, reason):
+        """Count a shed request; returns the reason"""
+        if self.metrics is not None:
+            self.metrics.count_shed(SHED_REASONS.index(reason))
+        return reason
+
+    def enter(self, deadline=None, blocking=True):
+        """Take an in-flight slot; returns None when admitted, else the reason to shed
+
+        Waits for a slot until the deadline when blocking; every admitted
+        request must be followed by exit().
+        """
+        now = time.time()
+        if deadline is not None and now >= deadline:
+            return self.shed('deadline_exceeded')
+        if not self.slots.acquire(blocking=False):
+            if not blocking:
+                return self.shed('overloaded')
+            with self.lock:
+                if self.queued >= self.max_queue:
+                    return self.shed('overloaded')
+                self.queued += 1
+                self._gauges()
+            started = time.perf_counter()
+            try:
+                acquired = self.slots.acquire(timeout=None if deadline is None else max(deadline - time.time(), 0))
+            finally:
+                with self.lock:
+                    self.queued -= 1
+                    self._gauges()
+            if self.metrics is not None:
+                self.metrics.observe('queue', time.perf_counter() - started)
+            if not acquired:
+                return self.shed('deadline_exceeded')
+        with self.lock:
+            self.in_flight += 1
+            self._gauges()
+        return None
+
+    def exit(self):
+        """Give back the slot an admitted request held"""
+        with self.lock:
+            self.in_flight -= 1
+            self._gauges()
+        self.slots.release()
+
+    def stats(self):
+        """This process's limits and current depth"""
+        return {'max_in_flight': self.max_in_flight, 'max_queue': self.max_queue,
+                'in_flight': self.in_flight, 'queued': self.queued}
@@ -1,21 +1,170 @@
-from flask import Flask, request, jsonify
+"""Flask API serving the professional trading model's signals
+
+Routes live on the `api` blueprint; create_app() builds the app and the
+models behind it once per process (see gunicorn.conf.py for preloading it
+in the master and asgi_app.py for the async serving mode).
+"""
+# Imported first: time to first prediction counts from when this module starts importing
+from startup import IMPORT_STARTED, StartupTimer
+
+from flask import Blueprint, Flask, Response, make_response, request, jsonify, stream_with_context
 import json
 import os
 import logging
+import time
 from datetime import datetime
-from collections import deque
+from functools import wraps
+from itertools import compress
+from operator import attrgetter
+
+import numpy as np
+
+from admission import AdmissionController
+from audit_log import AuditLog
+from candle_indicators import READY_BARS, CandleEngine, parse_candles
+from decision_cache import DecisionCache, compile_key
+from decision_journal import DecisionJournal
+from indicator_rules import RULE_TABLE, WRITERS_FIELDS
+from market_snapshot import MarketSnapshot, SnapshotError, WritersZoneSnapshot, parse_number
+from metrics import Metrics, metric_count
+from model_registry import ModelRegistry, normalize_symbol
+from online_learner import OnlineLearner
+from option_chain import derive_writers_zone
+from prediction_stream import NDJSON_MIMETYPE, SSE_MIMETYPE, prediction_stream
+from response_format import ResponseEncoder
+from shared_state import AccuracyTracker, SharedAccuracyTracker, SharedSignalHistory, SharedStateFile
+from signal_analytics import WINDOWS, SignalAnalytics, analytics_count
+from signal_history import SignalHistory
+from weight_profiles import DEFAULT_THRESHOLDS, ProfileStore, ShadowScorer
 
-app = Flask(__name__)
+# Routes are registered on the app create_app() builds
+api = Blueprint('api', __name__)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+startup = StartupTimer(IMPORT_STARTED)
+
+# Decision codes used by the batch scoring engine
+SIGNAL_CODES = ('HOLD', 'BUY_CE', 'BUY_PE')
+DECISION_CODES = {signal: code for code, signal in enumerate(SIGNAL_CODES)}
+
+# Number of recent signals kept in the in-memory history
+SIGNAL_HISTORY_CAPACITY = int(os.environ.get('SIGNAL_HISTORY_CAPACITY', 1000))
+
+# Largest page of signal history /get_stats?history= returns
+STATS_HISTORY_PAGE_MAX = int(os.environ.get('STATS_HISTORY_PAGE_MAX', 500))
+
+# Memory-mapped file that gunicorn workers share for accuracy counters and
+# signal history; unset keeps both per process (e.g. the dev server)
+SHARED_STATE_FILE = os.environ.get('SHARED_STATE_FILE')
+SHARED_STATE_SLOTS = int(os.environ.get('SHARED_STATE_SLOTS', 16))  # max concurrent workers
+
+# Directory of the durable decision journal that restores state on restart;
+# unset disables journaling
+DECISION_JOURNAL_DIR = os.environ.get('DECISION_JOURNAL_DIR')
+DECISION_JOURNAL_FLUSH_INTERVAL = float(os.environ.get('DECISION_JOURNAL_FLUSH_INTERVAL', 1.0))  # seconds
+DECISION_JOURNAL_SNAPSHOT_INTERVAL = float(os.environ.get('DECISION_JOURNAL_SNAPSHOT_INTERVAL', 300.0))  # seconds
+
+# Online learning of pattern_weights from outcomes posted with a prediction_id;
+# off unless ONLINE_LEARNING=1
+ONLINE_LEARNING = os.environ.get('ONLINE_LEARNING', '0') == '1'
+LEARNING_RATE = float(os.environ.get('LEARNING_RATE', 0.01))
+LEARNING_INTERVAL = float(os.environ.get('LEARNING_INTERVAL', 5.0))  # seconds between updates
+LEARNED_WEIGHT_LIMIT = 2.0  # learned weights are clipped to +/- this
+
+# Symbols whose rolling candle indicator state /predict_candles keeps in memory;
+# with SHARED_STATE_FILE the state is shared by all workers through files in
+# CANDLE_STATE_DIR, otherwise it is per worker and only correct with one worker
+CANDLE_STATE_DIR = f"{SHARED_STATE_FILE}.candles" if SHARED_STATE_FILE else None
+CANDLE_MAX_SYMBOLS = int(os.environ.get('CANDLE_MAX_SYMBOLS', 256))
+
+# Longest NDJSON line /predict_stream accepts; longer lines get an error record
+STREAM_MAX_LINE_BYTES = int(os.environ.get('STREAM_MAX_LINE_BYTES', 1 << 20))
+
+# Per-symbol model shards: payloads naming a symbol get their own weights,
+# history and stats; a multi-symbol batch is scored on this many threads
+MODEL_MAX_SYMBOLS = int(os.environ.get('MODEL_MAX_SYMBOLS', 32))
+MODEL_SHARD_WORKERS = int(os.environ.get('MODEL_SHARD_WORKERS', 4))
+
+# Versioned pattern_weights/threshold profiles (see weight_profiles.py), re-read
+# when the file changes; unset keeps the built-in weights and thresholds
+WEIGHT_PROFILES_FILE = os.environ.get('WEIGHT_PROFILES_FILE')
+WEIGHT_PROFILES_RELOAD_INTERVAL = float(os.environ.get('WEIGHT_PROFILES_RELOAD_INTERVAL', 5.0))  # seconds
+SHADOW_SCORING_INTERVAL = float(os.environ.get('SHADOW_SCORING_INTERVAL', 1.0))  # seconds
+
+# Negotiated responses (JSON, compact JSON, MessagePack) of at least this many
+# bytes are gzipped for clients that accept it; 0 disables compression
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES', 1024))
+
+# Admission control per worker: prediction requests scored at once, requests
+# waiting beyond those, and the age limit for requests without a deadline header
+PREDICT_MAX_IN_FLIGHT = int(os.environ.get('PREDICT_MAX_IN_FLIGHT', 64))
+PREDICT_MAX_QUEUE = int(os.environ.get('PREDICT_MAX_QUEUE', 64))
+PREDICT_DEADLINE_MS = float(os.environ.get('PREDICT_DEADLINE_MS', 0))  # 0 for no default deadline
+
+# Structured audit log of every decision (see audit_log.py); unset disables it
+AUDIT_LOG_DIR = os.environ.get('AUDIT_LOG_DIR')
+AUDIT_LOG_MAX_PENDING = int(os.environ.get('AUDIT_LOG_MAX_PENDING', 10000))  # records buffered per worker
+AUDIT_LOG_DROP_POLICY = os.environ.get('AUDIT_LOG_DROP_POLICY', 'oldest')  # oldest, newest or block
+AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 1.0))  # seconds
+AUDIT_LOG_ROTATE_BYTES = int(os.environ.get('AUDIT_LOG_ROTATE_BYTES', 64 << 20))  # compressed
+AUDIT_LOG_ROTATE_SECONDS = float(os.environ.get('AUDIT_LOG_ROTATE_SECONDS', 3600.0))
+
+# Cache of decisions keyed on the discretized snapshot; a size of 0 disables it
+DECISION_CACHE_SIZE = int(os.environ.get('DECISION_CACHE_SIZE', 4096))
+DECISION_CACHE_TTL = float(os.environ.get('DECISION_CACHE_TTL', 300.0))  # seconds
+
+# Comparisons make_professional_decision, determine_vix_condition and
+# determine_market_regime make on snapshot fields; the decision cache key is
+# built from these, the active profile's max_vix and the rule conditions, so
+# keep them in step
+DECISION_PREDICATES = (
+    ('vix', '>', 18), ('vix', '>', 20), ('vix', '>', 25), ('vix', '<', 12),
+    ('rsi', '<', 60), ('rsi', '<', 65), ('rsi', '<', 70),
+    ('rsi', '>', 30), ('rsi', '>', 35), ('rsi', '>', 40),
+    ('supertrend_status', '==', 'Bullish'), ('supertrend_status', '==', 'Bearish'),
+    ('aroon_status', '==', 'Uptrend'), ('aroon_status', '==', 'Downtrend'),
+    ('price_action', '==', 'Ranging'),
+    ('writers_zone', '==', 'BULLISH'), ('writers_zone', '==', 'BEARISH'),
+    ('writers_confidence', '>', 0.5),
+)
 
 class ProfessionalTradingAI:
-    def __init__(self):
+    def __init__(self, symbol=None, metrics=None, audit=None, offline=False):
+        """offline=True builds a scoring-only engine (backtest, optimizer) whatever the environment sets"""
+        self.symbol = symbol
+        self.audit = audit
+        self.rules = RULE_TABLE
+        self.thresholds = DEFAULT_THRESHOLDS
+        self.decision_cache = None
+        if DECISION_CACHE_SIZE > 0:
+            self.decision_cache = DecisionCache(DECISION_CACHE_SIZE, DECISION_CACHE_TTL)
+            self.decision_key = compile_key(self.rules, DECISION_PREDICATES)
+        self.profile = None  # active weight profile, None for the built-in weights
+        self.profiles = None
+        self.shadow = None
+        self.shared = None
+        self.weights_version = 0  # version of the shared weights last adopted
+        if SHARED_STATE_FILE and not offline:
+            # A symbol shard keeps its state in a file of its own; /metrics lives in the default one
+            self.shared = SharedStateFile(f"{SHARED_STATE_FILE}.{symbol}" if symbol else SHARED_STATE_FILE,
+                                          SHARED_STATE_SLOTS, SIGNAL_HISTORY_CAPACITY,
+                                          len(self.rules.weight_names),
+                                          0 if metrics else metric_count(self.rules.signal_names, SIGNAL_CODES),
+                                          analytics_count(self.rules.signal_names, SIGNAL_CODES,
+                                                          SIGNAL_HISTORY_CAPACITY))
+            signals = SharedSignalHistory(self.shared, SIGNAL_CODES, self.rules.signal_names)
+            accuracy_tracker = SharedAccuracyTracker(self.shared)
+            fresh_state = self.shared.created  # other workers already restored it
+        else:
+            signals = SignalHistory(SIGNAL_HISTORY_CAPACITY, SIGNAL_CODES, self.rules.signal_names)
+            accuracy_tracker = AccuracyTracker()
+            fresh_state = True
+        self.metrics = metrics or Metrics(self.rules.signal_names, SIGNAL_CODES, self.shared)
+        self.analytics = SignalAnalytics(self.rules.signal_names, SIGNAL_CODES, SIGNAL_HISTORY_CAPACITY,
+                                         self.shared)
         self.model_data = {
-            'signals': deque(maxlen=1000),  # Store last 1000 signals for learning
-            'accuracy_tracker': {'correct': 0, 'total': 0},
+            'signals': signals,  # Recent signals for learning
+            'accuracy_tracker': accuracy_tracker,
             'pattern_weights': {
                 # Technical Indicators
                 'rsi_neutral': 0.5,
@@ -70,330 +219,570 @@ class ProfessionalTradingAI:
                 'market_structure_bearish': 0.3
             }
         }
-        logger.info("Professional Trading AI initialized")
-    
-    def analyze_technical_indicators(self, data):
-        """Analyze comprehensive technical indicators"""
-        signals = []
-        strength = 0
-        
-        # RSI Analysis
-        rsi_value = float(data.get('RSI', {}).get('rsi', 50))
-        rsi_status = data.get('RSI', {}).get('status', 'Neutral')
-        
-        if rsi_value < 30:
-            signals.append("RSI_OVERSOLD")
-            strength += self.model_data['pattern_weights']['rsi_oversold']
-        elif rsi_value > 70:
-            signals.append("RSI_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['rsi_overbought']
-        elif rsi_status == 'Neutral':
-            signals.append("RSI_NEUTRAL")
-            strength += self.model_data['pattern_weights']['rsi_neutral']
-        
-        # EMA Analysis
-        ema_status = data.get('EMA20', {}).get('status', 'Neutral')
-        if ema_status == 'Bearish':
-            signals.append("EMA_BEARISH")
-            strength -= self.model_data['pattern_weights']['ema_bearish']
-        elif ema_status == 'Bullish':
-            signals.append("EMA_BULLISH")
-            strength += self.model_data['pattern_weights']['ema_bullish']
+        self.default_pattern_weights = self.model_data['pattern_weights']
+        self.refresh_signal_weights()
+        self.sync_weights()
         
-        # SMA Analysis
-        sma_status = data.get('SMA50', {}).get('status', 'Neutral')
-        if sma_status == 'Bearish':
-            signals.append("SMA_BEARISH")
-            strength -= self.model_data['pattern_weights']['sma_bearish']
-        elif sma_status == 'Bullish':
-            signals.append("SMA_BULLISH")
-            strength += self.model_data['pattern_weights']['sma_bullish']
+        if WEIGHT_PROFILES_FILE and not offline:
+            self.profiles = ProfileStore(WEIGHT_PROFILES_FILE, self.default_pattern_weights, symbol,
+                                         WEIGHT_PROFILES_RELOAD_INTERVAL)
+            self.shadow = ShadowScorer(self.rules, self.batch_decisions, SIGNAL_CODES, SHADOW_SCORING_INTERVAL)
+            self.apply_profiles(*self.profiles.load())
+
+        self.learner = None
+        if ONLINE_LEARNING and not offline:
+            self.learner = OnlineLearner(self.rules, self.apply_weight_delta, LEARNING_RATE, LEARNING_INTERVAL)
+
+        self.journal = None
+        if DECISION_JOURNAL_DIR and not offline:
+            directory = os.path.join(DECISION_JOURNAL_DIR, 'symbols', symbol) if symbol else DECISION_JOURNAL_DIR
+            self.journal = DecisionJournal(directory, DECISION_JOURNAL_FLUSH_INTERVAL,
+                                           DECISION_JOURNAL_SNAPSHOT_INTERVAL)
+            if fresh_state:
+                self.restore_from_journal()
+        logger.info(f"Professional Trading AI initialized{f' for {symbol}' if symbol else ''}")
+    
+    def refresh_signal_weights(self):
+        """Recompile pattern_weights into the per-signal weight vector used for scoring"""
+        self.signal_weights = self.rules.signed_weights(self.model_data['pattern_weights'])
+        if self.decision_cache is not None:
+            self.decision_cache.clear()  # cached decisions were scored with the old weights
+    
+    def set_pattern_weights(self, values):
+        """Swap in new values for the named weights; the old dict is never mutated"""
+        unknown = set(values) - set(self.model_data['pattern_weights'])
+        if unknown:
+            raise ValueError(f"Unknown pattern_weights {', '.join(sorted(unknown))}")
+        self.model_data['pattern_weights'] = {**self.model_data['pattern_weights'], **values}
+        self.refresh_signal_weights()
+    
+    def sync_weights(self):
+        """Adopt a changed weight profile and pattern weights published by other workers"""
+        if self.profiles is not None:
+            profiles = self.profiles.poll()
+            if profiles is not None:
+                self.apply_profiles(*profiles)
+        self.adopt_shared_weights()
+    
+    def after_fork(self):
+        """Claim a forked worker's shared state slot up front rather than on its first prediction"""
+        if self.shared is not None:
+            self.shared.own_slot()
+    
+    def adopt_shared_weights(self):
+        """Adopt pattern weights another worker published to the shared state file"""
+        if self.shared is not None and self.shared.weights_version[0] != self.weights_version:
+            version, weights = self.shared.read_weights()
+            self.set_pattern_weights(dict(zip(self.rules.weight_names, weights.tolist())))
+            self.weights_version = version
+    
+    def apply_weight_delta(self, delta):
+        """Add a learned update to the pattern weights and publish it"""
+        names = self.rules.weight_names
         
-        # MACD Analysis
-        macd_status = data.get('MACD', {}).get('status', 'Neutral')
-        macd_histogram = float(data.get('MACD', {}).get('histogram', 0))
+        def updated(current):
+            if current is None:
+                current = np.array([self.model_data['pattern_weights'][name] for name in names])
+            return np.clip(current + delta, -LEARNED_WEIGHT_LIMIT, LEARNED_WEIGHT_LIMIT)
         
-        if macd_status == 'Bullish':
-            signals.append("MACD_BULLISH")
-            strength += self.model_data['pattern_weights']['macd_bullish']
-        elif macd_status == 'Bearish':
-            signals.append("MACD_BEARISH")
-            strength -= self.model_data['pattern_weights']['macd_bearish']
+        if self.shared is not None:
+            self.shared.publish_weights(updated)
+            self.adopt_shared_weights()
         else:
-            signals.append("MACD_NEUTRAL")
-            strength += self.model_data['pattern_weights']['macd_neutral']
-        
-        # VIX Analysis
-        vix_value = float(data.get('VIX', {}).get('vix', 15))
-        vix_status = data.get('VIX', {}).get('status', 'Normal')
-        
-        if vix_status == 'Calm Market':
-            signals.append("VIX_CALM")
-            strength += self.model_data['pattern_weights']['vix_calm']
-        elif vix_value > 18:
-            signals.append("VIX_HIGH")
-            strength += self.model_data['pattern_weights']['vix_high']
-        
-        # Bollinger Bands Analysis
-        bb_status = data.get('BollingerBands', {}).get('status', 'Within Bands')
-        if bb_status == 'Within Bands':
-            signals.append("BOLLINGER_WITHIN")
-            strength += self.model_data['pattern_weights']['bollinger_within']
-        elif bb_status == 'Above Upper' or bb_status == 'Overbought':
-            signals.append("BOLLINGER_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['bollinger_overbought']
-        elif bb_status == 'Below Lower' or bb_status == 'Oversold':
-            signals.append("BOLLINGER_OVERSOLD")
-            strength += self.model_data['pattern_weights']['bollinger_oversold']
-        
-        # CCI Analysis
-        cci_value = float(data.get('CCI', {}).get('value', 0))
-        cci_status = data.get('CCI', {}).get('status', 'Neutral')
-        
-        if cci_status == 'Sell':
-            signals.append("CCI_SELL")
-            strength += self.model_data['pattern_weights']['cci_sell']
-        elif cci_status == 'Buy':
-            signals.append("CCI_BUY")
-            strength += self.model_data['pattern_weights']['cci_buy']
-        
-        # SuperTrend Analysis
-        supertrend_status = data.get('SuperTrend', {}).get('status', 'Neutral')
-        if supertrend_status == 'Bullish':
-            signals.append("SUPERTREND_BULLISH")
-            strength += self.model_data['pattern_weights']['supertrend_bullish']
-        elif supertrend_status == 'Bearish':
-            signals.append("SUPERTREND_BEARISH")
-            strength -= self.model_data['pattern_weights']['supertrend_bearish']
-        
-        # Volume Indicators Analysis
-        volume_status = data.get('VolumeIndicators', {}).get('status', 'Normal')
-        if volume_status == 'Weak':
-            signals.append("VOLUME_WEAK")
-            strength += self.model_data['pattern_weights']['volume_weak']
-        elif volume_status == 'Strong':
-            signals.append("VOLUME_STRONG")
-            strength += self.model_data['pattern_weights']['volume_strong']
-        
-        # Volume Strength Analysis
-        volume_strength = data.get('VolumeStrength', {}).get('type', 'Normal')
-        if volume_strength == 'Weak Volume':
-            signals.append("VOLUME_STRENGTH_WEAK")
-            strength += self.model_data['pattern_weights']['volume_strength_weak']
-        elif volume_strength == 'Strong Volume':
-            signals.append("VOLUME_STRENGTH_STRONG")
-            strength += self.model_data['pattern_weights']['volume_strength_strong']
-        
-        # Aroon Analysis
-        aroon_status = data.get('Aroon', {}).get('status', 'Neutral')
-        if aroon_status == 'Uptrend':
-            signals.append("AROON_UPTREND")
-            strength += self.model_data['pattern_weights']['aroon_uptrend']
-        elif aroon_status == 'Downtrend':
-            signals.append("AROON_DOWNTREND")
-            strength -= self.model_data['pattern_weights']['aroon_downtrend']
-        
-        # Parabolic SAR Analysis
-        psar_status = data.get('ParabolicSAR', {}).get('status', 'Neutral')
-        if psar_status == 'Bearish':
-            signals.append("PARABOLIC_BEARISH")
-            strength -= self.model_data['pattern_weights']['parabolic_bearish']
-        elif psar_status == 'Bullish':
-            signals.append("PARABOLIC_BULLISH")
-            strength += self.model_data['pattern_weights']['parabolic_bullish']
-        
-        # MFI Analysis
-        mfi_value = float(data.get('MFI', {}).get('value', 50))
-        mfi_status = data.get('MFI', {}).get('status', 'Neutral')
-        
-        if mfi_status == 'Oversold':
-            signals.append("MFI_OVERSOLD")
-            strength += self.model_data['pattern_weights']['mfi_oversold']
-        elif mfi_status == 'Overbought':
-            signals.append("MFI_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['mfi_overbought']
-        
-        # Price Action Analysis
-        price_action = data.get('PriceAction', {}).get('type', 'Normal')
-        if price_action == 'Ranging':
-            signals.append("PRICE_RANGING")
-            strength += self.model_data['pattern_weights']['price_ranging']
-        elif price_action == 'Trending':
-            signals.append("PRICE_TRENDING")
-            strength += self.model_data['pattern_weights']['price_trending']
-        
-        # ATR Analysis
-        atr_value = float(data.get('ATR', {}).get('value', 20))
-        if atr_value > 25:
-            signals.append("ATR_HIGH")
-            strength += self.model_data['pattern_weights']['atr_high']
-        elif atr_value < 15:
-            signals.append("ATR_LOW")
-            strength += self.model_data['pattern_weights']['atr_low']
-        
-        # ADX Analysis
-        adx_value = float(data.get('ADX', {}).get('value', 20))
-        if adx_value > 25:
-            signals.append("ADX_STRONG_TREND")
-            strength += self.model_data['pattern_weights']['adx_strong_trend']
-        
-        # Stochastic Analysis
-        stoch_value = float(data.get('Stochastic', {}).get('value', 50))
-        stoch_status = data.get('Stochastic', {}).get('status', 'Neutral')
-        if stoch_value < 20:
-            signals.append("STOCHASTIC_OVERSOLD")
-            strength += self.model_data['pattern_weights']['stochastic_oversold']
-        elif stoch_value > 80:
-            signals.append("STOCHASTIC_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['stochastic_overbought']
-        
-        return signals, strength
+            self.set_pattern_weights(dict(zip(names, updated(None).tolist())))
     
-    def analyze_writers_zone(self, writers_data):
-        """Analyze Writers Zone Analysis data"""
-        signals = []
-        strength = 0
+    def apply_profiles(self, active, shadows):
+        """Switch to a weight profile's weights and thresholds and score shadows next to it
         
-        # Extract writers zone data
-        writers_zone = writers_data.get('writersZone', 'NEUTRAL')
-        writers_confidence = float(writers_data.get('confidence', 0))
-        put_call_ratio = float(writers_data.get('putCallPremiumRatio', 1))
-        market_structure = writers_data.get('marketStructure', 'BALANCED')
-        max_ce_ltp = float(writers_data.get('maxCELTP', 0))
-        max_pe_ltp = float(writers_data.get('maxPELTP', 0))
-        support_levels = writers_data.get('supportLevels', [])
-        resistance_levels = writers_data.get('resistanceLevels', [])
-        
-        # Writers Zone Direction Analysis
-        if writers_zone == 'BULLISH' and writers_confidence > 0.3:
-            signals.append("WRITERS_BULLISH")
-            strength += self.model_data['pattern_weights']['writers_bullish'] * writers_confidence
-        elif writers_zone == 'BEARISH' and writers_confidence > 0.3:
-            signals.append("WRITERS_BEARISH")
-            strength -= self.model_data['pattern_weights']['writers_bearish'] * writers_confidence
+        Weights are only reset when the active profile's content changed, so
+        weights learned on top of it survive a reload or a worker restart.
+        """
+        self.thresholds = active.thresholds
+        if self.decision_cache is not None:
+            self.decision_key = compile_key(self.rules,
+                                            DECISION_PREDICATES + (('vix', '>', active.thresholds['max_vix']),))
+        if self.shared is not None:
+            if int(self.shared.weights_tag[0]) != active.tag:
+                names = self.rules.weight_names
+                self.shared.publish_weights(lambda current: [active.pattern_weights[name] for name in names],
+                                            active.tag)
+            self.adopt_shared_weights()
+            self.refresh_signal_weights()
+        elif self.profile is None or self.profile.tag != active.tag:
+            self.set_pattern_weights(active.pattern_weights)
         else:
-            signals.append("WRITERS_NEUTRAL")
-            strength += self.model_data['pattern_weights']['writers_neutral']
-        
-        # Put-Call Premium Ratio Analysis
-        if put_call_ratio > 1.2:
-            signals.append("PREMIUM_RATIO_PUT_HEAVY")
-            strength -= self.model_data['pattern_weights']['premium_ratio_put_heavy']
-        elif put_call_ratio < 0.8:
-            signals.append("PREMIUM_RATIO_CALL_HEAVY")
-            strength += self.model_data['pattern_weights']['premium_ratio_call_heavy']
+            self.refresh_signal_weights()  # thresholds behind cached decisions may differ
+        self.profile = active
+        self.shadow.set_profiles(shadows)
+        logger.info(f"Weight profile {active.name} active"
+                    f"{f' for {self.symbol}' if self.symbol else ''}, shadows: "
+                    f"{', '.join(profile.name for profile in shadows) or 'none'}")
+    
+    def analyze_technical_indicators(self, market):
+        """Analyze comprehensive technical indicators"""
+        fired, strength = self.rules.evaluate_technical(market, self.signal_weights)
+        return [self.rules.signal_names[code] for code in fired], strength
+    
+    def analyze_writers_zone(self, writers):
+        """Analyze Writers Zone Analysis data"""
+        fired, strength = self.rules.evaluate_writers(writers, self.signal_weights)
+        return [self.rules.signal_names[code] for code in fired], strength
+    
+    def split_payload(self, request_data):
+        """Split a request payload into technical and writers zone data"""
+        # Handle both single object and array formats
+        if isinstance(request_data, list) and len(request_data) > 0:
+            technical_data = request_data[0]
         else:
-            signals.append("PREMIUM_RATIO_BALANCED")
-            strength += self.model_data['pattern_weights']['premium_ratio_balanced']
+            technical_data = request_data
         
-        # Market Structure Analysis
-        if market_structure == 'CALL_PREMIUM_HIGH':
-            signals.append("MARKET_STRUCTURE_BULLISH")
-            strength += self.model_data['pattern_weights']['market_structure_bullish']
-        elif market_structure == 'PUT_PREMIUM_HIGH':
-            signals.append("MARKET_STRUCTURE_BEARISH")
-            strength -= self.model_data['pattern_weights']['market_structure_bearish']
+        # Check if writers zone data is provided separately or within technical data
+        writers_data = request_data.get('writersZone', {}) if isinstance(request_data, dict) else {}
         
-        # Premium Analysis
-        if max_ce_ltp > max_pe_ltp and max_ce_ltp > 10:
-            signals.append("HIGH_CE_PREMIUM")
-            strength += self.model_data['pattern_weights']['high_ce_premium']
-        elif max_pe_ltp > max_ce_ltp and max_pe_ltp > 10:
-            signals.append("HIGH_PE_PREMIUM")
-            strength -= self.model_data['pattern_weights']['high_pe_premium']
+        # If writers zone data is in a separate object, extract it
+        if isinstance(technical_data, dict) and 'writersZone' in technical_data:
+            writers_data = technical_data
         
-        # Support and Resistance Analysis
-        if len(support_levels) >= 2:
-            signals.append("STRONG_SUPPORT")
-            strength += self.model_data['pattern_weights']['strong_support']
+        # A raw option chain is reduced to writers zone fields; explicit fields still win
+        if isinstance(technical_data, dict) and 'optionChain' in technical_data:
+            derived = derive_writers_zone(technical_data['optionChain'], technical_data.get('LTP'))
+            writers_data = {**derived, **writers_data} if isinstance(writers_data, dict) else derived
         
-        if len(resistance_levels) >= 2:
-            signals.append("STRONG_RESISTANCE")
-            strength -= self.model_data['pattern_weights']['strong_resistance']
-        
-        return signals, strength
+        return technical_data, writers_data
+    
+    def parse_snapshot(self, request_data):
+        """Parse and validate a payload once; raises SnapshotError on malformed input"""
+        technical_data, writers_data = self.split_payload(request_data)
+        return MarketSnapshot.parse(technical_data), WritersZoneSnapshot.parse(writers_data)
+    
+    def restore_from_journal(self):
+        """Rebuild signal history and accuracy counts from the decision journal"""
+        records, correct, total = self.journal.replay(SIGNAL_HISTORY_CAPACITY)
+        if len(records):
+            # Workers flush their journal batches in turn; the ring is read back in time order
+            records = records[np.argsort(records['timestamp'], kind='stable')]
+            location = self.model_data['signals'].extend(**{name: records[name] for name in records.dtype.names})
+            # The journal keeps no market regime, so restored predictions count under none
+            codes = np.arange(len(self.rules.signal_names), dtype=np.uint64)
+            fired = (records['signal_mask'][:, None] >> codes & np.uint64(1)).astype(bool)
+            self.analytics.record_batch(records['timestamp'], location, records['signal'].astype(np.int64),
+                                        records['confidence'], fired, None,
+                                        self.batch_vix_conditions(records['vix']))
+        self.model_data['accuracy_tracker'].restore(correct, total)
+        self.analytics.restore_outcomes(correct, total)
+        logger.info(f"Restored {len(records)} signals and {total} outcomes from journal")
+
+    def prediction_id(self, location, timestamp):
+        """Opaque prediction ID: history location plus the record's timestamp, after the shard's symbol"""
+        prediction_id = f"{location:x}-{int(timestamp * 1e6):x}"
+        return f"{self.symbol}:{prediction_id}" if self.symbol else prediction_id
+    
+    def locate(self, prediction_id):
+        """History location and timestamp (in microseconds) encoded in a prediction ID"""
+        location, stamp = (int(part, 16) for part in prediction_id.rsplit(':', 1)[-1].split('-'))
+        return location, stamp
+    
+    def find_prediction(self, prediction_id):
+        """Return the history record behind a prediction ID, or None if unknown or aged out"""
+        try:
+            location, stamp = self.locate(prediction_id)
+        except (AttributeError, ValueError):
+            return None
+        record = self.model_data['signals'].record_at(location)
+        # The timestamp check rejects IDs whose ring slot has been reused
+        if record is None or int(record['timestamp'] * 1e6) != stamp:
+            return None
+        return record
+    
+    def record_signal(self, signal, confidence, all_signals, strength, market, writers,
+                      market_regime, vix_condition):
+        """Store a generated signal for learning and analytics; returns its prediction ID"""
+        history = self.model_data['signals']
+        record = (time.time(), DECISION_CODES[signal], confidence, strength,
+                  history.signal_mask(all_signals), market.ltp, market.vix,
+                  market.rsi, writers.writers_confidence)
+        location = history.append(*record)
+        self.analytics.record(record[0], location, record[1], confidence, record[4], market_regime,
+                              vix_condition)
+        if self.journal is not None:
+            self.journal.record_decision(record)
+        return self.prediction_id(location, record[0])
+
+    def record_outcome(self, correct, prediction_id=None):
+        """Count a reported trade outcome and queue it for learning
+
+        Returns True when prediction_id matched a stored prediction.
+        """
+        self.model_data['accuracy_tracker'].record(correct)
+        if self.journal is not None:
+            self.journal.record_outcome(correct)
+        record = None if prediction_id is None else self.find_prediction(prediction_id)
+        self.analytics.record_outcome(time.time(), correct,
+                                      None if record is None else self.locate(prediction_id)[0])
+        if record is None:
+            return False
+        if self.learner is not None:
+            self.learner.submit(record, correct)
+        return True
     
     def professional_signal_generation(self, request_data):
         """Generate professional trading signals with both technical and writers zone data"""
+        market = writers = None
         try:
-            # Handle both single object and array formats
-            if isinstance(request_data, list) and len(request_data) > 0:
-                technical_data = request_data[0]
-            else:
-                technical_data = request_data
-            
-            # Check if writers zone data is provided separately or within technical data
-            writers_data = request_data.get('writersZone', {}) if isinstance(request_data, dict) else {}
+            self.sync_weights()
+            metrics = self.metrics
+            started = time.perf_counter()
+            market, writers = self.parse_snapshot(request_data)
+            parsed = metrics.lap('parse', started)
             
-            # If writers zone data is in a separate object, extract it
-            if 'writersZone' in technical_data:
-                writers_data = technical_data
+            # Snapshots the model cannot tell apart share one scored decision
+            cache_key = None
+            cached = None
+            if self.decision_cache is not None:
+                cache_version = self.decision_cache.version  # taken before the weights are read
+                cache_key = self.decision_key(market, writers)
+                cached = self.decision_cache.get(cache_key)
             
-            # Extract key values for validation
-            ltp = float(technical_data.get('LTP', 0))
-            vix_value = float(technical_data.get('VIX', {}).get('vix', 15))
-            rsi_value = float(technical_data.get('RSI', {}).get('rsi', 50))
-            
-            # Analyze all components
-            all_signals = []
-            total_strength = 0
-            
-            # Technical Indicators Analysis
-            tech_signals, tech_strength = self.analyze_technical_indicators(technical_data)
-            all_signals.extend(tech_signals)
-            total_strength += tech_strength
-            
-            # Writers Zone Analysis (if data available)
-            if writers_data and 'writersZone' in writers_data:
-                writers_signals, writers_strength = self.analyze_writers_zone(writers_data)
-                all_signals.extend(writers_signals)
-                total_strength += writers_strength
-            
-            # VIX Filter and Market Regime
-            vix_condition = self.determine_vix_condition(vix_value)
-            
-            # Professional Decision Making
-            signal, confidence = self.make_professional_decision(
-                all_signals, total_strength, technical_data, writers_data
-            )
+            if cached is None:
+                # Analyze all components
+                all_signals = []
+                total_strength = 0
+                mark = time.perf_counter()
+                
+                # Technical Indicators Analysis
+                tech_signals, tech_strength = self.analyze_technical_indicators(market)
+                all_signals.extend(tech_signals)
+                total_strength += tech_strength
+                mark = metrics.lap('technical', mark)
+                
+                # Writers Zone Analysis (if data available)
+                if writers.present:
+                    writers_signals, writers_strength = self.analyze_writers_zone(writers)
+                    all_signals.extend(writers_signals)
+                    total_strength += writers_strength
+                    mark = metrics.lap('writers_zone', mark)
+                
+                # VIX Filter and Market Regime
+                vix_condition = self.determine_vix_condition(market.vix)
+                market_regime = self.determine_market_regime(market, writers)
+                mark = metrics.lap('market_regime', mark)
+                
+                # Professional Decision Making
+                signal, confidence = self.make_professional_decision(
+                    all_signals, total_strength, market, writers
+                )
+                metrics.lap('decision', mark)
+                
+                if cache_key is not None:
+                    self.decision_cache.put(cache_key, (tuple(all_signals), total_strength, vix_condition,
+                                                        market_regime, signal, confidence), cache_version)
+            else:
+                all_signals, total_strength, vix_condition, market_regime, signal, confidence = cached
+                all_signals = list(all_signals)
             
             # Store for learning
-            signal_data = {
-                'timestamp': datetime.now().isoformat(),
-                'signal': signal,
-                'confidence': confidence,
-                'all_signals': all_signals,
-                'strength': total_strength,
-                'technical_data': technical_data,
-                'writers_data': writers_data
-            }
-            self.model_data['signals'].append(signal_data)
+            prediction_id = self.record_signal(signal, confidence, all_signals, total_strength,
+                                               market, writers, market_regime, vix_condition)
+            signal_codes = self.rules.signal_codes
+            fired_codes = [signal_codes[name] for name in all_signals]
+            decision_code = DECISION_CODES[signal]
+            metrics.count_decision(decision_code, fired_codes)
+            if self.shadow is not None and self.shadow.active:
+                self.shadow.submit(prediction_id, decision_code, fired_codes, market, writers)
+            if self.audit is not None:
+                self.audit.record(prediction_id, self.symbol, market, writers, all_signals, total_strength,
+                                  signal, confidence, cached is not None,
+                                  {'parse': round((parsed - started) * 1e6, 1),
+                                   'total': round((time.perf_counter() - started) * 1e6, 1)})
             
             return {
                 'signal': signal,
                 'confidence': round(confidence, 3),
+                'prediction_id': prediction_id,
                 'analysis': {
                     'detected_signals': all_signals,
                     'total_strength': round(total_strength, 2),
                     'vix_condition': vix_condition,
-                    'market_regime': self.determine_market_regime(technical_data, writers_data),
-                    'ltp': ltp,
+                    'market_regime': market_regime,
+                    'ltp': market.ltp,
                     'signal_count': len(all_signals),
-                    'writers_zone': writers_data.get('writersZone', 'UNKNOWN'),
-                    'writers_confidence': writers_data.get('confidence', 0)
+                    'writers_zone': writers.writers_zone if writers.present else 'UNKNOWN',
+                    'writers_confidence': writers.writers_confidence
                 },
                 'timestamp': datetime.now().isoformat()
             }
             
+        except SnapshotError:
+            # Malformed input is the caller's fault; let the endpoint answer 400
+            raise
         except Exception as e:
-            logger.error(f"Error in signal generation: {e}")
-            return {
-                'signal': 'HOLD',
-                'confidence': 0.0,
-                'error': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
+            return self.failed_decision(e, market, writers)
+    
+    def failed_decision(self, e, market=None, writers=None):
+        """HOLD for a snapshot whose scoring failed on something other than its input's shape"""
+        logger.exception(f"Error in signal generation: {e}")
+        if self.audit is not None:
+            self.audit.record_error(self.symbol, e, market, writers)
+        return {
+            'signal': 'HOLD',
+            'confidence': 0.0,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
     
+    def batch_signal_generation(self, snapshots):
+        """Generate signals for many snapshots in one vectorized scoring pass"""
+        self.sync_weights()
+        results = [None] * len(snapshots)
+        rows = []
+        positions = []
+
+        # Rows that fail validation get a HOLD with the offending field
+        for position, request_data in enumerate(snapshots):
+            try:
+                rows.append(self.parse_snapshot(request_data))
+                positions.append(position)
+            except SnapshotError as e:
+                results[position] = {
+                    'signal': 'HOLD',
+                    'confidence': 0.0,
+                    'error': str(e),
+                    'field': e.field,
+                    'timestamp': datetime.now().isoformat()
+                }
+            except Exception as e:
+                results[position] = self.failed_decision(e)
+
+        if rows:
+            try:
+                scored = self.score_batch_rows(rows)
+            except Exception as e:
+                # Score the rows one at a time so only the one that breaks the pass fails
+                logger.warning(f"Batch scoring of {len(rows)} rows failed ({e}); scoring them one by one")
+                scored = [self.score_row(row) for row in rows]
+            for position, result in zip(positions, scored):
+                results[position] = result
+
+        return results
+
+    def score_row(self, row):
+        """Batch response for one parsed snapshot, or a HOLD if it cannot be scored"""
+        try:
+            return self.score_batch_rows([row])[0]
+        except Exception as e:
+            return self.failed_decision(e, *row)
+
+    def score_batch_rows(self, rows):
+        """Score parsed snapshots as a matrix and build per-row responses"""
+        started = time.perf_counter()
+        markets, writers = zip(*rows)
+        scores = self.score_columns(rows)
+        cols = scores['cols']
+        signal_codes = scores['signal_codes']
+        confidence = scores['confidence']
+        strength = scores['strength']
+        vix_conditions = scores['vix_conditions']
+        regimes = scores['regimes']
+
+        self.metrics.count_decisions(np.asarray(signal_codes), scores['fired'])
+        
+        # Store for learning, one vectorized write into the history ring buffer
+        now = time.time()
+        records = dict(
+            timestamp=np.full(len(rows), now),
+            signal=signal_codes,
+            confidence=confidence,
+            strength=strength,
+            signal_mask=scores['signal_mask'],
+            ltp=cols['ltp'],
+            vix=cols['vix'],
+            rsi=cols['rsi'],
+            writers_confidence=cols['writers_confidence']
+        )
+        first_location = self.model_data['signals'].extend(**records)
+        self.analytics.record_batch(now, first_location, signal_codes, confidence, scores['fired'],
+                                    regimes, vix_conditions)
+        if self.journal is not None:
+            self.journal.record_decisions(**records)
+
+        timestamp = datetime.now().isoformat()
+        shadow = self.shadow if self.shadow is not None and self.shadow.active else None
+        codes = range(len(self.rules.signal_names))
+        results = []
+        for i, row_fired in enumerate(scores['fired'].tolist()):
+            all_signals = list(compress(self.rules.signal_names, row_fired))
+            signal = SIGNAL_CODES[signal_codes[i]]
+            row_confidence = float(confidence[i])
+            total_strength = float(strength[i])
+            prediction_id = self.prediction_id(first_location + i, now)
+            if shadow is not None:
+                shadow.submit(prediction_id, signal_codes[i], list(compress(codes, row_fired)),
+                              markets[i], writers[i])
+
+            results.append({
+                'signal': signal,
+                'confidence': round(row_confidence, 3),
+                'prediction_id': prediction_id,
+                'analysis': {
+                    'detected_signals': all_signals,
+                    'total_strength': round(total_strength, 2),
+                    'vix_condition': vix_conditions[i],
+                    'market_regime': regimes[i],
+                    'ltp': markets[i].ltp,
+                    'signal_count': len(all_signals),
+                    'writers_zone': writers[i].writers_zone if writers[i].present else 'UNKNOWN',
+                    'writers_confidence': writers[i].writers_confidence
+                },
+                'timestamp': timestamp
+            })
+
+        if self.audit is not None:
+            self.audit.record_batch([result['prediction_id'] for result in results], self.symbol, markets, writers,
+                                    scores['fired'], strength, signal_codes, confidence,
+                                    {'batch': round((time.perf_counter() - started) * 1e6, 1), 'rows': len(rows)})
+        return results
+
+    def score_columns(self, rows):
+        """Score parsed snapshots as a matrix without recording them"""
+        markets, writers = zip(*rows)
+        rules = self.rules
+        cols = {}
+        for fields, snapshots in ((rules.technical_fields, markets), (rules.writers_fields, writers)):
+            for name, _, _, _, kind in fields:
+                column = list(map(attrgetter(name), snapshots))
+                if kind == 'category':
+                    cols[name] = np.fromiter(column, dtype=object, count=len(column))
+                else:
+                    cols[name] = np.array(column, dtype=np.float64)
+
+        count = len(rows)
+        has_writers = np.array([snapshot.present for snapshot in writers], dtype=bool)
+        masks = (rules.evaluate_columns(rules.technical_rule_groups, cols, np.ones(count, dtype=bool))
+                 + rules.evaluate_columns(rules.writers_rule_groups, cols, has_writers))
+
+        # Signed feature matrix times the weight vector, accumulated column by column
+        # in rule order so every row sums its terms exactly like the scalar path
+        weights = self.signal_weights
+        tech_strength = np.zeros(count)
+        writers_strength = np.zeros(count)
+        for code, mask in enumerate(masks):
+            column = mask * weights[code]
+            scale = rules.scale_fields[code]
+            if scale is not None:
+                column = column * cols[scale]
+            if code < rules.technical_count:
+                tech_strength += column
+            else:
+                writers_strength += column
+        strength = tech_strength + writers_strength
+
+        # Bullish / bearish signal counts from the precomputed polarity bits
+        fired = np.column_stack(masks)
+        bullish_count = fired @ np.array(rules.bullish)
+        bearish_count = fired @ np.array(rules.bearish)
+
+        signal_codes, confidence = self.batch_decisions(
+            cols, strength, bullish_count, bearish_count
+        )
+        signal_bits = np.left_shift(np.uint64(1), np.arange(fired.shape[1], dtype=np.uint64))
+
+        return {
+            'cols': cols,
+            'fired': fired,
+            'signal_mask': fired.astype(np.uint64) @ signal_bits,
+            'strength': strength,
+            'signal_codes': signal_codes,
+            'confidence': confidence,
+            'vix_conditions': self.batch_vix_conditions(cols['vix']),
+            'regimes': self.batch_market_regimes(cols)
+        }
+
+    def batch_decisions(self, cols, strength, bullish_count, bearish_count, thresholds=None):
+        """Vectorized make_professional_decision over a batch
+
+        thresholds defaults to the active ones; arrays of per-profile thresholds
+        broadcast against columns shaped (rows, 1) to decide for many profiles.
+        """
+        thresholds = thresholds or self.thresholds
+        rsi = cols['rsi']
+        supertrend = cols['supertrend_status']
+        aroon = cols['aroon_status']
+        writers_zone = cols['writers_zone']
+
+        base_confidence = np.minimum(np.abs(strength) / 4.0, 1.0)
+        boosted = (((writers_zone == 'BULLISH') | (writers_zone == 'BEARISH'))
+                   & (cols['writers_confidence'] > 0.5))
+        boosted_confidence = base_confidence + np.where(boosted, 0.2, 0.0)
+
+        strong_strength = thresholds['strong_strength']
+        tradable = ~(cols['vix'] > thresholds['max_vix'])
+        strong_bullish = tradable & (strength > strong_strength) & (bullish_count >= 4)
+        strong_bearish = tradable & ~strong_bullish & (strength < -strong_strength) & (bearish_count >= 4)
+        moderate = tradable & ~strong_bullish & ~strong_bearish & (np.abs(strength) > thresholds['moderate_strength'])
+        moderate_bullish = moderate & (strength > 0) & (bullish_count > bearish_count)
+        moderate_bearish = moderate & (strength < 0) & (bearish_count > bullish_count)
+
+        bullish_aligned = (supertrend == 'Bullish') & (rsi < 60) & (writers_zone == 'BULLISH')
+        bearish_aligned = (supertrend == 'Bearish') & (rsi > 40) & (writers_zone == 'BEARISH')
+        strong_confidence = np.where(
+            strong_bullish,
+            np.select(
+                [bullish_aligned, (aroon == 'Uptrend') & (rsi < 65)],
+                [np.minimum(boosted_confidence + 0.2, 0.95),
+                 np.minimum(boosted_confidence + 0.1, 0.85)],
+                np.minimum(boosted_confidence, 0.8)
+            ),
+            np.select(
+                [bearish_aligned, (aroon == 'Downtrend') & (rsi > 35)],
+                [np.minimum(boosted_confidence + 0.2, 0.95),
+                 np.minimum(boosted_confidence + 0.1, 0.85)],
+                np.minimum(boosted_confidence, 0.8)
+            )
+        )
+        moderate_confidence = np.maximum(boosted_confidence, 0.65)
+        moderate_confidence = np.where(moderate_confidence >= thresholds['min_confidence'], moderate_confidence, 0.0)
+
+        signal_codes = np.select(
+            [strong_bullish | moderate_bullish, strong_bearish | moderate_bearish],
+            [1, 2], 0
+        ).tolist()
+        confidence = np.select(
+            [strong_bullish | strong_bearish, moderate_bullish | moderate_bearish],
+            [strong_confidence, moderate_confidence], 0.0
+        )
+
+        return signal_codes, confidence
+
+    def batch_vix_conditions(self, vix):
+        """Vectorized determine_vix_condition"""
+        return np.select(
+            [vix > 25, vix > 18, vix < 12],
+            ['EXTREME_VOLATILITY', 'HIGH_VOLATILITY', 'LOW_VOLATILITY'],
+            'NORMAL_VOLATILITY'
+        ).tolist()
+
+    def batch_market_regimes(self, cols):
+        """Vectorized determine_market_regime"""
+        vix = cols['vix']
+        rsi = cols['rsi']
+        supertrend = cols['supertrend_status']
+        writers_zone = cols['writers_zone']
+        bullish_trend = (supertrend == 'Bullish') & (rsi < 70)
+        bearish_trend = (supertrend == 'Bearish') & (rsi > 30)
+
+        return np.select(
+            [vix > 20,
+             vix < 12,
+             bullish_trend & (writers_zone == 'BULLISH'),
+             bearish_trend & (writers_zone == 'BEARISH'),
+             bullish_trend,
+             bearish_trend,
+             cols['price_action'] == 'Ranging'],
+            ['HIGH_VOLATILITY', 'LOW_VOLATILITY', 'STRONG_BULLISH_TREND',
+             'STRONG_BEARISH_TREND', 'BULLISH_TREND', 'BEARISH_TREND', 'SIDEWAYS_RANGING'],
+            'SIDEWAYS_MARKET'
+        ).tolist()
+
     def determine_vix_condition(self, vix):
         """Determine VIX condition"""
         if vix > 25:
@@ -405,29 +794,25 @@ class ProfessionalTradingAI:
         else:
             return "NORMAL_VOLATILITY"
     
-    def make_professional_decision(self, signals, strength, technical_data, writers_data):
+    def make_professional_decision(self, signals, strength, market, writers):
         """Make professional trading decision based on all factors"""
         
         # Extract key values
-        vix_value = float(technical_data.get('VIX', {}).get('vix', 15))
-        rsi_value = float(technical_data.get('RSI', {}).get('rsi', 50))
-        supertrend_status = technical_data.get('SuperTrend', {}).get('status', 'Neutral')
-        aroon_status = technical_data.get('Aroon', {}).get('status', 'Neutral')
-        writers_zone = writers_data.get('writersZone', 'NEUTRAL')
-        writers_confidence = float(writers_data.get('confidence', 0))
+        vix_value = market.vix
+        rsi_value = market.rsi
+        supertrend_status = market.supertrend_status
+        aroon_status = market.aroon_status
+        writers_zone = writers.writers_zone
+        writers_confidence = writers.writers_confidence
+        thresholds = self.thresholds
         
         # VIX Filter - No trading in high volatility
-        if vix_value > 18:
+        if vix_value > thresholds['max_vix']:
             return 'HOLD', 0.0
         
         # Count bullish and bearish signals
-        bullish_signals = [s for s in signals if any(word in s for word in 
-                          ['BULLISH', 'OVERSOLD', 'BUY', 'UPTREND', 'STRONG', 'ABOVE', 'CALM'])]
-        bearish_signals = [s for s in signals if any(word in s for word in 
-                          ['BEARISH', 'OVERBOUGHT', 'SELL', 'DOWNTREND', 'WEAK', 'BELOW', 'HIGH'])]
-        
-        bullish_count = len(bullish_signals)
-        bearish_count = len(bearish_signals)
+        bullish_count = sum(self.rules.bullish_by_name.get(s, 0) for s in signals)
+        bearish_count = sum(self.rules.bearish_by_name.get(s, 0) for s in signals)
         
         # Base confidence from signal strength
         base_confidence = min(abs(strength) / 4.0, 1.0)  # Normalize to 0-1
@@ -440,7 +825,8 @@ class ProfessionalTradingAI:
             writers_boost = 0.2
         
         # Professional decision logic
-        if strength > 2.0 and bullish_count >= 4:
+        strong_strength = thresholds['strong_strength']
+        if strength > strong_strength and bullish_count >= 4:
             # Very strong bullish setup
             if supertrend_status == 'Bullish' and rsi_value < 60 and writers_zone == 'BULLISH':
                 return 'BUY_CE', min(base_confidence + writers_boost + 0.2, 0.95)
@@ -449,7 +835,7 @@ class ProfessionalTradingAI:
             else:
                 return 'BUY_CE', min(base_confidence + writers_boost, 0.8)
                 
-        elif strength < -2.0 and bearish_count >= 4:
+        elif strength < -strong_strength and bearish_count >= 4:
             # Very strong bearish setup
             if supertrend_status == 'Bearish' and rsi_value > 40 and writers_zone == 'BEARISH':
                 return 'BUY_PE', min(base_confidence + writers_boost + 0.2, 0.95)
@@ -458,25 +844,25 @@ class ProfessionalTradingAI:
             else:
                 return 'BUY_PE', min(base_confidence + writers_boost, 0.8)
                 
-        elif abs(strength) > 1.5:
+        elif abs(strength) > thresholds['moderate_strength']:
             # Moderate signals with writers zone confirmation
             if strength > 0 and bullish_count > bearish_count:
                 confidence = max(base_confidence + writers_boost, 0.65)
-                return 'BUY_CE', confidence if confidence >= 0.75 else 0.0
+                return 'BUY_CE', confidence if confidence >= thresholds['min_confidence'] else 0.0
             elif strength < 0 and bearish_count > bullish_count:
                 confidence = max(base_confidence + writers_boost, 0.65)
-                return 'BUY_PE', confidence if confidence >= 0.75 else 0.0
+                return 'BUY_PE', confidence if confidence >= thresholds['min_confidence'] else 0.0
         
         # Default to HOLD if insufficient conviction
         return 'HOLD', 0.0
     
-    def determine_market_regime(self, technical_data, writers_data):
+    def determine_market_regime(self, market, writers):
         """Determine current market regime"""
-        vix_value = float(technical_data.get('VIX', {}).get('vix', 15))
-        rsi_value = float(technical_data.get('RSI', {}).get('rsi', 50))
-        supertrend_status = technical_data.get('SuperTrend', {}).get('status', 'Neutral')
-        price_action = technical_data.get('PriceAction', {}).get('type', 'Normal')
-        writers_zone = writers_data.get('writersZone', 'NEUTRAL')
+        vix_value = market.vix
+        rsi_value = market.rsi
+        supertrend_status = market.supertrend_status
+        price_action = market.price_action
+        writers_zone = writers.writers_zone
         
         if vix_value > 20:
             return "HIGH_VOLATILITY"
@@ -495,24 +881,91 @@ class ProfessionalTradingAI:
         else:
             return "SIDEWAYS_MARKET"
 
-# Initialize the AI model
-trading_ai = ProfessionalTradingAI()
+def shed_payload(reason):
+    """Explicit HOLD for a request shed by admission control"""
+    return {
+        'signal': 'HOLD',
+        'confidence': 0.0,
+        'error': 'Request shed: ' + ('deadline passed before scoring' if reason == 'deadline_exceeded'
+                                     else 'too many requests in flight'),
+        'reason': reason,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def shed_response(reason):
+    """503 response for a shed request; overloaded callers may retry shortly"""
+    response = jsonify(shed_payload(reason))
+    response.status_code = 503
+    if reason == 'overloaded':
+        response.headers['Retry-After'] = '1'
+    return response
+
+def admitted(view):
+    """Admission control around a prediction endpoint: late or excess requests get a HOLD"""
+    @wraps(view)
+    def admit(*args, **kwargs):
+        try:
+            deadline = admission.deadline(request.headers)
+        except SnapshotError as e:
+            return jsonify({
+                'signal': 'HOLD',
+                'confidence': 0.0,
+                'error': str(e),
+                'field': e.field,
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        reason = admission.enter(deadline)
+        if reason is not None:
+            logger.warning(f"Shed {request.path} request: {reason}")
+            return shed_response(reason)
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:  # rejected and failed requests are not a first prediction
+                startup.predicted()
+            return response
+        finally:
+            admission.exit()
+    return admit
+
+def negotiated(payload):
+    """Response in the format the request negotiated (Accept, ?format=, ?fields=, gzip)"""
+    body, headers = response_encoder.encode(payload, request.headers.get('Accept'),
+                                            request.headers.get('Accept-Encoding'),
+                                            request.args.get('format'), request.args.get('fields'))
+    return Response(body, headers=headers)
 
-@app.route('/predict', methods=['POST'])
+@api.route('/predict', methods=['POST'])
+@admitted
 def predict():
     """Main prediction endpoint"""
+    started = time.perf_counter()
     try:
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        # Generate professional trading signal
-        result = trading_ai.professional_signal_generation(data)
+        # Generate professional trading signal on the payload's symbol shard
+        result = registry.professional_signal_generation(data)
         
-        logger.info(f"Prediction: {result['signal']} with confidence {result['confidence']}")
+        if audit_log is None:  # the audit log already records every decision
+            logger.info(f"Prediction: {result['signal']} with confidence {result['confidence']}")
         
-        return jsonify(result)
+        metrics = trading_ai.metrics
+        mark = time.perf_counter()
+        response = negotiated(result)
+        metrics.observe('total', metrics.lap('serialize', mark) - started)
+        return response
+    
+    except SnapshotError as e:
+        logger.warning(f"Rejected malformed payload: {e}")
+        return jsonify({
+            'signal': 'HOLD',
+            'confidence': 0.0,
+            'error': str(e),
+            'field': e.field,
+            'timestamp': datetime.now().isoformat()
+        }), 400
     
     except Exception as e:
         logger.error(f"Error in predict endpoint: {e}")
@@ -523,62 +976,333 @@ def predict():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-@app.route('/health', methods=['GET'])
+@api.route('/predict_batch', methods=['POST'])
+@admitted
+def predict_batch():
+    """Batch prediction endpoint for backfills and multi-snapshot callers"""
+    try:
+        data = request.get_json()
+
+        # Accept either a bare list of snapshots or {"snapshots": [...]}
+        snapshots = data.get('snapshots') if isinstance(data, dict) else data
+
+        if not snapshots or not isinstance(snapshots, list):
+            return jsonify({'error': 'No snapshots provided'}), 400
+
+        results = registry.batch_signal_generation(snapshots)
+
+        logger.info(f"Batch prediction: {len(results)} snapshots scored")
+
+        return negotiated({
+            'results': results,
+            'count': len(results),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Error in predict_batch endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/predict_stream', methods=['POST'])
+def predict_stream():
+    """Long-lived prediction stream: NDJSON snapshots in, NDJSON or SSE decisions out"""
+    sse = request.args.get('format') == 'sse' or (
+        request.accept_mimetypes.best_match([NDJSON_MIMETYPE, SSE_MIMETYPE]) == SSE_MIMETYPE)
+    summary = {}
+    chunks = prediction_stream(request.stream, registry.professional_signal_generation, sse,
+                               STREAM_MAX_LINE_BYTES, summary)
+    
+    def logged(chunks):
+        started = time.time()
+        try:
+            yield from chunks
+        except Exception as e:
+            logger.error(f"Error in predict_stream endpoint: {e}")
+        finally:
+            # One log line per stream instead of one per tick
+            logger.info(f"Prediction stream closed: {summary['received']} snapshots, "
+                        f"{summary['rejected']} rejected in {time.time() - started:.1f}s")
+    
+    return Response(stream_with_context(logged(chunks)),
+                    mimetype=SSE_MIMETYPE if sse else NDJSON_MIMETYPE,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/predict_candles', methods=['POST'])
+@admitted
+def predict_candles():
+    """Prediction from raw OHLCV candles, with indicators computed server-side"""
+    try:
+        data = request.get_json()
+
+        if not isinstance(data, dict) or not data.get('symbol'):
+            return jsonify({'error': 'No symbol provided'}), 400
+
+        symbol = normalize_symbol(data['symbol'])
+        model = registry.shard(symbol)  # the symbol limit applies before any state is kept
+        candles = parse_candles(data.get('candles'))
+        vix = parse_number(data['vix'], 'vix') if data.get('vix') is not None else None
+        state = candle_engine.update(symbol, candles, reset=bool(data.get('reset')))
+
+        # Writers zone fields ride along at the top level, as in /predict
+        payload = state.payload(vix)
+        for _, _, key, _, _ in WRITERS_FIELDS:
+            if key in data:
+                payload[key] = data[key]
+        if 'optionChain' in data:
+            payload['optionChain'] = data['optionChain']
+
+        result = model.professional_signal_generation(payload)
+        result['candles'] = {'symbol': symbol, 'bars': state.bars, 'ready': state.bars >= READY_BARS}
+
+        logger.info(f"Candle prediction for {symbol}: {result['signal']} with confidence {result['confidence']}")
+
+        return negotiated(result)
+
+    except SnapshotError as e:
+        logger.warning(f"Rejected malformed candles: {e}")
+        return jsonify({
+            'signal': 'HOLD',
+            'confidence': 0.0,
+            'error': str(e),
+            'field': e.field,
+            'timestamp': datetime.now().isoformat()
+        }), 400
+
+    except Exception as e:
+        logger.error(f"Error in predict_candles endpoint: {e}")
+        return jsonify({
+            'signal': 'HOLD',
+            'confidence': 0.0,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@api.route('/writers_zone', methods=['POST'])
+def writers_zone():
+    """Writers zone fields derived from a raw option chain"""
+    try:
+        data = request.get_json()
+
+        if not isinstance(data, dict) or 'optionChain' not in data:
+            return jsonify({'error': 'No optionChain provided'}), 400
+
+        return jsonify(derive_writers_zone(data['optionChain'], data.get('LTP')))
+
+    except SnapshotError as e:
+        logger.warning(f"Rejected malformed option chain: {e}")
+        return jsonify({'error': str(e), 'field': e.field}), 400
+
+    except Exception as e:
+        logger.error(f"Error in writers_zone endpoint: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    accuracy = 0.0
-    if trading_ai.model_data['accuracy_tracker']['total'] > 0:
-        accuracy = trading_ai.model_data['accuracy_tracker']['correct'] / trading_ai.model_data['accuracy_tracker']['total']
+    try:
+        model = registry.shard(request.args.get('symbol'))
+    except SnapshotError as e:
+        return jsonify({'error': str(e), 'field': e.field}), 400
+    model.sync_weights()
+    accuracy = model.model_data['accuracy_tracker'].accuracy()
     
-    return jsonify({
+    return negotiated({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'model_loaded': True,
-        'total_signals': len(trading_ai.model_data['signals']),
+        'total_signals': len(model.model_data['signals']),
         'accuracy': round(accuracy, 3),
-        'pattern_weights': trading_ai.model_data['pattern_weights']
+        'pattern_weights': model.model_data['pattern_weights'],
+        'admission': admission.stats(),
+        'audit_log': audit_log.stats() if audit_log else None,
+        'startup': startup.stats()
     })
 
-@app.route('/update_accuracy', methods=['POST'])
+@api.route('/update_accuracy', methods=['POST'])
 def update_accuracy():
     """Update model accuracy based on trade outcomes"""
     try:
         data = request.get_json()
         predicted_signal = data.get('predicted_signal')
         actual_outcome = data.get('actual_outcome')  # 'correct' or 'incorrect'
+        prediction_id = data.get('prediction_id')  # from the /predict response
         
-        trading_ai.model_data['accuracy_tracker']['total'] += 1
-        if actual_outcome == 'correct':
-            trading_ai.model_data['accuracy_tracker']['correct'] += 1
+        # Prediction IDs carry their shard's symbol; bare outcomes may name one
+        model = registry.for_prediction(prediction_id) if prediction_id else registry.shard(data.get('symbol'))
+        linked = model.record_outcome(actual_outcome == 'correct', prediction_id)
         
-        return jsonify({'message': 'Accuracy updated successfully'})
+        return jsonify({'message': 'Accuracy updated successfully', 'prediction_linked': linked})
     
     except Exception as e:
         logger.error(f"Error updating accuracy: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/get_stats', methods=['GET'])
+@api.route('/codes', methods=['GET'])
+def codes():
+    """Decision codes and signal bit order used by compact and MessagePack responses"""
+    return jsonify({'decisions': list(SIGNAL_CODES), 'signals': RULE_TABLE.signal_names})
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms and counters in Prometheus text format, summed over all workers"""
+    try:
+        trackers = [model.model_data['accuracy_tracker'] for model in registry.models()]
+        correct = sum(tracker.correct for tracker in trackers)
+        total = sum(tracker.total for tracker in trackers)
+        text = trading_ai.metrics.render() + (
+            '# HELP trading_ai_outcomes_total Trade outcomes reported to /update_accuracy\n'
+            '# TYPE trading_ai_outcomes_total counter\n'
+            f'trading_ai_outcomes_total{{result="correct"}} {correct}\n'
+            f'trading_ai_outcomes_total{{result="incorrect"}} {total - correct}\n'
+        )
+        return Response(text, mimetype='text/plain; version=0.0.4')
+    
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/get_stats', methods=['GET'])
 def get_stats():
     """Get model statistics"""
     try:
-        accuracy = 0.0
-        if trading_ai.model_data['accuracy_tracker']['total'] > 0:
-            accuracy = trading_ai.model_data['accuracy_tracker']['correct'] / trading_ai.model_data['accuracy_tracker']['total']
+        model = registry.shard(request.args.get('symbol'))
+        model.sync_weights()
+        accuracy_tracker = model.model_data['accuracy_tracker']
+        correct, total = accuracy_tracker.correct, accuracy_tracker.total
+        accuracy = correct / total if total > 0 else 0.0
         
-        recent_signals = list(trading_ai.model_data['signals'])[-10:]  # Last 10 signals
+        signals = model.model_data['signals']
+        recent_signals = signals.recent(10)  # Last 10 signals
         
-        return jsonify({
-            'total_predictions': trading_ai.model_data['accuracy_tracker']['total'],
-            'correct_predictions': trading_ai.model_data['accuracy_tracker']['correct'],
+        # ?aggregates=lifetime,1h,1d adds the rolling aggregates
+        aggregates = None
+        if request.args.get('aggregates'):
+            now = time.time()
+            aggregates = {}
+            for name in request.args['aggregates'].split(','):
+                if name == 'lifetime':
+                    aggregates[name] = model.analytics.lifetime()
+                elif name in WINDOWS:
+                    aggregates[name] = model.analytics.window(WINDOWS[name], now)
+                else:
+                    raise SnapshotError('aggregates', f"expected lifetime, {', '.join(WINDOWS)}, got {name!r}")
+        
+        # ?history=N&cursor=... pages through the signal history, newest first
+        history = None
+        if 'history' in request.args or 'cursor' in request.args:
+            try:
+                limit = int(request.args.get('history', 50))
+            except ValueError:
+                raise SnapshotError('history', f"expected a page size, got {request.args['history']!r}")
+            limit = min(max(limit, 1), STATS_HISTORY_PAGE_MAX)
+            try:
+                records, locations, next_cursor = signals.page(request.args.get('cursor'), limit)
+            except ValueError as e:
+                raise SnapshotError('cursor', str(e))
+            entries = signals.to_dicts(records)
+            for entry, record, location in zip(entries, records, locations):
+                entry['prediction_id'] = model.prediction_id(location, record['timestamp'])
+            history = {'signals': entries, 'next_cursor': next_cursor}
+        
+        stats = {
+            'symbol': model.symbol,
+            'symbols': registry.symbols(),
+            'total_predictions': total,
+            'correct_predictions': correct,
             'accuracy': round(accuracy, 3),
             'recent_signals': recent_signals,
-            'pattern_weights': trading_ai.model_data['pattern_weights']
-        })
+            'pattern_weights': model.model_data['pattern_weights'],
+            'profile': {
+                'active': model.profile.name if model.profile else None,
+                'thresholds': model.thresholds,
+                'shadows': model.shadow.stats() if model.shadow else {}
+            },
+            'decision_cache': model.decision_cache.stats() if model.decision_cache else None
+        }
+        if aggregates is not None:
+            stats['aggregates'] = aggregates
+        if history is not None:
+            stats['history'] = history
+        return negotiated(stats)
+    
+    except SnapshotError as e:
+        return jsonify({'error': str(e), 'field': e.field}), 400
     
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Built by create_app() on first access, so importing ProfessionalTradingAI
+# (backtest.py, optimize.py) builds no app, model state or logging setup
+APP_GLOBALS = ('app', 'audit_log', 'trading_ai', 'registry', 'candle_engine', 'response_encoder', 'admission')
+
+def create_app():
+    """Build the Flask app and the models behind it, once per process
+    
+    With gunicorn's preload_app (see gunicorn.conf.py) this runs in the
+    master: rule tables, compiled decision keys, weights and the history
+    restored from the journal are built once and shared copy-on-write by
+    the forked workers. Per-process state (shared state slots, metrics
+    rows, background threads, admission gauges) is claimed again by each
+    worker after the fork, as it is without preloading. The master starts
+    no threads, so no lock is inherited held.
+    """
+    global app, audit_log, trading_ai, registry, candle_engine, response_encoder, admission
+    if 'app' in globals():
+        return app
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    
+    # Symbol shards share the default model's /metrics counters and the audit log
+    audit_log = None
+    if AUDIT_LOG_DIR:
+        audit_log = AuditLog(AUDIT_LOG_DIR, RULE_TABLE, SIGNAL_CODES, AUDIT_LOG_MAX_PENDING, AUDIT_LOG_DROP_POLICY,
+                             AUDIT_LOG_FLUSH_INTERVAL, AUDIT_LOG_ROTATE_BYTES, AUDIT_LOG_ROTATE_SECONDS)
+    trading_ai = ProfessionalTradingAI(audit=audit_log)
+    registry = ModelRegistry(trading_ai, lambda symbol: ProfessionalTradingAI(symbol, trading_ai.metrics, audit_log),
+                             MODEL_MAX_SYMBOLS, MODEL_SHARD_WORKERS)
+    candle_engine = CandleEngine(CANDLE_MAX_SYMBOLS, CANDLE_STATE_DIR)
+    admission = AdmissionController(PREDICT_MAX_IN_FLIGHT, PREDICT_MAX_QUEUE, PREDICT_DEADLINE_MS / 1000,
+                                    trading_ai.metrics)
+    
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(api)
+    response_encoder = ResponseEncoder(RULE_TABLE.signal_names, SIGNAL_CODES,
+                                       lambda payload: flask_app.json.dumps(payload, separators=(',', ':')),
+                                       RESPONSE_GZIP_MIN_BYTES)
+    app = flask_app
+    started = startup.phase('create_app', started)
+    
+    warm_up()
+    startup.phase('warm_up', started)
+    os.register_at_fork(after_in_child=after_fork)
+    return app
+
+def warm_up():
+    """Run what a first request would run for the first time, without recording a prediction
+    
+    Compiles the URL map and loads Flask's request and JSON machinery, and
+    takes the scoring code through its first pass, so that neither a worker
+    nor (when preloaded) every forked worker pays for it on its first request.
+    """
+    app.test_client().get('/codes')
+    trading_ai.score_columns([trading_ai.parse_snapshot({})])
+
+def after_fork():
+    """Start the time to first prediction over in a worker forked after create_app()"""
+    startup.forked()
+    for model in registry.models():
+        model.after_fork()
+
+def __getattr__(name):
+    """Build the app on first access to it or one of its components"""
+    if name in APP_GLOBALS:
+        create_app()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+startup.phase('import', IMPORT_STARTED)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""Optional async (ASGI) serving mode with /predict micro-batching
+
+Serves the same endpoints as the Flask app, e.g.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+    gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker
+
+Concurrent /predict calls that arrive within PREDICT_BATCH_MAX_WAIT_MS of the
+first waiting one are coalesced into one batch_signal_generation pass, so a
+burst of callers costs one vectorized scoring pass instead of one request
+each. Every other route is handed to the Flask app unchanged, with its
+request body and response streamed through rather than buffered, so
+/predict_stream answers each snapshot as it arrives. All other model work,
+batched or not, runs on one model thread, as it would in a sync worker, while
+the event loop keeps accepting connections. Open /predict_stream connections
+each hold a thread of their own (up to ASGI_STREAM_THREADS, more wait), like
+requests in a threaded gunicorn worker, so one long stream never stalls the
+model thread.
+
+Admission control (see admission.py) applies here too. Requests beyond
+PREDICT_MAX_IN_FLIGHT are shed at once rather than queued, and requests
+whose deadline passes while they wait for a batch are answered with a HOLD
+instead of being scored.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import Headers
+
+from ai_model_api_fixed import admission, app as flask_app, registry, response_encoder, shed_payload, startup
+from market_snapshot import SnapshotError
+
+logger = logging.getLogger(__name__)
+
+# Longest a /predict call waits for others to share its batch, and the batch
+# size that is scored without waiting any longer
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get('PREDICT_BATCH_MAX_WAIT_MS', 2.0))
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 64))
+
+# Threads serving long-lived /predict_stream connections at once
+ASGI_STREAM_THREADS = int(os.environ.get('ASGI_STREAM_THREADS', 16))
+STREAM_PATH = '/predict_stream'
+
+
+def _json_response(payload, status=200):
+    """Body bytes as Flask's jsonify would render them"""
+    body = (flask_app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+    return status, [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())], body
+
+
+def _shed_response(reason):
+    """503 for a shed request, as the Flask routes answer it"""
+    status, headers, body = _json_response(shed_payload(reason), 503)
+    return status, headers + ([(b'retry-after', b'1')] if reason == 'overloaded' else []), body
+
+
+def _negotiated_response(scope, payload):
+    """Body bytes in the format the request negotiated, as the Flask routes answer"""
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    query = {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+    body, response_headers = response_encoder.encode(payload, headers.get('accept'), headers.get('accept-encoding'),
+                                                     query.get('format'), query.get('fields'))
+    response_headers['Content-Length'] = str(len(body))
+    return 200, [(name.lower().encode(), value.encode()) for name, value in response_headers.items()], body
+
+
+class _ReceiveStream(io.RawIOBase):
+    """Request body read off ASGI receive() by WSGI code on a worker thread"""
+
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.pending = b''
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """Copy what has arrived, waiting only while nothing has"""
+        while not self.pending and not self.finished:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message['type'] == 'http.disconnect':
+                self.finished = True
+            else:
+                self.pending += message.get('body', b'')
+                self.finished = not message.get('more_body')
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+
+class PredictionBatcher:
+    """Coalesces concurrent /predict payloads into batched scoring passes"""
+
+    def __init__(self, executor, max_wait=0.002, max_size=64):
+        self.executor = executor
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.pending = []
+        self.flush_handle = None
+        self.batches = 0
+        self.predictions = 0
+
+    async def predict(self, payload, deadline=None):
+        """Decision for one payload, scored together with whatever arrives alongside it
+
+        None when the deadline passed before its batch was scored.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((payload, future, deadline))
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        """Send everything waiting to the model thread as one batch"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._score(batch))
+
+    async def _score(self, batch):
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        for _, future, deadline in batch:
+            if deadline is not None and deadline <= now and not future.done():
+                future.set_result(None)  # stale before scoring; not worth a slot in the batch
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        payloads = [payload for payload, _, _ in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, registry.batch_signal_generation, payloads)
+            outcomes = [(result, None) for result in results]
+        except Exception as e:
+            # One payload must not fail the others: answer each as /predict would alone
+            logger.warning(f"Batch of {len(batch)} predictions failed ({e}); scoring them one by one")
+            outcomes = await loop.run_in_executor(self.executor, self._score_each, payloads)
+        self.batches += 1
+        self.predictions += len(batch)
+        logger.debug(f"Scored {len(batch)} coalesced predictions in one batch")
+        if any(result is not None and 'error' not in result for result, _ in outcomes):
+            startup.predicted()
+        for (_, future, _), (result, error) in zip(batch, outcomes):
+            if future.done():  # caller may have disconnected
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _score_each(payloads):
+        """(result, exception) per payload, scored on its own as the Flask /predict route scores it"""
+        outcomes = []
+        for payload in payloads:
+            try:
+                outcomes.append((registry.professional_signal_generation(payload), None))
+            except SnapshotError as e:
+                outcomes.append(({
+                    'signal': 'HOLD',
+                    'confidence': 0.0,
+                    'error': str(e),
+                    'field': e.field,
+                    'timestamp': datetime.now().isoformat()
+                }, None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+
+class AsgiApp:
+    """ASGI entry point: batched /predict, everything else through the Flask app"""
+
+    def __init__(self, wsgi_app, max_wait=0.002, max_size=64):
+        self.wsgi_app = wsgi_app
+        # One model thread serializes model state access like a sync worker does
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='model')
+        self.stream_executor = ThreadPoolExecutor(ASGI_STREAM_THREADS, thread_name_prefix='stream')
+        self.batcher = PredictionBatcher(self.executor, max_wait, max_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        loop = asyncio.get_running_loop()
+        if scope['path'] == '/predict' and scope['method'] == 'POST':
+            body = await self._read_body(receive)
+            response = await self._predict(scope, body)
+            if response is not None:
+                status, headers, content = response
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': content})
+                return
+            body = io.BytesIO(body)
+        else:
+            body = io.BufferedReader(_ReceiveStream(receive, loop))
+        executor = self.stream_executor if scope['path'] == STREAM_PATH else self.executor
+        await loop.run_in_executor(executor, self._call_wsgi, scope, body, send, loop)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.stream_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def _predict(self, scope, body):
+        """Batched /predict; None hands unusual requests to Flask for its exact error response"""
+        content_type = dict(scope['headers']).get(b'content-type', b'').split(b';')[0].strip().lower()
+        if content_type != b'application/json' and not (
+                content_type.startswith(b'application/') and content_type.endswith(b'+json')):
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if not data:
+            return None
+
+        # Admission control as the Flask routes apply it, except that excess
+        # requests are shed at once: the batch being filled is the queue here
+        try:
+            deadline = admission.deadline(Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                                                   for name, value in scope['headers']]))
+        except SnapshotError:
+            return None
+        reason = admission.enter(deadline, blocking=False)
+        if reason is not None:
+            return _shed_response(reason)
+        try:
+            result = await self.batcher.predict(data, deadline)
+        except Exception as e:
+            logger.error(f"Error in predict endpoint: {e}")
+            return _json_response({
+                'signal': 'HOLD',
+                'confidence': 0.0,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }, 500)
+        finally:
+            admission.exit()
+
+        if result is None:
+            return _shed_response(admission.shed('deadline_exceeded'))
+        if 'field' in result:
+            # Rejected by parse_snapshot, as /predict answers a SnapshotError
+            logger.warning(f"Rejected malformed payload: {result['error']}")
+            return _json_response(result, 400)
+        return _negotiated_response(scope, result)
+
+    def _call_wsgi(self, scope, body, send, loop):
+        """Run one request through the WSGI app, sending its response chunks as they are produced"""
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,  # reads end with the body, chunked or not
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            key = name.decode('latin-1').upper().replace('-', '_')
+            if key == 'TRANSFER_ENCODING':
+                continue  # the body arrives already de-chunked
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f"HTTP_{key}"
+            value = value.decode('latin-1')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+        if isinstance(body, io.BytesIO):
+            environ['CONTENT_LENGTH'] = str(len(body.getbuffer()))
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = int(status.split(' ', 1)[0])
+            captured['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        iterable = self.wsgi_app(environ, start_response)
+        started = False
+        try:
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if not started:
+                    emit({'type': 'http.response.start', 'status': captured['status'],
+                          'headers': captured['headers']})
+                    started = True
+                emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        if not started:
+            emit({'type': 'http.response.start', 'status': captured['status'], 'headers': captured['headers']})
+        emit({'type': 'http.response.body', 'body': b''})
+
+
+app = AsgiApp(flask_app, PREDICT_BATCH_MAX_WAIT_MS / 1000.0, PREDICT_BATCH_MAX_SIZE)
@@ -0,0 +1,206 @@
+"""Structured audit log of every decision, written off the request path
+
+Every scored snapshot yields one JSON line: the parsed input, the fired
+signals, strength, decision, confidence and timings. Errors also get a line,
+with their traceback. Request threads only queue the parsed snapshots and
+the scores. A background thread turns them into JSON every flush interval,
+or sooner when the buffer fills up, and appends each batch as one gzip
+member to
+
+    <AUDIT_LOG_DIR>/audit-<UTC start time>-<pid>.jsonl.gz
+
+Concatenated gzip members form a valid gzip file, so `zcat` reads a file
+written in many batches, and a crash loses at most the unwritten batch.
+Each worker writes its own files. A file is rotated once it reaches
+rotate_bytes compressed or is rotate_seconds old.
+
+The buffer holds at most max_pending records. When it is full, the drop
+policy decides what happens:
+
+    oldest   drop the oldest queued records (default)
+    newest   drop the record being added
+    block    make the request wait for the writer; nothing is dropped
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from itertools import compress
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ('oldest', 'newest', 'block')
+
+
+class AuditLog:
+    """Bounded queue of decision records drained into rotated gzip files by a background thread"""
+
+    def __init__(self, directory, rules, decision_names, max_pending=10000, drop_policy='oldest',
+                 flush_interval=1.0, rotate_bytes=64 << 20, rotate_seconds=3600.0):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Audit log drop policy must be one of {', '.join(DROP_POLICIES)}, got {drop_policy!r}")
+        self.directory = directory
+        self.signal_names = rules.signal_names
+        self.market_fields = [field[0] for field in rules.technical_fields]
+        self.writers_fields = [field[0] for field in rules.writers_fields]
+        self.decision_names = decision_names
+        self.max_pending = max_pending
+        self.drop_policy = drop_policy
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self.pending = deque()  # entries; a batch entry holds many records
+        self.pending_records = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)  # the writer waits for a full buffer
+        self.space = threading.Condition(self.lock)  # blocked requests wait for the writer
+        self.write_lock = threading.Lock()
+        self.writer_pid = None
+        self.path = None
+        self.file_size = 0
+        self.file_opened = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.reported_drops = 0
+        atexit.register(self.flush)
+
+    def _ensure_writer(self):
+        """Start the writer thread in this process (again after a fork)"""
+        pid = os.getpid()
+        if self.writer_pid != pid:
+            with self.lock:
+                if self.writer_pid != pid:
+                    # Records inherited from the parent are the parent's to write
+                    self.pending.clear()
+                    self.pending_records = 0
+                    self.path = None
+                    self.writer_pid = pid
+                    threading.Thread(target=self._run, name='audit-log', daemon=True).start()
+
+    def _queue(self, entry, count):
+        """Add an entry of `count` records, applying the drop policy when the buffer is full"""
+        self._ensure_writer()
+        with self.lock:
+            if self.pending_records + count > self.max_pending:
+                if self.drop_policy == 'newest':
+                    self.dropped += count
+                    return
+                if self.drop_policy == 'block':
+                    self.ready.notify()
+                    while self.pending_records and self.pending_records + count > self.max_pending:
+                        self.space.wait()
+                else:
+                    while self.pending and self.pending_records + count > self.max_pending:
+                        dropped = self.pending.popleft()
+                        self.pending_records -= dropped[1]
+                        self.dropped += dropped[1]
+            self.pending.append((entry, count))
+            self.pending_records += count
+            if self.pending_records >= self.max_pending // 2:
+                self.ready.notify()
+
+    def record(self, prediction_id, symbol, market, writers, signals, strength, signal, confidence, cached,
+               timings):
+        """Queue the audit record of one scored snapshot"""
+        self._queue(('decision', time.time(), prediction_id, symbol, market, writers, signals, strength,
+                     signal, confidence, cached, timings), 1)
+
+    def record_batch(self, prediction_ids, symbol, markets, writers, fired, strength, signal_codes, confidence,
+                     timings):
+        """Queue the audit records of a vectorized batch; rows are expanded by the writer"""
+        self._queue(('batch', time.time(), prediction_ids, symbol, markets, writers, fired, strength,
+                     signal_codes, confidence, timings), len(prediction_ids))
+
+    def record_error(self, symbol, error, market=None, writers=None):
+        """Queue the audit record of a failed prediction, with the current traceback"""
+        self._queue(('error', time.time(), symbol, market, writers, str(error), traceback.format_exc()), 1)
+
+    def _inputs(self, market, writers):
+        """Compact input summary: the parsed snapshot fields"""
+        if market is None:
+            return None
+        summary = {name: getattr(market, name) for name in self.market_fields}
+        if writers is not None and writers.present:
+            summary['writers'] = {name: getattr(writers, name) for name in self.writers_fields}
+        return summary
+
+    def _lines(self, entries):
+        """JSON lines for queued entries"""
+        for entry in entries:
+            kind = entry[0]
+            if kind == 'decision':
+                (_, timestamp, prediction_id, symbol, market, writers, signals, strength, signal, confidence,
+                 cached, timings) = entry
+                yield {'ts': timestamp, 'prediction_id': prediction_id, 'symbol': symbol,
+                       'input': self._inputs(market, writers), 'signals': signals, 'strength': strength,
+                       'decision': signal, 'confidence': confidence, 'cached': cached, 'timings_us': timings}
+            elif kind == 'batch':
+                (_, timestamp, prediction_ids, symbol, markets, writers, fired, strength, signal_codes, confidence,
+                 timings) = entry
+                for row, prediction_id in enumerate(prediction_ids):
+                    yield {'ts': timestamp, 'prediction_id': prediction_id, 'symbol': symbol,
+                           'input': self._inputs(markets[row], writers[row]),
+                           'signals': list(compress(self.signal_names, fired[row])),
+                           'strength': float(strength[row]), 'decision': self.decision_names[signal_codes[row]],
+                           'confidence': float(confidence[row]), 'cached': False, 'timings_us': timings}
+            else:
+                _, timestamp, symbol, market, writers, error, trace = entry
+                yield {'ts': timestamp, 'symbol': symbol, 'input': self._inputs(market, writers),
+                       'error': error, 'traceback': trace}
+
+    def _run(self):
+        while True:
+            with self.lock:
+                self.ready.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing audit log: {e}")
+
+    def _file(self):
+        """Current file path, rotated by size and age"""
+        now = time.time()
+        if (self.path is None or self.file_size >= self.rotate_bytes
+                or now - self.file_opened >= self.rotate_seconds):
+            stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+            self.path = os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}.jsonl.gz")
+            self.file_size = 0
+            self.file_opened = now
+        return self.path
+
+    def flush(self):
+        """Write everything queued so far as one gzip member"""
+        if self.writer_pid != os.getpid():
+            return  # anything queued was inherited from the parent, which writes it
+        with self.write_lock:
+            with self.lock:
+                entries = [entry for entry, _ in self.pending]
+                count = self.pending_records
+                dropped, self.reported_drops = self.dropped - self.reported_drops, self.dropped
+                self.pending.clear()
+                self.pending_records = 0
+                self.space.notify_all()
+            if dropped:
+                logger.warning(f"Audit log dropped {dropped} records, buffer of {self.max_pending} was full")
+            if not entries:
+                return
+            data = ''.join(json.dumps(line, separators=(',', ':'), default=str) + '\n'
+                           for line in self._lines(entries))
+            member = gzip.compress(data.encode(), compresslevel=6)
+            with open(self._file(), 'ab') as audit_file:
+                audit_file.write(member)
+            self.file_size += len(member)
+            self.written += count
+
+    def stats(self):
+        """Queue depth and totals for this process"""
+        return {'pending': self.pending_records, 'max_pending': self.max_pending, 'drop_policy': self.drop_policy,
+                'written': self.written, 'dropped': self.dropped, 'file': self.path}
@@ -0,0 +1,253 @@
+"""Offline backtest of recorded snapshots through the live scoring engine
+
+Streams a JSONL file (one /predict payload per line) or a Parquet file (one
+payload per row) through ProfessionalTradingAI.score_columns, the same
+vectorized engine behind /predict_batch, in chunks spread over a process
+pool. Reports decision statistics per signal, per market regime and per VIX
+condition, and optionally writes one decision per input row. Memory stays
+bounded by the chunk size times the number of chunks in flight.
+
+    python backtest.py snapshots.jsonl --decisions decisions.jsonl --stats stats.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from ai_model_api_fixed import SIGNAL_CODES, ProfessionalTradingAI
+from indicator_rules import RULE_TABLE
+
+_engine = None
+
+
+def _init_worker(pattern_weights):
+    """Build one scoring engine per worker process"""
+    global _engine
+    _engine = ProfessionalTradingAI(offline=True)
+    if pattern_weights:
+        _engine.set_pattern_weights(pattern_weights)
+
+
+def _group_counts(labels, signal_codes, confidence):
+    """Per-label decision counts and confidence sums"""
+    names, inverse = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+    counts = np.zeros((len(names), len(SIGNAL_CODES)), dtype=np.int64)
+    confidence_sums = np.zeros((len(names), len(SIGNAL_CODES)))
+    np.add.at(counts, (inverse, signal_codes), 1)
+    np.add.at(confidence_sums, (inverse, signal_codes), confidence)
+    return {name: (counts[i], confidence_sums[i]) for i, name in enumerate(names)}
+
+
+def score_chunk(task):
+    """Score one chunk of raw rows; returns (stats, decision lines or None)"""
+    start, raw_rows, write_decisions = task
+    signal_names = _engine.rules.signal_names
+    rows = []
+    positions = []
+    errors = []
+    for offset, raw in enumerate(raw_rows):
+        try:
+            payload = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+            rows.append(_engine.parse_snapshot(payload))
+            positions.append(offset)
+        except ValueError as e:  # JSON decode errors and SnapshotError
+            errors.append((offset, str(e)))
+
+    stats = {
+        'rows': len(raw_rows),
+        'invalid': len(errors),
+        'decisions': np.zeros(len(SIGNAL_CODES), dtype=np.int64),
+        'confidence': np.zeros(len(SIGNAL_CODES)),
+        'signals': np.zeros((len(signal_names), len(SIGNAL_CODES)), dtype=np.int64),
+        'regimes': {},
+        'vix_conditions': {}
+    }
+    lines = {start + offset: json.dumps({'row': start + offset, 'signal': 'HOLD',
+                                         'confidence': 0.0, 'error': error})
+             for offset, error in errors} if write_decisions else None
+    if not rows:
+        return stats, _ordered(lines)
+
+    scores = _engine.score_columns(rows)
+    codes = np.asarray(scores['signal_codes'])
+    confidence = scores['confidence']
+    fired = scores['fired']
+    stats['decisions'] = np.bincount(codes, minlength=len(SIGNAL_CODES))
+    stats['confidence'] = np.bincount(codes, weights=confidence, minlength=len(SIGNAL_CODES))
+    # Fired-signal matrix times one-hot decisions: fires of each signal per decision
+    stats['signals'] = fired.T.astype(np.int64) @ np.eye(len(SIGNAL_CODES), dtype=np.int64)[codes]
+    stats['regimes'] = _group_counts(scores['regimes'], codes, confidence)
+    stats['vix_conditions'] = _group_counts(scores['vix_conditions'], codes, confidence)
+
+    if write_decisions:
+        strength = scores['strength']
+        for i, row_fired in enumerate(fired.tolist()):
+            row = start + positions[i]
+            lines[row] = json.dumps({
+                'row': row,
+                'signal': SIGNAL_CODES[codes[i]],
+                'confidence': round(float(confidence[i]), 3),
+                'total_strength': round(float(strength[i]), 2),
+                'vix_condition': scores['vix_conditions'][i],
+                'market_regime': scores['regimes'][i],
+                'detected_signals': [name for name, hit in zip(signal_names, row_fired) if hit]
+            })
+    return stats, _ordered(lines)
+
+
+def _ordered(lines):
+    """Join decision lines in row order"""
+    if lines is None:
+        return None
+    return ''.join(lines[row] + '\n' for row in sorted(lines))
+
+
+def merge_stats(total, chunk):
+    """Add one chunk's statistics into the running totals"""
+    if total is None:
+        return chunk
+    for key in ('rows', 'invalid', 'decisions', 'confidence', 'signals'):
+        total[key] = total[key] + chunk[key]
+    for key in ('regimes', 'vix_conditions'):
+        for name, (counts, confidence) in chunk[key].items():
+            if name in total[key]:
+                previous_counts, previous_confidence = total[key][name]
+                total[key][name] = (previous_counts + counts, previous_confidence + confidence)
+            else:
+                total[key][name] = (counts, confidence)
+    return total
+
+
+def _decision_summary(counts, confidence):
+    scored = int(counts.sum())
+    return {
+        'count': scored,
+        'decisions': {signal: int(count) for signal, count in zip(SIGNAL_CODES, counts)},
+        'mean_confidence': round(float(confidence.sum()) / scored, 4) if scored else 0.0
+    }
+
+
+def build_report(stats, signal_names, elapsed):
+    """Turn merged statistics into a JSON-ready report"""
+    scored = stats['rows'] - stats['invalid']
+    return {
+        'rows': stats['rows'],
+        'scored': scored,
+        'invalid': stats['invalid'],
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(stats['rows'] / elapsed) if elapsed > 0 else None,
+        'decisions': {
+            signal: {
+                'count': int(count),
+                'share': round(int(count) / scored, 4) if scored else 0.0,
+                'mean_confidence': round(float(confidence) / count, 4) if count else 0.0
+            }
+            for signal, count, confidence in zip(SIGNAL_CODES, stats['decisions'], stats['confidence'])
+        },
+        'signals': {
+            name: {
+                'fired': int(counts.sum()),
+                'fire_rate': round(int(counts.sum()) / scored, 4) if scored else 0.0,
+                'decisions': {signal: int(count) for signal, count in zip(SIGNAL_CODES, counts)}
+            }
+            for name, counts in zip(signal_names, stats['signals'])
+        },
+        'regimes': {name: _decision_summary(*values) for name, values in sorted(stats['regimes'].items())},
+        'vix_conditions': {name: _decision_summary(*values)
+                           for name, values in sorted(stats['vix_conditions'].items())}
+    }
+
+
+def read_chunks(path, chunk_size):
+    """Yield (first row number, raw rows) chunks from a JSONL or Parquet file"""
+    start = 0
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet input requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            rows = batch.to_pylist()
+            yield start, rows
+            start += len(rows)
+        return
+
+    with open(path, 'rb') as source:
+        lines = (line for line in source if line.strip())
+        while True:
+            rows = list(islice(lines, chunk_size))
+            if not rows:
+                return
+            yield start, rows
+            start += len(rows)
+
+
+def run_backtest(path, workers=None, chunk_size=5000, decisions_path=None, pattern_weights=None):
+    """Score every snapshot in `path` and return the statistics report"""
+    started = time.perf_counter()
+    unknown = set(pattern_weights or ()) - set(RULE_TABLE.weight_names)
+    if unknown:
+        raise SystemExit(f"Unknown pattern_weights {', '.join(sorted(unknown))}")
+    workers = workers or os.cpu_count() or 1
+    tasks = ((start, rows, decisions_path is not None) for start, rows in read_chunks(path, chunk_size))
+    decisions_file = open(decisions_path, 'w') if decisions_path else None
+    stats = None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(pattern_weights,)) as pool:
+            # Keep a bounded window of chunks in flight and consume them in order
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(score_chunk, task))
+                if len(pending) >= workers * 2:
+                    stats = _consume(pending.popleft(), stats, decisions_file)
+            while pending:
+                stats = _consume(pending.popleft(), stats, decisions_file)
+    finally:
+        if decisions_file:
+            decisions_file.close()
+
+    if stats is None:
+        raise SystemExit(f"No snapshots found in {path}")
+    return build_report(stats, RULE_TABLE.signal_names, time.perf_counter() - started)
+
+
+def _consume(future, stats, decisions_file):
+    chunk_stats, lines = future.result()
+    if decisions_file and lines:
+        decisions_file.write(lines)
+    return merge_stats(stats, chunk_stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest recorded snapshots through the trading model")
+    parser.add_argument('input', help="JSONL (one payload per line) or .parquet file of snapshots")
+    parser.add_argument('--decisions', help="write one JSON decision per input row to this file")
+    parser.add_argument('--stats', help="write the statistics report here instead of stdout")
+    parser.add_argument('--weights', help="JSON file of pattern_weights overrides to evaluate")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="rows scored per task")
+    args = parser.parse_args(argv)
+
+    pattern_weights = None
+    if args.weights:
+        with open(args.weights) as weights_file:
+            pattern_weights = json.load(weights_file)
+
+    report = run_backtest(args.input, args.workers, args.chunk_size, args.decisions, pattern_weights)
+    output = json.dumps(report, indent=2)
+    if args.stats:
+        with open(args.stats, 'w') as stats_file:
+            stats_file.write(output)
+    else:
+        print(output)
+    print(f"Scored {report['rows']} rows in {report['elapsed_seconds']}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Reproducible benchmarks for the scoring engine and the /predict endpoint
+
+Generates seeded synthetic n8n payloads (synthetic_payloads.py) covering every indicator block, with
+and without writers zone data plus a stream of near-identical consecutive
+ticks, and times them through
+
+    engine    ProfessionalTradingAI.professional_signal_generation in-process
+    flask     POST /predict through the Flask test client
+    gunicorn  POST /predict against a local gunicorn started for the run
+
+Each run reports ops/sec, p50/p99/mean latency and memory per request
+(tracemalloc peak and retained bytes in-process, worker RSS for gunicorn)
+and can save them as JSON. Comparing against an earlier file prints the
+change per metric and flags regressions beyond a threshold.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json --fail-threshold 10
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import http.client
+
+import numpy as np
+
+from synthetic_payloads import isolate_environment, scenario_payloads
+
+# Benchmarks measure the request path alone
+isolate_environment()
+
+logging.disable(logging.INFO)
+
+import ai_model_api_fixed  # noqa: E402  (after the environment is pinned)
+
+MODES = ('engine', 'flask', 'gunicorn')
+SCENARIOS = ('technical', 'writers', 'ticks')
+MEMORY_SAMPLE = 500  # requests traced with tracemalloc per in-process run
+
+# Metrics where a larger value is a regression, and where a smaller one is
+HIGHER_IS_WORSE = ('p50_us', 'p99_us', 'mean_us', 'peak_kib_per_request', 'worker_rss_mib')
+LOWER_IS_WORSE = ('ops_per_sec',)
+# Compared but never flagged: cache and history growth make it noisy
+REPORT_ONLY = ('retained_bytes_per_request',)
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles from per-request seconds"""
+    latencies = np.asarray(latencies)
+    return {
+        'count': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_us': round(float(np.percentile(latencies, 50)) * 1e6, 2),
+        'p99_us': round(float(np.percentile(latencies, 99)) * 1e6, 2),
+        'mean_us': round(float(latencies.mean()) * 1e6, 2),
+    }
+
+
+def time_calls(call, payloads, warmup):
+    """Run call over every payload after a warmup; returns (latencies, elapsed seconds)"""
+    for payload in payloads[:warmup]:
+        call(payload)
+    clock = time.perf_counter
+    latencies = []
+    started = clock()
+    for payload in payloads:
+        mark = clock()
+        call(payload)
+        latencies.append(clock() - mark)
+    return latencies, clock() - started
+
+
+def trace_memory(call, payloads):
+    """Median tracemalloc peak per request and bytes retained per request"""
+    payloads = payloads[:MEMORY_SAMPLE]
+    tracemalloc.start()
+    try:
+        peaks = []
+        before_all = tracemalloc.get_traced_memory()[0]
+        for payload in payloads:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call(payload)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - before_all
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak_kib_per_request': round(float(np.median(peaks)) / 1024, 2),
+        'retained_bytes_per_request': round(retained / len(payloads), 1),
+    }
+
+
+def bench_engine(payloads, warmup):
+    engine = ai_model_api_fixed.ProfessionalTradingAI()
+    result = summarize(*time_calls(engine.professional_signal_generation, payloads, warmup))
+    result.update(trace_memory(ai_model_api_fixed.ProfessionalTradingAI().professional_signal_generation, payloads))
+    return result
+
+
+def bench_flask(payloads, warmup):
+    client = ai_model_api_fixed.app.test_client()
+
+    def call(payload):
+        response = client.post('/predict', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict answered {response.status_code}: {response.get_data(as_text=True)}")
+
+    result = summarize(*time_calls(call, payloads, warmup))
+    result.update(trace_memory(call, payloads))
+    return result
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _worker_rss_mib(master_pid):
+    """Largest resident set of the gunicorn workers (Linux /proc), or None"""
+    try:
+        children = open(f'/proc/{master_pid}/task/{master_pid}/children').read().split()
+        sizes = []
+        for pid in children:
+            for line in open(f'/proc/{pid}/status'):
+                if line.startswith('VmRSS:'):
+                    sizes.append(int(line.split()[1]) / 1024)
+        return round(max(sizes), 1) if sizes else None
+    except OSError:
+        return None
+
+
+def bench_gunicorn(payloads, warmup, workers=1, concurrency=1):
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'ai_model_api_fixed:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=os.environ.copy(),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # the workers log every prediction
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/health')
+                connection.getresponse().read()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("gunicorn did not start; run it by hand to see why")
+                time.sleep(0.2)
+
+        bodies = [json.dumps(payload).encode() for payload in payloads]
+        headers = {'Content-Type': 'application/json'}
+
+        def call(body):
+            # Sync workers close the connection after every response
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request('POST', '/predict', body, headers)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status != 200:
+                raise RuntimeError(f"/predict answered {response.status}")
+
+        for body in bodies[:warmup]:
+            call(body)
+        latencies = [[] for _ in range(concurrency)]
+
+        def client(index):
+            clock = time.perf_counter
+            for body in bodies[index::concurrency]:
+                mark = clock()
+                call(body)
+                latencies[index].append(clock() - mark)
+
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result = summarize([value for values in latencies for value in values], time.perf_counter() - started)
+        result['worker_rss_mib'] = _worker_rss_mib(server.pid)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(modes, scenarios, count, seed, warmup, workers=1, concurrency=1):
+    """Run every mode x scenario and return the JSON-ready report"""
+    results = {}
+    for scenario in scenarios:
+        payloads = scenario_payloads(scenario, count, seed)
+        for mode in modes:
+            if mode == 'engine':
+                result = bench_engine(payloads, warmup)
+            elif mode == 'flask':
+                result = bench_flask(payloads, warmup)
+            else:
+                result = bench_gunicorn(payloads, warmup, workers, concurrency)
+            results[f'{mode}/{scenario}'] = result
+            print(f"{mode}/{scenario}: {result['ops_per_sec']} ops/s, p50 {result['p50_us']} us, "
+                  f"p99 {result['p99_us']} us", file=sys.stderr)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'config': {'count': count, 'seed': seed, 'warmup': warmup, 'workers': workers,
+                   'concurrency': concurrency},
+        'results': results,
+    }
+
+
+def compare(previous, current, threshold):
+    """Print per-metric changes; returns the regressions beyond threshold percent"""
+    if previous.get('config') != current['config']:
+        print(f"note: configs differ ({previous.get('config')} vs {current['config']})")
+    regressions = []
+    for key, result in current['results'].items():
+        before = previous['results'].get(key)
+        if before is None:
+            continue
+        for metric in LOWER_IS_WORSE + HIGHER_IS_WORSE + REPORT_ONLY:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = (change < -threshold if metric in LOWER_IS_WORSE
+                     else change > threshold if metric in HIGHER_IS_WORSE else False)
+            print(f"{key:22} {metric:28} {old:>12} -> {new:>12} ({change:+.1f}%){'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((key, metric, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the trading model and its /predict endpoint")
+    parser.add_argument('--modes', default='engine,flask', help=f"comma-separated subset of {','.join(MODES)}")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument('--count', type=int, default=5000, help="timed requests per mode and scenario")
+    parser.add_argument('--warmup', type=int, default=200, help="untimed requests before each run")
+    parser.add_argument('--seed', type=int, default=42, help="payload generator seed")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn workers")
+    parser.add_argument('--concurrency', type=int, default=1, help="concurrent gunicorn clients")
+    parser.add_argument('--output', help="save the report as JSON here")
+    parser.add_argument('--compare', help="earlier JSON report to diff against")
+    parser.add_argument('--fail-threshold', type=float, default=None,
+                        help="exit non-zero when a metric regresses by more than this percent")
+    args = parser.parse_args(argv)
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    scenarios = [scenario for scenario in args.scenarios.split(',') if scenario]
+    unknown = set(modes) - set(MODES) | set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown mode or scenario: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(modes, scenarios, args.count, args.seed, args.warmup, args.workers, args.concurrency)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        threshold = args.fail_threshold if args.fail_threshold is not None else 10.0
+        regressions = compare(previous, report, threshold)
+        if regressions and args.fail_threshold is not None:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
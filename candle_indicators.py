@@ -0,0 +1,495 @@
+"""Streaming technical indicators computed from raw OHLCV candles
+
+Keeps rolling state per symbol and updates every indicator in O(1) per bar
+(amortized for the sliding highs/lows), so callers can send a seed window once
+and then one new bar per call instead of precomputing the indicators
+upstream. The result is a technical payload in the same shape n8n sends to
+/predict, which goes through the normal snapshot parsing and analysis.
+
+Successive bars of a symbol must all reach the same state. With a state
+directory (SHARED_STATE_FILE set) every symbol's state is kept in a file
+there, updated under an exclusive flock, so gunicorn workers take turns on
+one series whichever of them a bar lands on. A worker only reads the file
+back when another worker has written it since. The files hold plain JSON
+numbers, never pickles, in a directory only this user may write to. Without
+a directory the state lives in the process, which is only correct with a
+single worker.
+"""
+import fcntl
+import json
+import math
+import os
+import stat
+import threading
+from collections import OrderedDict, deque
+
+from market_snapshot import SnapshotError, parse_number
+
+# Bars needed before every indicator has a full window (SMA50 is the longest)
+READY_BARS = 50
+
+CANDLE_KEYS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class _Ema:
+    """Exponential moving average seeded with the first value"""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, period):
+        self.alpha = 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class _Wilder:
+    """Wilder smoothing: a simple mean over the first period, then 1/period steps"""
+    __slots__ = ('period', 'count', 'value')
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, x):
+        if self.count < self.period:
+            self.count += 1
+            self.value += (x - self.value) / self.count
+        else:
+            self.value += (x - self.value) / self.period
+        return self.value
+
+
+class _Window:
+    """Fixed-length window with running sum and sum of squares"""
+    __slots__ = ('values', 'position', 'count', 'total', 'squares')
+
+    def __init__(self, period):
+        self.values = [0.0] * period
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def update(self, x):
+        old = self.values[self.position]
+        self.values[self.position] = x
+        self.position = (self.position + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+        if self.position == 0:
+            # Resum once per lap so add/subtract rounding never accumulates
+            self.total = math.fsum(self.values)
+            self.squares = math.fsum(value * value for value in self.values)
+        else:
+            self.total += x - old
+            self.squares += x * x - old * old
+        return self.total / self.count
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(self.squares / self.count - mean * mean, 0.0)) if self.count else 0.0
+
+    def items(self):
+        """Values currently in the window, in no particular order"""
+        return self.values if self.count == len(self.values) else self.values[:self.count]
+
+
+class _Extreme:
+    """Sliding-window maximum (sign=1) or minimum (sign=-1) with its bar index"""
+    __slots__ = ('period', 'sign', 'items')
+
+    def __init__(self, period, sign):
+        self.period = period
+        self.sign = sign
+        self.items = deque()
+
+    def update(self, index, x):
+        items = self.items
+        # Later bars win ties, matching "bars since the most recent high"
+        while items and items[-1][1] * self.sign <= x * self.sign:
+            items.pop()
+        items.append((index, x))
+        while items[0][0] <= index - self.period:
+            items.popleft()
+        return items[0]
+
+
+def _dump(value):
+    """JSON-ready copy of a state field or indicator component"""
+    if hasattr(value, '__slots__'):
+        return [_dump(getattr(value, name)) for name in value.__slots__]
+    if isinstance(value, (tuple, list, deque)):
+        return [_dump(item) for item in value]
+    return value
+
+
+def _restore(component, values):
+    """Load a component's slots from its _dump output"""
+    for name, value in zip(component.__slots__, values):
+        if isinstance(getattr(component, name), deque):
+            value = deque(tuple(item) for item in value)
+        setattr(component, name, value)
+
+
+# IndicatorState attributes kept in a shared state file
+STATE_FIELDS = ('bars', 'last_timestamp', 'previous', 'before_previous', 'rsi', 'ema20', 'sma50', 'macd',
+                'bollinger', 'cci', 'atr', 'adx', 'stochastic', 'mfi', 'aroon', 'volume', 'obv', 'obv_average',
+                'supertrend_atr', 'supertrend', 'psar', 'values')
+
+
+class IndicatorState:
+    """Rolling indicator state of one symbol"""
+
+    def __init__(self):
+        self.bars = 0
+        self.last_timestamp = None
+        self.previous = None  # (high, low, close, typical price) of the last bar
+        self.before_previous = None  # (high, low) of the bar before that
+
+        self.rsi = (_Wilder(14), _Wilder(14))  # average gain, average loss
+        self.ema20 = _Ema(20)
+        self.sma50 = _Window(50)
+        self.macd = (_Ema(12), _Ema(26), _Ema(9))
+        self.bollinger = _Window(20)
+        self.cci = _Window(20)
+        self.atr = _Wilder(14)
+        self.adx = (_Wilder(14), _Wilder(14), _Wilder(14), _Wilder(14))  # +DM, -DM, TR, DX
+        self.stochastic = (_Extreme(14, 1), _Extreme(14, -1), _Window(3))
+        self.mfi = (_Window(14), _Window(14))  # positive, negative money flow
+        self.aroon = (_Extreme(26, 1), _Extreme(26, -1))
+        self.volume = _Window(20)
+        self.obv = 0.0
+        self.obv_average = _Window(20)
+        self.supertrend_atr = _Wilder(10)
+        self.supertrend = None  # (final upper, final lower, bullish)
+        self.psar = None  # (sar, extreme point, acceleration, bullish)
+        self.values = {}
+
+    def update(self, high, low, close, volume):
+        """Advance every indicator by one bar"""
+        index = self.bars
+        self.bars += 1
+        typical = (high + low + close) / 3
+        values = self.values
+        values['close'] = close
+
+        if self.previous is None:
+            prev_high, prev_low, prev_close, prev_typical = high, low, close, typical
+            true_range = high - low
+        else:
+            prev_high, prev_low, prev_close, prev_typical = self.previous
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+        # RSI (14, Wilder)
+        change = close - prev_close
+        average_gain = self.rsi[0].update(max(change, 0.0))
+        average_loss = self.rsi[1].update(max(-change, 0.0))
+        if average_loss == 0:
+            values['rsi'] = 100.0 if average_gain > 0 else 50.0
+        else:
+            values['rsi'] = 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+
+        # Moving averages and MACD (12, 26, 9)
+        values['ema20'] = self.ema20.update(close)
+        values['sma50'] = self.sma50.update(close)
+        macd = self.macd[0].update(close) - self.macd[1].update(close)
+        signal = self.macd[2].update(macd)
+        values['macd'], values['macd_signal'], values['macd_histogram'] = macd, signal, macd - signal
+
+        # Bollinger Bands (20, 2)
+        middle = self.bollinger.update(close)
+        width = 2 * self.bollinger.std()
+        values['bb_upper'], values['bb_lower'] = middle + width, middle - width
+
+        # CCI (20); the mean deviation walks the fixed 20-bar window
+        average_typical = self.cci.update(typical)
+        deviation = sum(abs(x - average_typical) for x in self.cci.items()) / self.cci.count
+        values['cci'] = (typical - average_typical) / (0.015 * deviation) if deviation else 0.0
+
+        # ATR (14) and ADX (14)
+        values['atr'] = self.atr.update(true_range)
+        up_move, down_move = high - prev_high, prev_low - low
+        plus_dm = self.adx[0].update(up_move if up_move > down_move and up_move > 0 else 0.0)
+        minus_dm = self.adx[1].update(down_move if down_move > up_move and down_move > 0 else 0.0)
+        smoothed_range = self.adx[2].update(true_range)
+        if smoothed_range > 0:
+            plus_di, minus_di = 100 * plus_dm / smoothed_range, 100 * minus_dm / smoothed_range
+            di_sum = plus_di + minus_di
+            dx = 100 * abs(plus_di - minus_di) / di_sum if di_sum else 0.0
+        else:
+            dx = 0.0
+        values['adx'] = self.adx[3].update(dx)
+
+        # Stochastic (14, 3)
+        highest = self.stochastic[0].update(index, high)[1]
+        lowest = self.stochastic[1].update(index, low)[1]
+        percent_k = 100 * (close - lowest) / (highest - lowest) if highest > lowest else 50.0
+        values['stoch_k'] = percent_k
+        values['stoch_d'] = self.stochastic[2].update(percent_k)
+
+        # MFI (14); falls back to neutral when the instrument reports no volume
+        money_flow = typical * volume
+        self.mfi[0].update(money_flow if typical > prev_typical else 0.0)
+        self.mfi[1].update(money_flow if typical < prev_typical else 0.0)
+        positive, negative = self.mfi[0].total, self.mfi[1].total
+        if negative > 0:
+            values['mfi'] = 100.0 - 100.0 / (1.0 + positive / negative)
+        else:
+            values['mfi'] = 100.0 if positive > 0 else 50.0
+
+        # Aroon (25): bars since the highest high / lowest low of the last 26 bars
+        high_index = self.aroon[0].update(index, high)[0]
+        low_index = self.aroon[1].update(index, low)[0]
+        values['aroon_up'] = 100 * (25 - (index - high_index)) / 25
+        values['aroon_down'] = 100 * (25 - (index - low_index)) / 25
+
+        # Volume: relative to its 20-bar average, and OBV against its average
+        values['volume'] = volume
+        values['volume_average'] = self.volume.update(volume)
+        if close > prev_close:
+            self.obv += volume
+        elif close < prev_close:
+            self.obv -= volume
+        values['obv'] = self.obv
+        values['obv_average'] = self.obv_average.update(self.obv)
+
+        self._update_supertrend(high, low, close, prev_close, true_range)
+        self._update_psar(high, low, close, prev_high, prev_low, prev_close)
+
+        self.before_previous = (prev_high, prev_low)
+        self.previous = (high, low, close, typical)
+
+    def _update_supertrend(self, high, low, close, prev_close, true_range):
+        """SuperTrend (10, 3)"""
+        atr = self.supertrend_atr.update(true_range)
+        middle = (high + low) / 2
+        upper, lower = middle + 3 * atr, middle - 3 * atr
+        if self.supertrend is None:
+            bullish = True
+        else:
+            prev_upper, prev_lower, bullish = self.supertrend
+            if not (upper < prev_upper or prev_close > prev_upper):
+                upper = prev_upper
+            if not (lower > prev_lower or prev_close < prev_lower):
+                lower = prev_lower
+            if bullish and close < lower:
+                bullish = False
+            elif not bullish and close > upper:
+                bullish = True
+        self.supertrend = (upper, lower, bullish)
+        self.values['supertrend'] = lower if bullish else upper
+        self.values['supertrend_bullish'] = bullish
+
+    def _update_psar(self, high, low, close, prev_high, prev_low, prev_close):
+        """Parabolic SAR (0.02 step, 0.2 maximum)"""
+        if self.psar is None:
+            if self.previous is None:
+                self.values['psar'] = low
+                self.values['psar_bullish'] = True
+                return
+            bullish = close >= prev_close
+            sar, extreme = (min(low, prev_low), max(high, prev_high)) if bullish else \
+                (max(high, prev_high), min(low, prev_low))
+            self.psar = (sar, extreme, 0.02, bullish)
+        else:
+            sar, extreme, acceleration, bullish = self.psar
+            sar += acceleration * (extreme - sar)
+            # The SAR never moves inside the range of the previous two bars
+            high_before, low_before = self.before_previous
+            if bullish:
+                sar = min(sar, prev_low, low_before)
+                if low < sar:
+                    bullish, sar, extreme, acceleration = False, extreme, low, 0.02
+                elif high > extreme:
+                    extreme, acceleration = high, min(acceleration + 0.02, 0.2)
+            else:
+                sar = max(sar, prev_high, high_before)
+                if high > sar:
+                    bullish, sar, extreme, acceleration = True, extreme, high, 0.02
+                elif low < extreme:
+                    extreme, acceleration = low, min(acceleration + 0.02, 0.2)
+            self.psar = (sar, extreme, acceleration, bullish)
+        self.values['psar'] = self.psar[0]
+        self.values['psar_bullish'] = self.psar[3]
+
+    def to_json(self):
+        """The state as JSON-ready numbers, lists and dicts"""
+        return {name: _dump(getattr(self, name)) for name in STATE_FIELDS}
+
+    @classmethod
+    def from_json(cls, data):
+        """Rebuild a state written by to_json"""
+        state = cls()
+        for name in STATE_FIELDS:
+            current = getattr(state, name)
+            if isinstance(current, tuple) and current and hasattr(current[0], '__slots__'):
+                for component, values in zip(current, data[name]):
+                    _restore(component, values)
+            elif hasattr(current, '__slots__'):
+                _restore(current, data[name])
+            elif isinstance(data[name], list):
+                setattr(state, name, tuple(data[name]))
+            else:
+                setattr(state, name, data[name])
+        return state
+
+    def payload(self, vix=None):
+        """Technical payload for /predict built from the latest indicator values"""
+        v = self.values
+        close = v['close']
+        relative_volume = v['volume'] / v['volume_average'] if v['volume_average'] > 0 else 1.0
+        adx = v['adx']
+        payload = {
+            'LTP': close,
+            'RSI': {'rsi': v['rsi'], 'status': _band(v['rsi'], 30, 70, 'Oversold', 'Overbought')},
+            'EMA20': {'ema': v['ema20'], 'status': _direction(close - v['ema20'])},
+            'SMA50': {'sma': v['sma50'], 'status': _direction(close - v['sma50'])},
+            'MACD': {'macd': v['macd'], 'signal': v['macd_signal'], 'histogram': v['macd_histogram'],
+                     'status': _direction(v['macd_histogram'])},
+            'BollingerBands': {'upper': v['bb_upper'], 'lower': v['bb_lower'],
+                               'status': 'Above Upper' if close > v['bb_upper'] else
+                               'Below Lower' if close < v['bb_lower'] else 'Within Bands'},
+            'CCI': {'value': v['cci'], 'status': _band(v['cci'], -100, 100, 'Sell', 'Buy')},
+            'SuperTrend': {'value': v['supertrend'],
+                           'status': 'Bullish' if v['supertrend_bullish'] else 'Bearish'},
+            'VolumeIndicators': {'obv': v['obv'], 'status': 'Strong' if v['obv'] > v['obv_average'] else
+                                 'Weak' if v['obv'] < v['obv_average'] else 'Normal'},
+            'VolumeStrength': {'type': 'Strong Volume' if relative_volume > 1.5 else
+                               'Weak Volume' if relative_volume < 0.5 else 'Normal'},
+            'Aroon': {'up': v['aroon_up'], 'down': v['aroon_down'],
+                      'status': _direction(v['aroon_up'] - v['aroon_down'], 'Uptrend', 'Downtrend')},
+            'ParabolicSAR': {'value': v['psar'], 'status': 'Bullish' if v['psar_bullish'] else 'Bearish'},
+            'MFI': {'value': v['mfi'], 'status': _band(v['mfi'], 20, 80, 'Oversold', 'Overbought')},
+            'PriceAction': {'type': 'Trending' if adx > 25 else 'Ranging' if adx < 20 else 'Normal'},
+            'ATR': {'value': v['atr']},
+            'ADX': {'value': adx},
+            'Stochastic': {'value': v['stoch_k'], 'signal': v['stoch_d'],
+                           'status': _band(v['stoch_k'], 20, 80, 'Oversold', 'Overbought')},
+        }
+        if vix is not None:
+            payload['VIX'] = {'vix': vix, 'status': 'Calm Market' if vix < 15 else 'High' if vix > 20 else 'Normal'}
+        return payload
+
+
+def _band(value, low, high, below, above):
+    return below if value < low else above if value > high else 'Neutral'
+
+
+def _direction(delta, up='Bullish', down='Bearish'):
+    return up if delta > 0 else down if delta < 0 else 'Neutral'
+
+
+def parse_candles(candles):
+    """Validate candles given as objects or [timestamp, open, high, low, close, volume] rows"""
+    if not isinstance(candles, list) or not candles:
+        raise SnapshotError('candles', "expected a non-empty list of candles")
+    parsed = []
+    for position, candle in enumerate(candles):
+        path = f"candles[{position}]"
+        if isinstance(candle, dict):
+            timestamp = candle.get('timestamp')
+            values = [candle.get(key, 0 if key == 'volume' else None) for key in CANDLE_KEYS]
+        elif isinstance(candle, list) and len(candle) in (5, 6):
+            timestamp, values = candle[0], list(candle[1:]) + [0] * (6 - len(candle))
+        else:
+            raise SnapshotError(path, f"expected an object or [timestamp, open, high, low, close, volume], "
+                                      f"got {candle!r}")
+        _, high, low, close, volume = (parse_number(value, f"{path}.{key}")
+                                       for key, value in zip(CANDLE_KEYS, values))
+        if high < low:
+            raise SnapshotError(f"{path}.high", f"high {high} is below low {low}")
+        if timestamp is not None and not isinstance(timestamp, str):
+            timestamp = parse_number(timestamp, f"{path}.timestamp")
+        parsed.append((timestamp, high, low, close, volume))
+    return parsed
+
+
+def _private_directory(directory):
+    """Create the state directory for this user only, or refuse one anyone else could write to"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o022:
+        raise PermissionError(f"Candle state directory {directory} must be a directory owned by this user "
+                              f"and not writable by others")
+
+
+class CandleEngine:
+    """Per-symbol indicator states, least recently used symbols evicted first
+
+    With a directory the states are shared with other processes through
+    one file per symbol; symbols must be safe file names.
+    """
+
+    def __init__(self, max_symbols=256, directory=None):
+        self.max_symbols = max_symbols
+        self.directory = directory
+        self.states = OrderedDict()
+        self.stamps = {}  # symbol -> (inode, mtime, size) of the state file this process last read or wrote
+        self.lock = threading.Lock()
+        if directory:
+            _private_directory(directory)
+
+    def update(self, symbol, candles, reset=False):
+        """Feed parsed candles for a symbol; returns its state after the last bar
+
+        Bars whose timestamp is not newer than the last one seen are skipped,
+        so a retried request does not count the same bar twice.
+        """
+        with self.lock:
+            if not self.directory:
+                return self._advance(symbol, candles, reset)
+            path = os.path.join(self.directory, f"{symbol}.state")
+            with open(f"{path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if not reset:
+                    self._load(symbol, path)
+                state = self._advance(symbol, candles, reset)
+                self._store(symbol, path, state)
+            return state
+
+    def _load(self, symbol, path):
+        """Adopt the symbol's state file when another process wrote it since this one did"""
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            self.states.pop(symbol, None)
+            self.stamps.pop(symbol, None)
+            return
+        stamp = (status.st_ino, status.st_mtime_ns, status.st_size)
+        if self.stamps.get(symbol) != stamp or symbol not in self.states:
+            with open(path) as state_file:
+                self.states[symbol] = IndicatorState.from_json(json.load(state_file))
+            self.stamps[symbol] = stamp
+
+    def _store(self, symbol, path, state):
+        """Replace the symbol's state file with this process's state"""
+        staging = f"{path}.{os.getpid()}.tmp"
+        with open(staging, 'w') as state_file:
+            json.dump(state.to_json(), state_file, separators=(',', ':'))
+        os.replace(staging, path)
+        status = os.stat(path)
+        self.stamps[symbol] = (status.st_ino, status.st_mtime_ns, status.st_size)
+
+    def _advance(self, symbol, candles, reset):
+        """Run candles through the symbol's in-process state"""
+        state = None if reset else self.states.get(symbol)
+        if state is None:
+            state = IndicatorState()
+            self.states[symbol] = state
+        self.states.move_to_end(symbol)
+        while len(self.states) > self.max_symbols:
+            evicted, _ = self.states.popitem(last=False)
+            self.stamps.pop(evicted, None)
+        for timestamp, high, low, close, volume in candles:
+            if timestamp is not None:
+                last = state.last_timestamp
+                if last.__class__ is timestamp.__class__ and timestamp <= last:
+                    continue
+                state.last_timestamp = timestamp
+            state.update(high, low, close, volume)
+        return state
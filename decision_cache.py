@@ -0,0 +1,115 @@
+"""Cache of scored decisions keyed on the discretized snapshot
+
+A decision depends on a payload only through the rule and decision
+predicates it satisfies (RSI below 30, SuperTrend 'Bullish', ...) and the
+exact value of any field that scales a fired rule's weight. compile_key
+generates one straight-line function returning those truth values as a
+tuple, so consecutive ticks that differ only in ways the model cannot see
+share a cache entry and skip scoring. Entries expire after a TTL, the least
+recently used one is evicted when the cache is full, and the owner clears
+the cache whenever pattern_weights change.
+
+Every clear starts a new version. A caller takes the version before it
+scores and hands it to put, so a decision scored with the old weights
+while another thread swapped them is dropped instead of being stored after
+the clear.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from indicator_rules import Ref
+
+
+def compile_key(rules, decision_predicates=()):
+    """Generate key(market, writers) -> tuple of every predicate the model evaluates"""
+    writers_names = {field[0] for field in rules.writers_fields}
+
+    def field_ref(name):
+        return f"{'w' if name in writers_names else 'm'}.{name}"
+
+    def render(field, comparison, operand):
+        right = field_ref(operand.field) if isinstance(operand, Ref) else repr(operand)
+        return f"{field_ref(field)} {comparison} {right}"
+
+    terms = ['w.present']
+    for clause in [clause for r in rules.rules for clause in r.clauses] + list(decision_predicates):
+        term = render(*clause)
+        if term not in terms:
+            terms.append(term)
+    # A scaled weight makes the strength continuous in its field while the rule can fire
+    for r in rules.rules:
+        if r.scale:
+            condition = ' and '.join(render(*clause) for clause in r.clauses) or 'True'
+            terms.append(f"({field_ref(r.scale)} if {condition} else None)")
+
+    source = 'def key(m, w):\n    return (\n' + ''.join(f'        {term},\n' for term in terms) + '    )'
+    namespace = {}
+    exec(source, namespace)
+    return namespace['key']
+
+
+class DecisionCache:
+    """LRU + TTL map from discretized snapshots to scored decisions"""
+
+    def __init__(self, max_size=4096, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires, version, value)
+        self.lock = threading.Lock()
+        self.version = 0  # bumped by every clear
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic() and entry[1] == self.version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value, version):
+        """Store value scored at cache version `version`, evicting the least recently used entry if full"""
+        with self.lock:
+            if version != self.version:
+                self.stale_puts += 1  # scored with weights replaced since
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, version, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. because the weights behind them changed"""
+        with self.lock:
+            self.entries.clear()
+            self.version += 1
+            self.invalidations += 1
+
+    def stats(self):
+        """Counters for /get_stats"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'stale_puts': self.stale_puts
+        }
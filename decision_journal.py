@@ -0,0 +1,189 @@
+"""Append-only on-disk journal of decisions and trade outcomes
+
+Every /predict decision is appended to `decisions.bin` as a fixed-size binary
+history record and every /update_accuracy outcome to `outcomes.bin`. Request
+threads only queue bytes; a background thread writes and fsyncs them in
+batches. A small snapshot file holds accuracy counts up to a known outcome
+offset, so restoring state reads the snapshot, sums the outcome tail and takes
+the newest history records straight off the end of the memory-mapped journal,
+however many months of data it holds.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from signal_history import HISTORY_DTYPE
+
+logger = logging.getLogger(__name__)
+
+# On-disk layouts are pinned to little-endian so journals move between hosts
+DECISION_DTYPE = HISTORY_DTYPE.newbyteorder('<')
+DECISION_RECORD = struct.Struct('<dbddQdddd')
+OUTCOME_DTYPE = np.dtype([('timestamp', '<f8'), ('correct', 'i1')])
+OUTCOME_RECORD = struct.Struct('<db')
+
+assert DECISION_RECORD.size == DECISION_DTYPE.itemsize
+assert OUTCOME_RECORD.size == OUTCOME_DTYPE.itemsize
+
+
+def _map_records(path, dtype):
+    """Memory-map a journal file as a read-only record array (torn tail ignored)"""
+    try:
+        with open(path, 'rb') as journal_file:
+            count = os.fstat(journal_file.fileno()).st_size // dtype.itemsize
+            if count == 0:
+                return np.empty(0, dtype=dtype)
+            mapped = mmap.mmap(journal_file.fileno(), count * dtype.itemsize, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(mapped, dtype=dtype, count=count)
+
+
+class DecisionJournal:
+    """Batched, fsynced append-only journal with snapshot-based replay"""
+
+    def __init__(self, directory, flush_interval=1.0, snapshot_interval=300.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.decisions_path = os.path.join(directory, 'decisions.bin')
+        self.outcomes_path = os.path.join(directory, 'outcomes.bin')
+        self.snapshot_path = os.path.join(directory, 'snapshot.json')
+        os.makedirs(directory, exist_ok=True)
+        self._repair_torn_tails()
+
+        self.lock = threading.Lock()
+        self.pending_decisions = []
+        self.pending_outcomes = []
+        self.writer_pid = None
+        self.last_snapshot = time.time()
+        atexit.register(self.flush)
+
+    def _locked(self):
+        """Open the journal lock file and take an exclusive flock on it"""
+        lock_file = open(os.path.join(self.directory, 'journal.lock'), 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _repair_torn_tails(self):
+        """Drop a partial record left by a crash so later appends stay aligned"""
+        with self._locked():
+            for path, size in ((self.decisions_path, DECISION_RECORD.size),
+                               (self.outcomes_path, OUTCOME_RECORD.size)):
+                if os.path.exists(path):
+                    length = os.path.getsize(path)
+                    if length % size:
+                        logger.warning(f"Truncating torn record at end of {path}")
+                        os.truncate(path, length - length % size)
+
+    def _ensure_writer(self):
+        """Start the flush thread in this process (again after a fork)"""
+        pid = os.getpid()
+        if self.writer_pid != pid:
+            with self.lock:
+                if self.writer_pid != pid:
+                    # Buffers inherited from the parent are the parent's to write
+                    self.pending_decisions = []
+                    self.pending_outcomes = []
+                    self.writer_pid = pid
+                    threading.Thread(target=self._run, name='decision-journal', daemon=True).start()
+
+    def record_decision(self, record):
+        """Queue one decision given as a history record tuple"""
+        self._ensure_writer()
+        data = DECISION_RECORD.pack(*record)
+        with self.lock:
+            self.pending_decisions.append(data)
+
+    def record_decisions(self, **columns):
+        """Queue many decisions given as equal-length history columns"""
+        self._ensure_writer()
+        records = np.empty(len(columns['timestamp']), dtype=DECISION_DTYPE)
+        for name, values in columns.items():
+            records[name] = values
+        data = records.tobytes()
+        with self.lock:
+            self.pending_decisions.append(data)
+
+    def record_outcome(self, correct):
+        """Queue one trade outcome"""
+        self._ensure_writer()
+        data = OUTCOME_RECORD.pack(time.time(), bool(correct))
+        with self.lock:
+            self.pending_outcomes.append(data)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() - self.last_snapshot >= self.snapshot_interval:
+                    self.snapshot()
+            except Exception as e:
+                logger.error(f"Error writing decision journal: {e}")
+
+    def flush(self):
+        """Write and fsync everything queued so far"""
+        with self.lock:
+            decisions, self.pending_decisions = self.pending_decisions, []
+            outcomes, self.pending_outcomes = self.pending_outcomes, []
+        if not decisions and not outcomes:
+            return
+        # The journal lock keeps a starting worker's torn-tail repair from
+        # truncating a batch another worker is appending
+        with self._locked():
+            for path, chunks in ((self.decisions_path, decisions), (self.outcomes_path, outcomes)):
+                if not chunks:
+                    continue
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, b''.join(chunks))
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def read_snapshot(self):
+        """Return the last snapshot, or an empty one"""
+        try:
+            with open(self.snapshot_path) as snapshot_file:
+                return json.load(snapshot_file)
+        except FileNotFoundError:
+            return {'outcome_records': 0, 'correct': 0, 'total': 0}
+
+    def snapshot(self):
+        """Fold the outcome journal into the snapshot file"""
+        with self._locked():
+            state = self.read_snapshot()
+            outcomes = _map_records(self.outcomes_path, OUTCOME_DTYPE)
+            new = outcomes[state['outcome_records']:]
+            state = {
+                'outcome_records': len(outcomes),
+                'correct': state['correct'] + int(np.count_nonzero(new['correct'])),
+                'total': state['total'] + len(new),
+                'timestamp': time.time()
+            }
+            staging = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(staging, 'w') as snapshot_file:
+                json.dump(state, snapshot_file)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(staging, self.snapshot_path)
+        self.last_snapshot = time.time()
+        return state
+
+    def replay(self, capacity):
+        """Return (newest `capacity` decisions, correct, total) from disk"""
+        state = self.read_snapshot()
+        outcomes = _map_records(self.outcomes_path, OUTCOME_DTYPE)[state['outcome_records']:]
+        decisions = _map_records(self.decisions_path, DECISION_DTYPE)[-capacity:]
+        return (decisions.astype(HISTORY_DTYPE),
+                state['correct'] + int(np.count_nonzero(outcomes['correct'])),
+                state['total'] + len(outcomes))
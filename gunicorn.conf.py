@@ -0,0 +1,25 @@
+"""gunicorn settings, read from the working directory by `gunicorn ai_model_api_fixed:app`
+
+The master imports the app and builds it once (create_app) before forking
+the workers, so a new or replacement worker starts with the models, rule
+tables and restored history already in memory, shared copy-on-write.
+GUNICORN_PRELOAD=0 builds the app in every worker instead.
+"""
+import gc
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    """Keep the garbage collector off the master's objects so workers' pages stay shared"""
+    if preload_app:
+        gc.freeze()
+
+
+def on_starting(server):
+    """Warn when /predict_candles would keep a symbol's bars spread over several workers"""
+    if server.cfg.workers > 1 and not os.environ.get('SHARED_STATE_FILE'):
+        server.log.warning(f"{server.cfg.workers} workers without SHARED_STATE_FILE: /predict_candles keeps "
+                           f"indicator state per worker, so a symbol's bars are split between them; "
+                           f"set SHARED_STATE_FILE or run one worker")
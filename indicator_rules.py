@@ -0,0 +1,266 @@
+"""Declarative indicator rules for the Professional Trading AI
+
+Every indicator block is written once as data: the payload fields it reads,
+and an if/elif chain of rules (signal, conditions, weight key, sign, polarity).
+RuleTable compiles the data at startup into flat per-signal tables and
+generated matcher functions, so adding an indicator means adding a rule here,
+not editing the request path.
+"""
+import operator
+from collections import namedtuple
+
+import numpy as np
+
+# Signal polarity bits used by the decision engine to count bullish/bearish signals
+NEUTRAL = 0
+BULLISH = 1
+BEARISH = 2
+
+# Reference to another payload field, for field-vs-field comparisons
+Ref = namedtuple('Ref', 'field')
+
+Rule = namedtuple('Rule', 'signal weight clauses sign polarity scale')
+
+
+def rule(signal, weight, *clauses, sign=1, polarity=NEUTRAL, scale=None):
+    """Declare one rule: fires `signal` when every (field, comparison, operand) clause holds"""
+    return Rule(signal, weight, clauses, sign, polarity, scale)
+
+
+# Technical fields: (name, indicator block, key, default, kind)
+# A block of None reads the key from the top level of the payload. Kinds are
+# 'number', 'category' (string status) or 'list' (parsed to its length).
+TECHNICAL_FIELDS = (
+    ('ltp', None, 'LTP', 0, 'number'),
+    ('vix', 'VIX', 'vix', 15, 'number'),
+    ('rsi', 'RSI', 'rsi', 50, 'number'),
+    ('rsi_status', 'RSI', 'status', 'Neutral', 'category'),
+    ('ema_status', 'EMA20', 'status', 'Neutral', 'category'),
+    ('sma_status', 'SMA50', 'status', 'Neutral', 'category'),
+    ('macd_status', 'MACD', 'status', 'Neutral', 'category'),
+    ('macd_histogram', 'MACD', 'histogram', 0, 'number'),
+    ('vix_status', 'VIX', 'status', 'Normal', 'category'),
+    ('bb_status', 'BollingerBands', 'status', 'Within Bands', 'category'),
+    ('cci_value', 'CCI', 'value', 0, 'number'),
+    ('cci_status', 'CCI', 'status', 'Neutral', 'category'),
+    ('supertrend_status', 'SuperTrend', 'status', 'Neutral', 'category'),
+    ('volume_status', 'VolumeIndicators', 'status', 'Normal', 'category'),
+    ('volume_strength', 'VolumeStrength', 'type', 'Normal', 'category'),
+    ('aroon_status', 'Aroon', 'status', 'Neutral', 'category'),
+    ('psar_status', 'ParabolicSAR', 'status', 'Neutral', 'category'),
+    ('mfi_value', 'MFI', 'value', 50, 'number'),
+    ('mfi_status', 'MFI', 'status', 'Neutral', 'category'),
+    ('price_action', 'PriceAction', 'type', 'Normal', 'category'),
+    ('atr', 'ATR', 'value', 20, 'number'),
+    ('adx', 'ADX', 'value', 20, 'number'),
+    ('stoch', 'Stochastic', 'value', 50, 'number'),
+)
+
+# Writers zone fields, read from the top level of the writers zone data
+WRITERS_FIELDS = (
+    ('writers_zone', None, 'writersZone', 'NEUTRAL', 'category'),
+    ('writers_confidence', None, 'confidence', 0, 'number'),
+    ('put_call_ratio', None, 'putCallPremiumRatio', 1, 'number'),
+    ('market_structure', None, 'marketStructure', 'BALANCED', 'category'),
+    ('max_ce_ltp', None, 'maxCELTP', 0, 'number'),
+    ('max_pe_ltp', None, 'maxPELTP', 0, 'number'),
+    ('support_count', None, 'supportLevels', [], 'list'),
+    ('resistance_count', None, 'resistanceLevels', [], 'list'),
+)
+
+# Rule groups in evaluation order; within a group the first matching rule fires.
+# A rule with no clauses is the group's else branch. Polarity follows the legacy
+# keyword classification, so e.g. HIGH_CE_PREMIUM counts as bearish and
+# STRONG_RESISTANCE as bullish.
+TECHNICAL_RULES = (
+    # RSI Analysis
+    (rule('RSI_OVERSOLD', 'rsi_oversold', ('rsi', '<', 30), polarity=BULLISH),
+     rule('RSI_OVERBOUGHT', 'rsi_overbought', ('rsi', '>', 70), sign=-1, polarity=BEARISH),
+     rule('RSI_NEUTRAL', 'rsi_neutral', ('rsi_status', '==', 'Neutral'))),
+    # EMA Analysis
+    (rule('EMA_BEARISH', 'ema_bearish', ('ema_status', '==', 'Bearish'), sign=-1, polarity=BEARISH),
+     rule('EMA_BULLISH', 'ema_bullish', ('ema_status', '==', 'Bullish'), polarity=BULLISH)),
+    # SMA Analysis
+    (rule('SMA_BEARISH', 'sma_bearish', ('sma_status', '==', 'Bearish'), sign=-1, polarity=BEARISH),
+     rule('SMA_BULLISH', 'sma_bullish', ('sma_status', '==', 'Bullish'), polarity=BULLISH)),
+    # MACD Analysis
+    (rule('MACD_BULLISH', 'macd_bullish', ('macd_status', '==', 'Bullish'), polarity=BULLISH),
+     rule('MACD_BEARISH', 'macd_bearish', ('macd_status', '==', 'Bearish'), sign=-1, polarity=BEARISH),
+     rule('MACD_NEUTRAL', 'macd_neutral')),
+    # VIX Analysis
+    (rule('VIX_CALM', 'vix_calm', ('vix_status', '==', 'Calm Market'), polarity=BULLISH),
+     rule('VIX_HIGH', 'vix_high', ('vix', '>', 18), polarity=BEARISH)),
+    # Bollinger Bands Analysis
+    (rule('BOLLINGER_WITHIN', 'bollinger_within', ('bb_status', '==', 'Within Bands')),
+     rule('BOLLINGER_OVERBOUGHT', 'bollinger_overbought',
+          ('bb_status', 'in', ('Above Upper', 'Overbought')), sign=-1, polarity=BEARISH),
+     rule('BOLLINGER_OVERSOLD', 'bollinger_oversold',
+          ('bb_status', 'in', ('Below Lower', 'Oversold')), polarity=BULLISH)),
+    # CCI Analysis
+    (rule('CCI_SELL', 'cci_sell', ('cci_status', '==', 'Sell'), polarity=BEARISH),
+     rule('CCI_BUY', 'cci_buy', ('cci_status', '==', 'Buy'), polarity=BULLISH)),
+    # SuperTrend Analysis
+    (rule('SUPERTREND_BULLISH', 'supertrend_bullish', ('supertrend_status', '==', 'Bullish'), polarity=BULLISH),
+     rule('SUPERTREND_BEARISH', 'supertrend_bearish', ('supertrend_status', '==', 'Bearish'),
+          sign=-1, polarity=BEARISH)),
+    # Volume Indicators Analysis
+    (rule('VOLUME_WEAK', 'volume_weak', ('volume_status', '==', 'Weak'), polarity=BEARISH),
+     rule('VOLUME_STRONG', 'volume_strong', ('volume_status', '==', 'Strong'), polarity=BULLISH)),
+    # Volume Strength Analysis
+    (rule('VOLUME_STRENGTH_WEAK', 'volume_strength_weak', ('volume_strength', '==', 'Weak Volume'),
+          polarity=BEARISH),
+     rule('VOLUME_STRENGTH_STRONG', 'volume_strength_strong', ('volume_strength', '==', 'Strong Volume'),
+          polarity=BULLISH)),
+    # Aroon Analysis
+    (rule('AROON_UPTREND', 'aroon_uptrend', ('aroon_status', '==', 'Uptrend'), polarity=BULLISH),
+     rule('AROON_DOWNTREND', 'aroon_downtrend', ('aroon_status', '==', 'Downtrend'), sign=-1, polarity=BEARISH)),
+    # Parabolic SAR Analysis
+    (rule('PARABOLIC_BEARISH', 'parabolic_bearish', ('psar_status', '==', 'Bearish'), sign=-1, polarity=BEARISH),
+     rule('PARABOLIC_BULLISH', 'parabolic_bullish', ('psar_status', '==', 'Bullish'), polarity=BULLISH)),
+    # MFI Analysis
+    (rule('MFI_OVERSOLD', 'mfi_oversold', ('mfi_status', '==', 'Oversold'), polarity=BULLISH),
+     rule('MFI_OVERBOUGHT', 'mfi_overbought', ('mfi_status', '==', 'Overbought'), sign=-1, polarity=BEARISH)),
+    # Price Action Analysis
+    (rule('PRICE_RANGING', 'price_ranging', ('price_action', '==', 'Ranging')),
+     rule('PRICE_TRENDING', 'price_trending', ('price_action', '==', 'Trending'))),
+    # ATR Analysis
+    (rule('ATR_HIGH', 'atr_high', ('atr', '>', 25), polarity=BEARISH),
+     rule('ATR_LOW', 'atr_low', ('atr', '<', 15))),
+    # ADX Analysis
+    (rule('ADX_STRONG_TREND', 'adx_strong_trend', ('adx', '>', 25), polarity=BULLISH),),
+    # Stochastic Analysis
+    (rule('STOCHASTIC_OVERSOLD', 'stochastic_oversold', ('stoch', '<', 20), polarity=BULLISH),
+     rule('STOCHASTIC_OVERBOUGHT', 'stochastic_overbought', ('stoch', '>', 80), sign=-1, polarity=BEARISH)),
+)
+
+WRITERS_RULES = (
+    # Writers Zone Direction Analysis
+    (rule('WRITERS_BULLISH', 'writers_bullish',
+          ('writers_zone', '==', 'BULLISH'), ('writers_confidence', '>', 0.3),
+          polarity=BULLISH, scale='writers_confidence'),
+     rule('WRITERS_BEARISH', 'writers_bearish',
+          ('writers_zone', '==', 'BEARISH'), ('writers_confidence', '>', 0.3),
+          sign=-1, polarity=BEARISH, scale='writers_confidence'),
+     rule('WRITERS_NEUTRAL', 'writers_neutral')),
+    # Put-Call Premium Ratio Analysis
+    (rule('PREMIUM_RATIO_PUT_HEAVY', 'premium_ratio_put_heavy', ('put_call_ratio', '>', 1.2), sign=-1),
+     rule('PREMIUM_RATIO_CALL_HEAVY', 'premium_ratio_call_heavy', ('put_call_ratio', '<', 0.8)),
+     rule('PREMIUM_RATIO_BALANCED', 'premium_ratio_balanced')),
+    # Market Structure Analysis
+    (rule('MARKET_STRUCTURE_BULLISH', 'market_structure_bullish',
+          ('market_structure', '==', 'CALL_PREMIUM_HIGH'), polarity=BULLISH),
+     rule('MARKET_STRUCTURE_BEARISH', 'market_structure_bearish',
+          ('market_structure', '==', 'PUT_PREMIUM_HIGH'), sign=-1, polarity=BEARISH)),
+    # Premium Analysis
+    (rule('HIGH_CE_PREMIUM', 'high_ce_premium',
+          ('max_ce_ltp', '>', Ref('max_pe_ltp')), ('max_ce_ltp', '>', 10), polarity=BEARISH),
+     rule('HIGH_PE_PREMIUM', 'high_pe_premium',
+          ('max_pe_ltp', '>', Ref('max_ce_ltp')), ('max_pe_ltp', '>', 10), sign=-1, polarity=BEARISH)),
+    # Support and Resistance Analysis
+    (rule('STRONG_SUPPORT', 'strong_support', ('support_count', '>=', 2), polarity=BULLISH),),
+    (rule('STRONG_RESISTANCE', 'strong_resistance', ('resistance_count', '>=', 2), sign=-1, polarity=BULLISH),),
+)
+
+COMPARISONS = {
+    '<': operator.lt,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+}
+
+
+class RuleTable:
+    """Indicator rules compiled into flat per-signal tables and generated matchers
+
+    Per-signal data (names, weight keys, signs, polarity bits) lives in flat lists
+    indexed by signal code. Each rule set is also compiled into one straight-line
+    function of if/elif chains over a parsed snapshot, so the request path does
+    no table interpretation at all.
+    """
+
+    def __init__(self, technical_fields=TECHNICAL_FIELDS, writers_fields=WRITERS_FIELDS,
+                 technical_rules=TECHNICAL_RULES, writers_rules=WRITERS_RULES):
+        self.technical_fields = technical_fields
+        self.writers_fields = writers_fields
+
+        # Flat per-signal tables, technical signals first, indexed by signal code
+        self.rules = [r for group in technical_rules + writers_rules for r in group]
+        self.signal_names = [r.signal for r in self.rules]
+        self.signal_codes = {name: code for code, name in enumerate(self.signal_names)}
+        self.weight_keys = [r.weight for r in self.rules]
+        self.weight_names = list(dict.fromkeys(self.weight_keys))  # distinct keys in rule order
+        self.signs = [float(r.sign) for r in self.rules]
+        self.bullish = [1 if r.polarity & BULLISH else 0 for r in self.rules]
+        self.bearish = [1 if r.polarity & BEARISH else 0 for r in self.rules]
+        self.technical_count = sum(len(group) for group in technical_rules)
+        self.scale_fields = [r.scale for r in self.rules]
+        self.bullish_by_name = dict(zip(self.signal_names, self.bullish))
+        self.bearish_by_name = dict(zip(self.signal_names, self.bearish))
+
+        self.technical_rule_groups = technical_rules
+        self.writers_rule_groups = writers_rules
+        self.evaluate_technical = self._compile_evaluator(technical_rules, 0)
+        self.evaluate_writers = self._compile_evaluator(writers_rules, self.technical_count)
+
+    def _compile_evaluator(self, groups, first_code):
+        """Generate evaluate(snapshot, weights) -> (fired signal codes, strength)"""
+        lines = ['def evaluate(snapshot, weights):',
+                 '    fired = []',
+                 '    strength = 0']
+        code = first_code
+        for group in groups:
+            keyword = 'if'
+            for r in group:
+                if r.clauses:
+                    condition = ' and '.join(self._render_clause(clause) for clause in r.clauses)
+                    lines.append(f'    {keyword} {condition}:')
+                    keyword = 'elif'
+                else:
+                    lines.append('    else:')
+                term = f'weights[{code}]'
+                if r.scale:
+                    term += f' * snapshot.{r.scale}'
+                lines.append(f'        fired.append({code})  # {r.signal}')
+                lines.append(f'        strength += {term}')
+                code += 1
+        lines.append('    return fired, strength')
+
+        namespace = {}
+        exec('\n'.join(lines), namespace)
+        return namespace['evaluate']
+
+    def _render_clause(self, clause):
+        """Render one (field, comparison, operand) clause as a Python expression"""
+        field, comparison, operand = clause
+        if isinstance(operand, Ref):
+            return f'snapshot.{field} {comparison} snapshot.{operand.field}'
+        return f'snapshot.{field} {comparison} {operand!r}'
+
+    def signed_weights(self, pattern_weights):
+        """Resolve pattern weights into a per-signal vector with the rule sign applied"""
+        return [sign * pattern_weights[key] for sign, key in zip(self.signs, self.weight_keys)]
+
+    def evaluate_columns(self, groups, cols, active):
+        """Vectorized evaluation over field columns; returns one boolean mask per rule"""
+        masks = []
+        for group in groups:
+            remaining = active.copy()
+            for r in group:
+                condition = remaining.copy()
+                for field, comparison, operand in r.clauses:
+                    column = cols[field]
+                    if comparison == 'in':
+                        matched = np.zeros(len(column), dtype=bool)
+                        for option in operand:
+                            matched |= column == option
+                    elif isinstance(operand, Ref):
+                        matched = COMPARISONS[comparison](column, cols[operand.field])
+                    else:
+                        matched = COMPARISONS[comparison](column, operand)
+                    condition &= matched
+                masks.append(condition)
+                remaining &= ~condition
+        return masks
+
+
+RULE_TABLE = RuleTable()
@@ -0,0 +1,144 @@
+"""Symbol-keyed model shards
+
+Each instrument (NIFTY, BANKNIFTY, ...) gets its own ProfessionalTradingAI
+with its own pattern_weights, signal history, accuracy counters, decision
+cache and, when configured, its own shared state file and journal
+directory, so one symbol's outcomes never move another symbol's weights.
+Payloads without a symbol go to the default model. Shards are created on
+first use and never share a lock while scoring; a batch that spans several
+symbols is split per symbol and the groups are scored in parallel on a
+thread pool.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from market_snapshot import SnapshotError
+
+# Symbols double as file and directory names for per-shard state
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9][A-Z0-9_.&-]{0,31}')
+
+
+def normalize_symbol(symbol):
+    """Upper-cased symbol, or None for none; raises SnapshotError on bad input"""
+    if symbol is None or symbol == '':
+        return None
+    if not isinstance(symbol, str):
+        raise SnapshotError('symbol', f"expected a string, got {symbol!r}")
+    normalized = symbol.strip().upper()
+    if not SYMBOL_PATTERN.fullmatch(normalized):
+        raise SnapshotError('symbol', f"expected up to 32 letters, digits or _.&-, got {symbol!r}")
+    return normalized
+
+
+def payload_symbol(request_data):
+    """Symbol named by a /predict payload (object or n8n array format), or None"""
+    if isinstance(request_data, list) and len(request_data) > 0:
+        request_data = request_data[0]
+    if isinstance(request_data, dict):
+        return normalize_symbol(request_data.get('symbol'))
+    return None
+
+
+class ModelRegistry:
+    """Lazily created model per symbol around a default model"""
+
+    def __init__(self, default, factory, max_symbols=32, workers=4):
+        self.default = default
+        self.factory = factory  # symbol -> new model
+        self.max_symbols = max_symbols
+        self.workers = workers
+        self.shards = {}
+        self.lock = threading.Lock()  # only taken to create a shard
+        self.executor = None
+        self.executor_pid = None
+
+    def shard(self, symbol):
+        """Model for a symbol, created on first use; None means the default model"""
+        symbol = normalize_symbol(symbol)
+        if symbol is None:
+            return self.default
+        model = self.shards.get(symbol)
+        if model is None:
+            with self.lock:
+                model = self.shards.get(symbol)
+                if model is None:
+                    if len(self.shards) >= self.max_symbols:
+                        raise SnapshotError('symbol', f"{symbol!r} exceeds the limit of {self.max_symbols} "
+                                                      f"symbols; raise MODEL_MAX_SYMBOLS")
+                    model = self.factory(symbol)
+                    self.shards[symbol] = model
+        return model
+
+    def for_payload(self, request_data):
+        """Model that scores a payload"""
+        return self.shard(payload_symbol(request_data))
+
+    def for_prediction(self, prediction_id):
+        """Model that issued a prediction ID (IDs of symbol shards start with 'SYMBOL:')
+
+        Only an existing shard can have issued one, so an ID never creates a
+        shard; an unknown prefix falls back to the default model.
+        """
+        if isinstance(prediction_id, str) and ':' in prediction_id:
+            try:
+                symbol = normalize_symbol(prediction_id.rsplit(':', 1)[0])
+            except SnapshotError:
+                return self.default
+            return self.shards.get(symbol, self.default)
+        return self.default
+
+    def models(self):
+        """The default model and every symbol shard"""
+        return [self.default] + list(self.shards.values())
+
+    def symbols(self):
+        """Symbols that have a shard"""
+        return sorted(self.shards)
+
+    def professional_signal_generation(self, request_data):
+        """Score one payload on its symbol's model"""
+        return self.for_payload(request_data).professional_signal_generation(request_data)
+
+    def _pool(self):
+        """Thread pool for per-symbol batch groups, started again after a fork"""
+        pid = os.getpid()
+        if self.executor_pid != pid:
+            with self.lock:
+                if self.executor_pid != pid:
+                    self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='shard')
+                    self.executor_pid = pid
+        return self.executor
+
+    def batch_signal_generation(self, snapshots):
+        """Score many payloads, one vectorized pass per symbol, symbols in parallel"""
+        results = [None] * len(snapshots)
+        groups = {}
+        for position, request_data in enumerate(snapshots):
+            try:
+                model = self.for_payload(request_data)
+            except SnapshotError as e:
+                results[position] = {
+                    'signal': 'HOLD',
+                    'confidence': 0.0,
+                    'error': str(e),
+                    'field': e.field,
+                    'timestamp': datetime.now().isoformat()
+                }
+                continue
+            groups.setdefault(id(model), (model, []))[1].append(position)
+
+        def score(group):
+            model, positions = group
+            return positions, model.batch_signal_generation([snapshots[position] for position in positions])
+
+        if len(groups) == 1 or self.workers <= 1:
+            scored = map(score, groups.values())
+        else:
+            scored = self._pool().map(score, groups.values())
+        for positions, group_results in scored:
+            for position, result in zip(positions, group_results):
+                results[position] = result
+        return results
@@ -0,0 +1,103 @@
+"""Incremental learning of pattern_weights from reported trade outcomes
+
+/update_accuracy hands every outcome that names a known prediction to the
+learner, which only queues the prediction's history record. A background
+thread drains the queue every few seconds and turns the batch into one
+vectorized update: each weight moves along its contribution to the traded
+direction's strength, up when the trade was right and down when it was
+wrong. The owner publishes the result by swapping in a new weights dict, so
+/predict never waits on training.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Strength direction of each decision code: HOLD, BUY_CE, BUY_PE
+DECISION_DIRECTIONS = np.array([0.0, 1.0, -1.0])
+
+
+def key_matrix(rules):
+    """Signal x weight-key matrix carrying each rule's sign
+
+    A fired-signal matrix times it gives each weight's share of the
+    strength; a weight-key vector times its transpose gives the signed
+    per-signal weights.
+    """
+    key_index = {key: index for index, key in enumerate(rules.weight_names)}
+    matrix = np.zeros((len(rules.signal_names), len(rules.weight_names)))
+    for code, (sign, key) in enumerate(zip(rules.signs, rules.weight_keys)):
+        matrix[code, key_index[key]] = sign
+    return matrix
+
+
+class OnlineLearner:
+    """Batched perceptron-style updates of pattern_weights off the request path"""
+
+    def __init__(self, rules, publish, learning_rate=0.01, interval=5.0, max_pending=10000):
+        self.publish = publish  # called with a delta vector over rules.weight_names
+        self.learning_rate = learning_rate
+        self.interval = interval
+
+        self.key_matrix = key_matrix(rules)
+        self.scaled = [(code, field) for code, field in enumerate(rules.scale_fields) if field is not None]
+        self.signal_bits = np.left_shift(np.uint64(1), np.arange(len(rules.signal_names), dtype=np.uint64))
+
+        self.pending = deque(maxlen=max_pending)
+        self.lock = threading.Lock()
+        self.worker_pid = None
+        self.updates = 0
+        self.samples = 0
+
+    def submit(self, record, correct):
+        """Queue the history record of a prediction and whether it was right"""
+        self._ensure_worker()
+        self.pending.append((record, correct))
+
+    def _ensure_worker(self):
+        """Start the learning thread in this process (again after a fork)"""
+        pid = os.getpid()
+        if self.worker_pid != pid:
+            with self.lock:
+                if self.worker_pid != pid:
+                    self.pending.clear()
+                    self.worker_pid = pid
+                    threading.Thread(target=self._run, name='online-learner', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.learn()
+            except Exception as e:
+                logger.error(f"Error updating pattern weights: {e}")
+
+    def learn(self):
+        """Fold every queued outcome into one weight update and publish it"""
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        if not batch:
+            return
+        records = np.array([record for record, _ in batch])
+        correct = np.array([outcome for _, outcome in batch], dtype=bool)
+        delta = self.gradient(records, correct)
+        if np.any(delta):
+            self.publish(delta)
+            self.updates += 1
+        self.samples += len(batch)
+        logger.info(f"Learned from {len(batch)} trade outcomes")
+
+    def gradient(self, records, correct):
+        """Weight update for a batch of history records and outcomes"""
+        fired = (records['signal_mask'][:, None] & self.signal_bits) != 0
+        features = fired.astype(np.float64)
+        for code, field in self.scaled:
+            features[:, code] *= records[field]
+        reward = np.where(correct, 1.0, -1.0) * DECISION_DIRECTIONS[records['signal']]
+        return self.learning_rate * (reward @ features @ self.key_matrix) / len(records)
@@ -0,0 +1,388 @@
+"""Offline search for pattern_weights and decision thresholds over recorded outcomes
+
+Reads snapshots labelled with what the market did next (JSONL or Parquet, as
+in backtest.py, with an `outcome` field per payload: BUY_CE/UP, BUY_PE/DOWN,
+HOLD/FLAT, or a signed forward return). Every snapshot is parsed and run
+through the rule table once, giving a snapshot x signal feature matrix (the
+fired signals, scaled where a rule scales its weight). A process pool scores
+blocks of candidates against it: each candidate's weights are resolved into
+signed per-signal weights and the strengths are accumulated one signal
+column at a time in rule order, exactly as live scoring sums them, so a
+strength on a threshold decides the same way here as in production. The
+vectorized decision logic follows, with per-candidate thresholds broadcast
+across the block.
+
+    python optimize.py labelled.jsonl --search random --candidates 5000 --output profiles.json
+    python optimize.py labelled.jsonl --search evolutionary --population 128 --generations 30
+
+Search strategies:
+
+    grid          every combination of --grid-steps values per threshold, base weights
+    random        thresholds drawn from their ranges, weights jittered around the base
+    evolutionary  the best candidates of each generation are crossed and mutated
+
+The output is a WEIGHT_PROFILES_FILE with the base weights as the active
+profile, the best candidates as shadow profiles, and a ranking with each
+profile's accuracy, signal frequency and decision counts.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from ai_model_api_fixed import LEARNED_WEIGHT_LIMIT, SIGNAL_CODES, ProfessionalTradingAI
+from backtest import read_chunks
+from indicator_rules import RULE_TABLE
+from online_learner import key_matrix
+from weight_profiles import DECISION_FIELDS, DEFAULT_THRESHOLDS, parse_profiles
+
+# Search range of each decision threshold
+THRESHOLD_RANGES = {
+    'strong_strength': (1.0, 3.5),
+    'moderate_strength': (0.5, 2.5),
+    'max_vix': (14.0, 26.0),
+    'min_confidence': (0.5, 0.9),
+}
+THRESHOLD_NAMES = tuple(DEFAULT_THRESHOLDS)
+
+# Direction each outcome label says was right: +1 calls, -1 puts, 0 neither
+OUTCOME_DIRECTIONS = {'BUY_CE': 1, 'UP': 1, 'BUY_PE': -1, 'DOWN': -1, 'HOLD': 0, 'FLAT': 0}
+
+ROW_BLOCK = 16384  # snapshots scored at once per candidate block, bounding worker memory
+
+KEY_MATRIX = key_matrix(RULE_TABLE)
+
+_engine = None
+_history = None
+
+
+def outcome_direction(payload, field):
+    """+1, -1 or 0 from a payload's outcome label or forward return; None if unlabelled"""
+    if isinstance(payload, list) and len(payload) > 0:
+        payload = payload[0]
+    value = payload.get(field) if isinstance(payload, dict) else None
+    if isinstance(value, str):
+        return OUTCOME_DIRECTIONS.get(value.upper())
+    if isinstance(value, (int, float)) and value.__class__ is not bool and value - value == 0:
+        return int(np.sign(value))
+    return None
+
+
+def _init_parser():
+    global _engine
+    _engine = ProfessionalTradingAI(offline=True)
+
+
+def prepare_chunk(task):
+    """Parse and rule-evaluate one chunk; returns its columns or None"""
+    raw_rows, outcome_field = task
+    rows = []
+    directions = []
+    invalid = unlabelled = 0
+    for raw in raw_rows:
+        try:
+            payload = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+            direction = outcome_direction(payload, outcome_field)
+            if direction is None:
+                unlabelled += 1
+                continue
+            rows.append(_engine.parse_snapshot(payload))
+            directions.append(direction)
+        except ValueError:  # JSON decode errors and SnapshotError
+            invalid += 1
+    counts = {'rows': len(raw_rows), 'invalid': invalid, 'unlabelled': unlabelled}
+    if not rows:
+        return counts, None
+
+    scores = _engine.score_columns(rows)
+    fired = scores['fired']
+    features = fired.astype(np.float64)
+    for code, field in enumerate(RULE_TABLE.scale_fields):
+        if field is not None:
+            features[:, code] *= scores['cols'][field]
+    return counts, {
+        'features': features,
+        'bullish': fired @ np.array(RULE_TABLE.bullish),
+        'bearish': fired @ np.array(RULE_TABLE.bearish),
+        'direction': np.array(directions, dtype=np.int8),
+        **{name: scores['cols'][name] for name in DECISION_FIELDS}
+    }
+
+
+def load_history(path, outcome_field='outcome', workers=None, chunk_size=5000):
+    """Labelled snapshot matrices for the whole input, built in a process pool"""
+    parts = []
+    counts = {'rows': 0, 'invalid': 0, 'unlabelled': 0}
+    tasks = ((rows, outcome_field) for _, rows in read_chunks(path, chunk_size))
+    with ProcessPoolExecutor(workers, initializer=_init_parser) as pool:
+        for chunk_counts, part in pool.map(prepare_chunk, tasks):
+            for key in counts:
+                counts[key] += chunk_counts[key]
+            if part is not None:
+                parts.append(part)
+    if not parts:
+        raise SystemExit(f"No labelled snapshots found in {path}")
+    history = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    return history, counts
+
+
+def _init_evaluator(history):
+    global _engine, _history
+    _engine = ProfessionalTradingAI(offline=True)
+    _history = history
+
+
+def candidate_strength(features, signal_weights, rules=RULE_TABLE):
+    """Snapshots x candidates strengths, summed like score_columns
+
+    Terms are added one signal column at a time in rule order, technical and
+    writers zone signals apart, so every strength is bit-identical to the
+    live one; a matrix product sums in another order and can tip a strength
+    sitting on a threshold.
+    """
+    tech_strength = np.zeros((len(features), len(signal_weights)))
+    writers_strength = np.zeros((len(features), len(signal_weights)))
+    for code in range(features.shape[1]):
+        term = features[:, code, None] * signal_weights[:, code]
+        if code < rules.technical_count:
+            tech_strength += term
+        else:
+            writers_strength += term
+    return tech_strength + writers_strength
+
+
+def evaluate(task):
+    """Decision counts and correct trades for a block of candidates
+
+    task is (weights, thresholds): candidates x weight keys and candidates x
+    THRESHOLD_NAMES. Returns (decision counts candidates x 3, correct trades).
+    """
+    weights, thresholds = task
+    history = _history
+    signal_weights = weights @ KEY_MATRIX.T  # candidates x signals, rule signs applied
+    threshold_columns = {name: thresholds[:, index] for index, name in enumerate(THRESHOLD_NAMES)}
+    decisions = np.zeros((len(weights), len(SIGNAL_CODES)), dtype=np.int64)
+    correct = np.zeros(len(weights), dtype=np.int64)
+    for start in range(0, len(history['direction']), ROW_BLOCK):
+        block = slice(start, start + ROW_BLOCK)
+        strength = candidate_strength(history['features'][block], signal_weights)
+        cols = {name: history[name][block, None] for name in DECISION_FIELDS}
+        codes, _ = _engine.batch_decisions(cols, strength, history['bullish'][block, None],
+                                           history['bearish'][block, None], threshold_columns)
+        codes = np.asarray(codes)
+        direction = history['direction'][block, None]
+        for code in range(len(SIGNAL_CODES)):
+            decisions[:, code] += (codes == code).sum(axis=0)
+        correct += (((codes == 1) & (direction > 0)) | ((codes == 2) & (direction < 0))).sum(axis=0)
+    return decisions, correct
+
+
+class Search:
+    """Candidate generation around base weights within the threshold ranges"""
+
+    def __init__(self, base_weights, base_thresholds, weight_spread=0.5, seed=42):
+        self.base_weights = base_weights
+        self.base_thresholds = base_thresholds
+        self.weight_spread = weight_spread
+        self.low = np.array([THRESHOLD_RANGES[name][0] for name in THRESHOLD_NAMES])
+        self.high = np.array([THRESHOLD_RANGES[name][1] for name in THRESHOLD_NAMES])
+        self.rng = np.random.default_rng(seed)
+
+    def clip(self, weights, thresholds):
+        """Keep candidates inside the weight limit and threshold ranges, rounded for profiles"""
+        return (np.round(np.clip(weights, -LEARNED_WEIGHT_LIMIT, LEARNED_WEIGHT_LIMIT), 4),
+                np.round(np.clip(thresholds, self.low, self.high), 4))
+
+    def grid(self, steps):
+        thresholds = np.array(list(product(*[np.linspace(low, high, steps)
+                                             for low, high in zip(self.low, self.high)])))
+        return self.clip(np.tile(self.base_weights, (len(thresholds), 1)), thresholds)
+
+    def random(self, count):
+        noise = self.rng.uniform(-self.weight_spread, self.weight_spread, (count, len(self.base_weights)))
+        thresholds = self.rng.uniform(self.low, self.high, (count, len(self.low)))
+        return self.clip(self.base_weights + noise, thresholds)
+
+    def offspring(self, weights, thresholds, count, sigma):
+        """Uniform crossover of random parent pairs plus Gaussian mutation"""
+        parents = self.rng.integers(0, len(weights), (count, 2))
+        weight_mask = self.rng.random((count, weights.shape[1])) < 0.5
+        threshold_mask = self.rng.random((count, thresholds.shape[1])) < 0.5
+        child_weights = np.where(weight_mask, weights[parents[:, 0]], weights[parents[:, 1]])
+        child_thresholds = np.where(threshold_mask, thresholds[parents[:, 0]], thresholds[parents[:, 1]])
+        child_weights = child_weights + self.rng.normal(0, sigma * self.weight_spread, child_weights.shape)
+        child_thresholds = child_thresholds + self.rng.normal(0, sigma * (self.high - self.low) / 4,
+                                                              child_thresholds.shape)
+        return self.clip(child_weights, child_thresholds)
+
+
+def objective(decisions, correct, rows, kind='accuracy', min_frequency=0.05):
+    """Score to maximize per candidate
+
+    accuracy: correct trades / trades, scaled down for candidates trading on
+    fewer than min_frequency of the snapshots. net: (correct - wrong) trades
+    per snapshot.
+    """
+    trades = decisions[:, 1:].sum(axis=1)
+    if kind == 'net':
+        return (2 * correct - trades) / rows
+    accuracy = np.divide(correct, trades, out=np.zeros(len(trades)), where=trades > 0)
+    frequency = trades / rows
+    return accuracy * np.minimum(frequency / min_frequency, 1.0) if min_frequency > 0 else accuracy
+
+
+def score_candidates(pool, weights, thresholds, workers, block_size):
+    """Evaluate candidates in blocks across the pool"""
+    tasks = [(weights[start:start + block_size], thresholds[start:start + block_size])
+             for start in range(0, len(weights), block_size)]
+    results = list(pool.map(evaluate, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def run_search(history, base_weights, base_thresholds, search='random', candidates=2000, grid_steps=5,
+               population=64, generations=20, elite=0.25, weight_spread=0.5, kind='accuracy',
+               min_frequency=0.05, workers=None, block_size=32, seed=42):
+    """Evaluate candidates; returns (weights, thresholds, decision counts, correct) of all of them"""
+    workers = workers or os.cpu_count() or 1
+    space = Search(base_weights, base_thresholds, weight_spread, seed)
+    rows = len(history['direction'])
+    base = (base_weights[None, :], base_thresholds[None, :])
+    archive = []
+    with ProcessPoolExecutor(workers, initializer=_init_evaluator, initargs=(history,)) as pool:
+        def scored(candidate_weights, candidate_thresholds):
+            decisions, correct = score_candidates(pool, candidate_weights, candidate_thresholds,
+                                                  workers, block_size)
+            archive.append((candidate_weights, candidate_thresholds, decisions, correct))
+            return objective(decisions, correct, rows, kind, min_frequency)
+
+        scored(*base)
+        if search == 'grid':
+            scored(*space.grid(grid_steps))
+        elif search == 'random':
+            scored(*space.random(candidates))
+        else:
+            weights, thresholds = space.random(population)
+            fitness = scored(weights, thresholds)
+            elite_count = max(2, int(population * elite))
+            for generation in range(generations):
+                # Elites survive unchanged; only their offspring are scored
+                best = np.argsort(-fitness, kind='stable')[:elite_count]
+                sigma = 0.5 * (1 - generation / generations) + 0.05  # mutation shrinks as the search settles
+                child_weights, child_thresholds = space.offspring(weights[best], thresholds[best],
+                                                                  population - elite_count, sigma)
+                weights = np.concatenate([weights[best], child_weights])
+                thresholds = np.concatenate([thresholds[best], child_thresholds])
+                fitness = np.concatenate([fitness[best], scored(child_weights, child_thresholds)])
+                print(f"Generation {generation + 1}/{generations}: best {fitness.max():.4f}", file=sys.stderr)
+
+    return tuple(np.concatenate([entry[index] for entry in archive]) for index in range(4))
+
+
+def build_profiles(weights, thresholds, decisions, correct, rows, top=10, kind='accuracy', min_frequency=0.05,
+                   prefix='opt'):
+    """WEIGHT_PROFILES_FILE document: baseline active, the top candidates as ranked shadows"""
+    fitness = objective(decisions, correct, rows, kind, min_frequency)
+    order = []
+    seen = {(weights[0].tobytes(), thresholds[0].tobytes())}
+    for index in np.argsort(-fitness, kind='stable'):
+        candidate = (weights[index].tobytes(), thresholds[index].tobytes())
+        if candidate not in seen and len(order) < top:
+            seen.add(candidate)
+            order.append(index)
+    names = RULE_TABLE.weight_names
+    profiles = {}
+    ranking = []
+    for rank, index in enumerate([0] + order):
+        name = 'baseline' if rank == 0 else f'{prefix}-{rank:02d}'
+        profiles[name] = {
+            'pattern_weights': dict(zip(names, weights[index].tolist())),
+            'thresholds': dict(zip(THRESHOLD_NAMES, thresholds[index].tolist()))
+        }
+        trades = int(decisions[index, 1:].sum())
+        ranking.append({
+            'profile': name,
+            'objective': round(float(fitness[index]), 4),
+            'accuracy': round(int(correct[index]) / trades, 4) if trades else 0.0,
+            'signal_frequency': round(trades / rows, 4),
+            'trades': trades,
+            'correct': int(correct[index]),
+            'decisions': dict(zip(SIGNAL_CODES, decisions[index].tolist()))
+        })
+    return {
+        'active': 'baseline',
+        'shadows': [entry['profile'] for entry in ranking[1:]],
+        'profiles': profiles,
+        'ranking': ranking
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search pattern_weights and decision thresholds offline")
+    parser.add_argument('input', help="JSONL or .parquet file of snapshots with an outcome field")
+    parser.add_argument('--outcome-field', default='outcome',
+                        help="payload field holding BUY_CE/UP, BUY_PE/DOWN, HOLD/FLAT or a signed return")
+    parser.add_argument('--search', choices=('grid', 'random', 'evolutionary'), default='random')
+    parser.add_argument('--candidates', type=int, default=2000, help="random search candidates")
+    parser.add_argument('--grid-steps', type=int, default=5, help="grid values per threshold")
+    parser.add_argument('--population', type=int, default=64, help="evolutionary population size")
+    parser.add_argument('--generations', type=int, default=20, help="evolutionary generations")
+    parser.add_argument('--weight-spread', type=float, default=0.5, help="largest weight change from the base")
+    parser.add_argument('--objective', choices=('accuracy', 'net'), default='accuracy')
+    parser.add_argument('--min-frequency', type=float, default=0.05,
+                        help="trade share below which the accuracy objective is scaled down")
+    parser.add_argument('--base', help="profiles file whose active profile is the starting point")
+    parser.add_argument('--top', type=int, default=10, help="profiles kept in the output")
+    parser.add_argument('--output', help="write the profiles file here instead of stdout")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--block-size', type=int, default=32, help="candidates scored per task")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    history, counts = load_history(args.input, args.outcome_field, args.workers)
+    rows = len(history['direction'])
+    print(f"Loaded {rows} labelled snapshots ({counts['invalid']} invalid, {counts['unlabelled']} unlabelled) "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    default_weights = ProfessionalTradingAI(offline=True).default_pattern_weights
+    pattern_weights, thresholds = default_weights, DEFAULT_THRESHOLDS
+    if args.base:
+        with open(args.base) as base_file:
+            active, _ = parse_profiles(json.load(base_file), default_weights)
+        pattern_weights, thresholds = active.pattern_weights, active.thresholds
+    base_weights = np.array([pattern_weights[name] for name in RULE_TABLE.weight_names])
+    base_thresholds = np.array([thresholds[name] for name in THRESHOLD_NAMES])
+
+    started = time.perf_counter()
+    results = run_search(history, base_weights, base_thresholds, args.search, args.candidates, args.grid_steps,
+                         args.population, args.generations, weight_spread=args.weight_spread,
+                         kind=args.objective, min_frequency=args.min_frequency, workers=args.workers,
+                         block_size=args.block_size, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    document = build_profiles(*results, rows, args.top, args.objective, args.min_frequency, f'opt-{args.search}')
+    document['search'] = {
+        'strategy': args.search,
+        'objective': args.objective,
+        'min_frequency': args.min_frequency,
+        'candidates': len(results[0]),
+        'snapshots': rows,
+        'elapsed_seconds': round(elapsed, 3),
+        'seed': args.seed
+    }
+
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    print(f"Scored {len(results[0])} candidates on {rows} snapshots in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
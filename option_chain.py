@@ -0,0 +1,137 @@
+"""Writers zone analysis derived from a raw option chain
+
+Turns per-strike CE/PE LTP, open interest and change in open interest into
+the writers zone fields /predict otherwise expects precomputed (writersZone,
+confidence, putCallPremiumRatio, marketStructure, maxCELTP/maxPELTP and the
+support/resistance lists). Everything is whole-array NumPy math over the
+strike columns, so chains with hundreds of strikes take microseconds.
+"""
+import numpy as np
+
+from market_snapshot import SnapshotError
+
+# Chain columns: (payload key, required)
+CHAIN_COLUMNS = (
+    ('strikes', True),
+    ('ceLTP', True),
+    ('peLTP', True),
+    ('ceOI', True),
+    ('peOI', True),
+    ('ceOIChange', False),
+    ('peOIChange', False),
+)
+
+# Net writer imbalance (-1..1) beyond which the zone leans bullish or bearish
+ZONE_THRESHOLD = 0.1
+
+# Strikes whose open interest is at least this share of the side's maximum
+# count as support (puts below spot) or resistance (calls above spot)
+LEVEL_OI_SHARE = 0.5
+MAX_LEVELS = 5
+
+
+def parse_chain(chain):
+    """Validate a columnar option chain into one (column, strike) float matrix"""
+    if not isinstance(chain, dict):
+        raise SnapshotError('optionChain', f"expected an object, got {chain!r}")
+    strike_count = None
+    lists = []
+    for key, required in CHAIN_COLUMNS:
+        path = f"optionChain.{key}"
+        values = chain.get(key)
+        if values is None and not required:
+            values = [0] * strike_count  # no OI change reported
+        if not isinstance(values, list) or not values:
+            raise SnapshotError(path, f"expected a non-empty list of numbers, got {values!r}")
+        if strike_count is None:
+            strike_count = len(values)
+        elif len(values) != strike_count:
+            raise SnapshotError(path, f"expected {strike_count} values, one per strike")
+        lists.append(values)
+
+    # One conversion and one finiteness check for the whole chain
+    try:
+        matrix = np.array(lists, dtype=np.float64)
+    except (TypeError, ValueError, OverflowError):  # OverflowError: an integer too large for a float
+        matrix = None
+    finite = np.isfinite(matrix).all(axis=1) if matrix is not None and matrix.ndim == 2 else None
+    if finite is None or not finite.all():
+        for (key, _), values in zip(CHAIN_COLUMNS, lists):
+            try:
+                if np.isfinite(np.array(values, dtype=np.float64)).all():
+                    continue
+            except (TypeError, ValueError, OverflowError):
+                pass
+            raise SnapshotError(f"optionChain.{key}", "expected a list of finite numbers")
+    return matrix
+
+
+def _spot(chain, strikes, ce_ltp, pe_ltp, ltp):
+    """Underlying price: explicit spot, else the payload LTP, else the parity strike"""
+    for value, path in ((chain.get('spot'), 'optionChain.spot'), (ltp, 'LTP')):
+        if value is None:
+            continue
+        try:
+            spot = float(value)
+        except (TypeError, ValueError, OverflowError):
+            raise SnapshotError(path, f"expected a finite number, got {value!r}")
+        if spot > 0 and np.isfinite(spot):
+            return spot
+    # Near the money CE and PE premiums are closest
+    return float(strikes[np.argmin(np.abs(ce_ltp - pe_ltp))])
+
+
+def _levels(strikes, oi, side):
+    """Strikes on one side of spot holding a large share of that side's OI, largest first"""
+    side_oi = np.where(side, oi, 0.0)
+    if not side_oi.any():
+        return [], None
+    significant = np.flatnonzero(side_oi >= LEVEL_OI_SHARE * side_oi.max())
+    ranked = significant[np.argsort(-side_oi[significant], kind='stable')][:MAX_LEVELS]
+    weighted = float(np.dot(strikes, side_oi) / side_oi.sum())
+    return strikes[ranked].tolist(), round(weighted, 2)
+
+
+def derive_writers_zone(chain, ltp=None):
+    """Writers zone payload fields computed from a raw option chain"""
+    strikes, ce_ltp, pe_ltp, ce_oi, pe_oi, ce_change, pe_change = parse_chain(chain)
+    spot = _spot(chain, strikes, ce_ltp, pe_ltp, ltp)
+
+    # Fresh put writing is support building (bullish), fresh call writing resistance (bearish)
+    activity = np.abs(ce_change).sum() + np.abs(pe_change).sum()
+    imbalance = float((pe_change.sum() - ce_change.sum()) / activity) if activity > 0 else 0.0
+    if imbalance > ZONE_THRESHOLD:
+        zone = 'BULLISH'
+    elif imbalance < -ZONE_THRESHOLD:
+        zone = 'BEARISH'
+    else:
+        zone = 'NEUTRAL'
+
+    # OI-weighted premium on each side
+    call_premium = float(np.dot(ce_ltp, ce_oi))
+    put_premium = float(np.dot(pe_ltp, pe_oi))
+    ratio = put_premium / call_premium if call_premium > 0 else 1.0
+    if ratio > 1.2:
+        structure = 'PUT_PREMIUM_HIGH'
+    elif ratio < 0.8:
+        structure = 'CALL_PREMIUM_HIGH'
+    else:
+        structure = 'BALANCED'
+
+    support, weighted_support = _levels(strikes, pe_oi, strikes <= spot)
+    resistance, weighted_resistance = _levels(strikes, ce_oi, strikes >= spot)
+
+    return {
+        'writersZone': zone,
+        'confidence': round(abs(imbalance), 3),
+        'putCallPremiumRatio': round(ratio, 3),
+        'marketStructure': structure,
+        # Premium at the strike the writers defend most (highest OI)
+        'maxCELTP': float(ce_ltp[np.argmax(ce_oi)]),
+        'maxPELTP': float(pe_ltp[np.argmax(pe_oi)]),
+        'supportLevels': support,
+        'resistanceLevels': resistance,
+        'oiWeightedSupport': weighted_support,
+        'oiWeightedResistance': weighted_resistance,
+        'spot': spot,
+    }
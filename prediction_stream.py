@@ -0,0 +1,121 @@
+"""Generator pipeline behind the streaming prediction endpoint
+
+A client keeps one connection open and writes one /predict payload per line
+(NDJSON). Each stage is a generator: lines are read off the request body as
+they arrive, decoded, scored and encoded in the requested framing, so every
+decision goes back on the wire as soon as its snapshot has been read. Bad
+lines produce an error record in place and the stream carries on.
+"""
+import json
+from datetime import datetime
+
+from market_snapshot import SnapshotError
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SSE_MIMETYPE = 'text/event-stream'
+
+
+def read_arrivals(stream, size=65536):
+    """Yield request body data as soon as it arrives, not once a full buffer is read"""
+    reader = getattr(stream, 'reader', None)
+    if hasattr(reader, 'parser') and hasattr(reader, 'buf'):
+        # gunicorn's chunked body reads block until `size` bytes are in, which
+        # would hold a short tick back until the next ones arrive; read one
+        # byte, then exactly what its chunk left buffered
+        while True:
+            data = reader.read(1)
+            if not data:
+                return
+            yield data + reader.read(reader.buf.tell())
+    else:
+        while True:
+            data = stream.readline(size)
+            if not data:
+                return
+            yield data
+
+
+def read_lines(stream, max_line_bytes):
+    """Yield (line number, raw line) for each non-blank line, or None for an oversized one"""
+    number = 0
+    pending = b''
+    oversized = False
+    for data in read_arrivals(stream):
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if oversized:
+                # Tail of a line already reported as too long
+                oversized = False
+                continue
+            number += 1
+            if len(line) > max_line_bytes:
+                yield number, None
+            elif line.strip():
+                yield number, line
+        if len(pending) > max_line_bytes:
+            if not oversized:
+                number += 1
+                yield number, None
+            oversized = True
+            pending = b''
+    if pending.strip() and not oversized:
+        number += 1
+        yield number, pending
+
+
+def decode(lines):
+    """Yield (line number, payload or the error it raised)"""
+    for number, line in lines:
+        if line is None:
+            yield number, ValueError("Line too long")
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+
+
+def score(items, generate, summary):
+    """Yield one decision record per decoded payload, tagged with its line number"""
+    for number, payload in items:
+        summary['received'] += 1
+        try:
+            if isinstance(payload, Exception):
+                raise payload
+            if not payload:
+                raise ValueError("No data provided")
+            result = generate(payload)
+        except (SnapshotError, ValueError) as e:
+            summary['rejected'] += 1
+            result = {
+                'signal': 'HOLD',
+                'confidence': 0.0,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }
+            if isinstance(e, SnapshotError):
+                result['field'] = e.field
+        result['line'] = number
+        yield result
+
+
+def encode_ndjson(results):
+    """Frame each record as one compact JSON line"""
+    for result in results:
+        yield json.dumps(result, separators=(',', ':')) + '\n'
+
+
+def encode_sse(results):
+    """Frame each record as a Server-Sent Event"""
+    for result in results:
+        event = 'error' if 'error' in result else 'prediction'
+        yield f"event: {event}\nid: {result['line']}\ndata: {json.dumps(result, separators=(',', ':'))}\n\n"
+
+
+def prediction_stream(stream, generate, sse=False, max_line_bytes=1 << 20, summary=None):
+    """Full pipeline from a request body stream to encoded response chunks"""
+    summary = summary if summary is not None else {}
+    summary.update(received=0, rejected=0)
+    results = score(decode(read_lines(stream, max_line_bytes)), generate, summary)
+    return encode_sse(results) if sse else encode_ndjson(results)
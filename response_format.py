@@ -0,0 +1,131 @@
+"""Negotiated response encodings: JSON, compact JSON, MessagePack, gzip
+
+Clients pick a body format with the Accept header (or ?format=):
+
+    application/json                           the default, unchanged responses
+    application/vnd.trading-ai.compact+json    decisions as codes, fired signals
+                                               as one bitmask, epoch timestamps
+    application/msgpack                        the compact form as MessagePack
+                                               (needs the msgpack package)
+
+?fields=signal,confidence,analysis.market_regime keeps only the listed
+(dotted) fields, named as the chosen format names them (signal_mask when
+compact); lists are projected item by item, so
+fields=recent_signals.ltp on /get_stats keeps the LTP of every recent signal.
+Bodies of at least gzip_min_bytes are gzipped for clients that accept it.
+Decision codes index SIGNAL_CODES and bit i of a signal mask is the i-th
+signal name, both listed by GET /codes.
+"""
+import gzip
+from datetime import datetime
+from functools import lru_cache
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import msgpack
+except ImportError:  # optional; MessagePack is then not offered
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+COMPACT_MIMETYPE = 'application/vnd.trading-ai.compact+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+FORMATS = {'json': JSON_MIMETYPE, 'compact': COMPACT_MIMETYPE, 'msgpack': MSGPACK_MIMETYPE}
+MIMETYPE_FORMATS = {JSON_MIMETYPE: 'json', COMPACT_MIMETYPE: 'compact', MSGPACK_MIMETYPE: 'msgpack',
+                    'application/x-msgpack': 'msgpack'}
+
+# Response keys holding fired signal names, replaced by 'signal_mask' when compact
+SIGNAL_LIST_KEYS = ('detected_signals', 'all_signals')
+
+
+@lru_cache(maxsize=256)
+def parse_fields(fields):
+    """Nested dict of requested fields from 'a,b.c'; None marks a whole value"""
+    tree = {}
+    for path in fields.split(','):
+        parts = [part for part in path.strip().split('.') if part]
+        node = tree
+        for index, part in enumerate(parts):
+            if index == len(parts) - 1:
+                node[part] = None
+            elif node.get(part, 0) is not None:
+                node = node.setdefault(part, {})
+            else:
+                break  # the whole parent is already selected
+    return tree
+
+
+def project(value, tree):
+    """Keep only the fields in tree; lists are projected element-wise"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+class ResponseEncoder:
+    """Encodes response payloads in the format a request negotiated"""
+
+    def __init__(self, signal_names, decision_names, dumps, gzip_min_bytes=1024):
+        self.signal_bits = {name: 1 << code for code, name in enumerate(signal_names)}
+        self.decision_codes = {name: code for code, name in enumerate(decision_names)}
+        self.dumps = dumps  # JSON serializer matching the app's jsonify
+        self.gzip_min_bytes = gzip_min_bytes
+        self.offered = [JSON_MIMETYPE, COMPACT_MIMETYPE] + ([MSGPACK_MIMETYPE, 'application/x-msgpack']
+                                                            if msgpack is not None else [])
+
+    def choose(self, accept=None, requested=None):
+        """'json', 'compact' or 'msgpack' from ?format= or the Accept header"""
+        if requested in FORMATS and (requested != 'msgpack' or msgpack is not None):
+            return requested
+        if not accept:
+            return 'json'
+        best = parse_accept_header(accept, MIMEAccept).best_match(self.offered, default=JSON_MIMETYPE)
+        return MIMETYPE_FORMATS[best]
+
+    def compact(self, value):
+        """Decisions as codes, signal lists as bitmasks and ISO timestamps as epoch seconds"""
+        if isinstance(value, list):
+            return [self.compact(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for key, item in value.items():
+            if key in SIGNAL_LIST_KEYS and isinstance(item, list):
+                mask = 0
+                for name in item:
+                    mask |= self.signal_bits.get(name, 0)
+                result['signal_mask'] = mask
+            elif key == 'signal' and item in self.decision_codes:
+                result[key] = self.decision_codes[item]
+            elif key == 'timestamp' and isinstance(item, str):
+                try:
+                    result[key] = round(datetime.fromisoformat(item).timestamp(), 6)
+                except ValueError:
+                    result[key] = item
+            else:
+                result[key] = self.compact(item)
+        return result
+
+    def encode(self, payload, accept=None, accept_encoding=None, requested=None, fields=None):
+        """(body bytes, headers) for a payload in the negotiated format"""
+        kind = self.choose(accept, requested)
+        if kind != 'json':
+            payload = self.compact(payload)
+        if fields:
+            payload = project(payload, parse_fields(fields))  # names as the chosen format spells them
+        if kind == 'msgpack':
+            body = msgpack.packb(payload)
+        else:
+            body = (self.dumps(payload) + '\n').encode()
+        headers = {'Content-Type': FORMATS[kind], 'Vary': 'Accept, Accept-Encoding'}
+        if (self.gzip_min_bytes > 0 and len(body) >= self.gzip_min_bytes and accept_encoding
+                and parse_accept_header(accept_encoding)['gzip'] > 0):
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
@@ -0,0 +1,277 @@
+"""Accuracy counters and signal history shared across gunicorn workers
+
+Every gunicorn worker builds its own ProfessionalTradingAI. When
+SHARED_STATE_FILE is set, all workers map the same file, and each worker
+claims a private slot there for its accuracy counters and history ring.
+Writers only touch their own slot, so /predict and /update_accuracy never
+take a cross-process lock. /health and /get_stats sum the counters and merge
+the rings of every slot. A slot left by a dead worker is handed to the next
+worker, together with its counts.
+
+Each slot ends with the worker's /metrics counters and its /get_stats
+aggregates, which are summed the same way.
+
+The file also holds one pattern_weights vector that the online learner
+publishes for all workers. It is guarded by a sequence counter (odd while a
+write is in progress), so readers copy it without locking. A tag next to it
+names the weight profile the vector started from.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from signal_history import HISTORY_DTYPE, SignalHistory, page_rings
+
+# magic, slots, record size, capacity, weight count, metric count, analytics count
+HEADER = struct.Struct('<8sIIQIII')
+HEADER_MAGIC = b'TAISTAT5'
+HEADER_SIZE = 64
+
+# int64 counters at the start of every slot
+OWNER, CORRECT, TOTAL, APPENDED = range(4)
+COUNTERS_SIZE = 4 * 8
+
+# Slots are padded to whole cache lines so workers never write the same line
+CACHE_LINE = 64
+
+# History locations pack the slot above the ring sequence number
+LOCATION_BITS = 48
+
+
+def _process_alive(pid):
+    """Check whether a process id still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedStateFile:
+    """Memory-mapped file split into one fixed-size slot per worker"""
+
+    def __init__(self, path, slots, capacity, weight_count=0, metric_count=0, analytics_count=0):
+        self.path = path
+        self.slots = slots
+        self.capacity = capacity
+        weights_size = -(-(16 + weight_count * 8) // CACHE_LINE) * CACHE_LINE
+        slots_offset = HEADER_SIZE + weights_size
+        metrics_offset = -(-(COUNTERS_SIZE + capacity * HISTORY_DTYPE.itemsize) // 8) * 8
+        analytics_offset = metrics_offset + metric_count * 8
+        slot_bytes = analytics_offset + analytics_count * 8
+        self.slot_size = -(-slot_bytes // CACHE_LINE) * CACHE_LINE
+        self.size = slots_offset + slots * self.slot_size
+        self.header = HEADER.pack(HEADER_MAGIC, slots, HISTORY_DTYPE.itemsize, capacity, weight_count,
+                                  metric_count, analytics_count)
+
+        self.map = self._open()
+        self.weights_version = np.ndarray(1, dtype=np.int64, buffer=self.map, offset=HEADER_SIZE)
+        self.weights_tag = np.ndarray(1, dtype=np.int64, buffer=self.map, offset=HEADER_SIZE + 8)
+        self.weights = np.ndarray(weight_count, dtype=np.float64, buffer=self.map, offset=HEADER_SIZE + 16)
+        # Strided view over the counters of every slot, one row per slot
+        self.counters = np.ndarray((slots, 4), dtype=np.int64, buffer=self.map,
+                                   offset=slots_offset, strides=(self.slot_size, 8))
+        self.metrics = np.ndarray((slots, metric_count), dtype=np.float64, buffer=self.map,
+                                  offset=slots_offset + metrics_offset, strides=(self.slot_size, 8))
+        self.analytics = np.ndarray((slots, analytics_count), dtype=np.float64, buffer=self.map,
+                                    offset=slots_offset + analytics_offset, strides=(self.slot_size, 8))
+        self.records = [
+            np.ndarray(capacity, dtype=HISTORY_DTYPE, buffer=self.map,
+                       offset=slots_offset + index * self.slot_size + COUNTERS_SIZE)
+            for index in range(slots)
+        ]
+        self.owner_pid = None
+        self.slot = None
+        self.claim_lock = threading.Lock()
+
+    def _locked(self):
+        """Open the companion lock file and take an exclusive flock on it"""
+        lock_file = open(f"{self.path}.lock", 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _open(self):
+        """Map the state file, creating it when missing or laid out differently"""
+        with self._locked():
+            try:
+                with open(self.path, 'rb') as existing:
+                    current = existing.read(HEADER.size)
+                    reusable = current == self.header and os.fstat(existing.fileno()).st_size == self.size
+            except FileNotFoundError:
+                reusable = False
+
+            self.created = not reusable
+            if not reusable:
+                # Build the new file aside and rename it in, so workers still
+                # mapping an old layout keep their own copy instead of crashing
+                staging = f"{self.path}.{os.getpid()}.tmp"
+                with open(staging, 'wb') as new_file:
+                    new_file.truncate(self.size)
+                    new_file.write(self.header)
+                os.replace(staging, self.path)
+
+            with open(self.path, 'r+b') as state_file:
+                return mmap.mmap(state_file.fileno(), self.size)
+
+    def own_slot(self):
+        """Index of this process's slot, claimed on first use after start or fork"""
+        pid = os.getpid()
+        if self.owner_pid != pid:
+            with self.claim_lock:
+                if self.owner_pid != pid:
+                    self.slot = self._claim(pid)
+                    self.owner_pid = pid
+        return self.slot
+
+    def _claim(self, pid):
+        """Take a free slot, or the slot of a worker that has exited"""
+        with self._locked():
+            owners = [int(owner) for owner in self.counters[:, OWNER]]
+            if pid in owners:
+                return owners.index(pid)
+            for index, owner in enumerate(owners):
+                if owner == 0 or not _process_alive(owner):
+                    self.counters[index, OWNER] = pid
+                    return index
+        raise RuntimeError(f"All {self.slots} shared state slots are in use; raise SHARED_STATE_SLOTS")
+
+    def read_weights(self):
+        """Return (version, weights copy); version 0 means none were published"""
+        while True:
+            version = int(self.weights_version[0])
+            if version % 2 == 0:
+                weights = self.weights.copy()
+                if int(self.weights_version[0]) == version:
+                    return version, weights
+            time.sleep(0)
+
+    def publish_weights(self, update, tag=None):
+        """Replace the weights with update(current or None) for every worker
+
+        A tag marks weights loaded from a weight profile; updates without
+        one keep the current tag.
+        """
+        with self._locked():
+            version = int(self.weights_version[0])
+            weights = update(self.weights.copy() if version else None)
+            self.weights_version[0] = version + 1
+            self.weights[:] = weights
+            if tag is not None:
+                self.weights_tag[0] = tag
+            self.weights_version[0] = version + 2
+
+
+class AccuracyTracker:
+    """Prediction outcome counters for a single process"""
+
+    def __init__(self):
+        self.correct = 0
+        self.total = 0
+
+    def record(self, correct):
+        """Count one reported outcome"""
+        self.total += 1
+        if correct:
+            self.correct += 1
+
+    def accuracy(self):
+        """Fraction of reported outcomes that were correct"""
+        return self.correct / self.total if self.total > 0 else 0.0
+
+    def restore(self, correct, total):
+        """Add counts recovered from the decision journal"""
+        self.correct += correct
+        self.total += total
+
+
+class SharedAccuracyTracker:
+    """Outcome counters kept per worker slot and summed over all workers"""
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.lock = threading.Lock()
+
+    @property
+    def correct(self):
+        return int(self.shared.counters[:, CORRECT].sum())
+
+    @property
+    def total(self):
+        return int(self.shared.counters[:, TOTAL].sum())
+
+    def record(self, correct):
+        """Count one reported outcome in this worker's slot"""
+        counters = self.shared.counters[self.shared.own_slot()]
+        with self.lock:
+            counters[TOTAL] += 1
+            if correct:
+                counters[CORRECT] += 1
+
+    def restore(self, correct, total):
+        """Add counts recovered from the decision journal to this worker's slot"""
+        counters = self.shared.counters[self.shared.own_slot()]
+        with self.lock:
+            counters[CORRECT] += correct
+            counters[TOTAL] += total
+
+    def accuracy(self):
+        """Fraction of reported outcomes that were correct, across all workers"""
+        correct, total = self.shared.counters[:, [CORRECT, TOTAL]].sum(axis=0)
+        return int(correct) / int(total) if total > 0 else 0.0
+
+
+class SharedSignalHistory:
+    """Signal history that writes this worker's ring and reads every worker's"""
+
+    def __init__(self, shared, decision_names, signal_names):
+        self.shared = shared
+        self.rings = [
+            SignalHistory(shared.capacity, decision_names, signal_names,
+                          records=shared.records[index],
+                          counter=shared.counters[index, APPENDED:APPENDED + 1])
+            for index in range(shared.slots)
+        ]
+        self.signal_mask = self.rings[0].signal_mask
+        self.to_dicts = self.rings[0].to_dicts
+
+    def __len__(self):
+        return sum(len(ring) for ring in self.rings)
+
+    def append(self, *record):
+        """Write one record to this worker's ring; returns its location"""
+        slot = self.shared.own_slot()
+        return slot << LOCATION_BITS | self.rings[slot].append(*record)
+
+    def extend(self, **columns):
+        """Write many records to this worker's ring; returns the first location"""
+        slot = self.shared.own_slot()
+        return slot << LOCATION_BITS | self.rings[slot].extend(**columns)
+
+    def record_at(self, location):
+        """Return a copy of the record at a location from any worker, or None"""
+        slot = location >> LOCATION_BITS
+        if not 0 <= slot < len(self.rings):
+            return None
+        return self.rings[slot].record_at(location & ((1 << LOCATION_BITS) - 1))
+
+    def tail(self, k):
+        """Return the newest k records across all workers (oldest first)"""
+        records = np.concatenate([ring.tail(k) for ring in self.rings])
+        order = np.argsort(records['timestamp'], kind='stable')
+        return records[order[-k:]] if k > 0 else records[:0]
+
+    def recent(self, k):
+        """Return the newest k records across all workers as JSON-ready dicts"""
+        return self.to_dicts(self.tail(k))
+
+    def page(self, cursor, limit):
+        """(records newest first, their locations, next cursor) across all workers"""
+        records, positions, next_cursor = page_rings(self.rings, cursor, limit)
+        return records, [slot << LOCATION_BITS | sequence for slot, sequence in positions], next_cursor
@@ -0,0 +1,264 @@
+"""Rolling aggregates over generated signals and reported outcomes
+
+Every prediction and every outcome adds to a fixed row of float64 counters,
+so keeping the aggregates costs a handful of item writes per prediction and
+reading them never touches the signal history:
+
+    decision counts and confidence sums per decision
+    fire counts per signal
+    predictions, linked outcomes and correct outcomes per market regime and
+    per VIX condition
+    one-minute buckets over the last day (decisions, confidence, outcomes)
+    that the 1h and 1d windows sum
+
+Per-signal fire counts are queued as the history's signal bitmasks and
+folded into the row 64 predictions at a time, so a worker's counts may lag
+by up to that many predictions until its next fold or /get_stats read.
+
+Outcomes count towards a regime and VIX condition through the prediction
+they are linked to: the row also holds one code per history slot, written
+next to the history record. With SHARED_STATE_FILE the rows live in the
+workers' slots of the shared state file, like the /metrics counters, and
+reads sum every worker.
+"""
+import os
+from collections import deque
+
+import numpy as np
+
+from shared_state import LOCATION_BITS
+
+# Labels returned by determine_market_regime and determine_vix_condition
+MARKET_REGIMES = ('HIGH_VOLATILITY', 'LOW_VOLATILITY', 'STRONG_BULLISH_TREND', 'STRONG_BEARISH_TREND',
+                  'BULLISH_TREND', 'BEARISH_TREND', 'SIDEWAYS_RANGING', 'SIDEWAYS_MARKET')
+VIX_CONDITIONS = ('LOW_VOLATILITY', 'NORMAL_VOLATILITY', 'HIGH_VOLATILITY', 'EXTREME_VOLATILITY')
+
+# Predictions restored from the journal carry no regime
+UNKNOWN_REGIME = len(MARKET_REGIMES)
+
+# Windowed stats are summed from one-minute buckets covering the last day
+BUCKET_SECONDS = 60
+BUCKETS = 1440
+WINDOWS = {'1h': 3600, '1d': 86400}
+
+# Queued signal bitmasks folded into the fire counts at once
+FOLD_MASKS = 64
+
+
+def analytics_count(signal_names, decision_names, capacity):
+    """Number of float64 values in one process's row"""
+    decisions = len(decision_names)
+    counters = 2 * decisions + len(signal_names) + 3 * (UNKNOWN_REGIME + 1) + 3 * len(VIX_CONDITIONS) + 3
+    return counters + BUCKETS * (decisions + 4) + capacity
+
+
+class SignalAnalytics:
+    """O(1) per-event aggregates for one process, summed over all of them on read"""
+
+    def __init__(self, signal_names, decision_names, capacity, shared=None):
+        self.signal_names = signal_names
+        self.decision_names = decision_names
+        self.capacity = capacity
+        self.regime_codes = {name: code for code, name in enumerate(MARKET_REGIMES)}
+        self.vix_codes = {name: code for code, name in enumerate(VIX_CONDITIONS)}
+
+        decisions = len(decision_names)
+        regimes = UNKNOWN_REGIME + 1
+        vix = len(VIX_CONDITIONS)
+        self.confidence_base = decisions
+        self.fire_base = 2 * decisions
+        self.regime_base = self.fire_base + len(signal_names)  # predictions, outcomes, correct
+        self.vix_base = self.regime_base + 3 * regimes
+        self.outcome_base = self.vix_base + 3 * vix  # outcomes, correct, linked
+        self.bucket_base = self.outcome_base + 3
+        self.bucket_stride = decisions + 4  # minute stamp, decisions, confidence sum, outcomes, correct
+        self.ring_base = self.bucket_base + BUCKETS * self.bucket_stride
+        self.size = analytics_count(signal_names, decision_names, capacity)
+
+        self.shared = shared
+        self.values = None if shared is not None else np.zeros((1, self.size))
+        self.bits = np.arange(len(signal_names), dtype=np.uint64)
+        self.masks = deque()
+        self.row_pid = None
+        self.row = None
+        self.array = None
+
+    def _rows(self):
+        """Rows of every process"""
+        return self.values if self.shared is None else self.shared.analytics
+
+    def _row(self):
+        """This process's row, resolved again after a fork"""
+        pid = os.getpid()
+        if self.row_pid != pid:
+            self.array = self._rows()[0 if self.shared is None else self.shared.own_slot()]
+            self.row = memoryview(self.array)
+            self.masks.clear()  # queued by the parent, which counts them itself
+            self.row_pid = pid
+        return self.row
+
+    def _bucket(self, timestamp):
+        """Offset of the bucket for a timestamp, reset when it held an older minute
+
+        None when the bucket already moved on to a newer minute.
+        """
+        minute = int(timestamp // BUCKET_SECONDS)
+        base = self.bucket_base + minute % BUCKETS * self.bucket_stride
+        stamp = self.row[base]
+        if stamp != minute:
+            if stamp > minute:
+                return None
+            self.array[base:base + self.bucket_stride] = 0
+            self.row[base] = minute
+        return base
+
+    def fold(self):
+        """Add the queued signal bitmasks to this process's fire counts"""
+        self._row()
+        masks = self.masks
+        if masks:
+            queued = np.array([masks.popleft() for _ in range(len(masks))], dtype=np.uint64)
+            self.array[self.fire_base:self.regime_base] += (queued[:, None] >> self.bits & np.uint64(1)).sum(axis=0)
+
+    def record(self, timestamp, location, decision_code, confidence, signal_mask, regime, vix_condition):
+        """Count one prediction stored at a history location"""
+        row = self._row()
+        regime_code = self.regime_codes[regime]
+        vix_code = self.vix_codes[vix_condition]
+        row[decision_code] += 1
+        row[self.confidence_base + decision_code] += confidence
+        self.masks.append(signal_mask)
+        if len(self.masks) >= FOLD_MASKS:
+            self.fold()
+        row[self.regime_base + regime_code] += 1
+        row[self.vix_base + vix_code] += 1
+        sequence = location & ((1 << LOCATION_BITS) - 1)
+        row[self.ring_base + sequence % self.capacity] = regime_code * len(VIX_CONDITIONS) + vix_code
+        base = self._bucket(timestamp)
+        if base is not None:
+            row[base + 1 + decision_code] += 1
+            row[base + 1 + len(self.decision_names)] += confidence
+
+    def record_batch(self, timestamps, first_location, decision_codes, confidence, fired, regimes,
+                     vix_conditions):
+        """Count a batch of predictions stored from first_location on
+
+        regimes may be None for predictions whose regime is unknown.
+        """
+        self._row()
+        values = self.array
+        count = len(decision_codes)
+        if count == 0:
+            return
+        decisions = len(self.decision_names)
+        decision_codes = np.asarray(decision_codes)
+        confidence = np.asarray(confidence, dtype=np.float64)
+        regime_codes = (np.full(count, UNKNOWN_REGIME) if regimes is None
+                        else np.array([self.regime_codes[name] for name in regimes]))
+        vix_codes = np.array([self.vix_codes[name] for name in vix_conditions])
+
+        values[:decisions] += np.bincount(decision_codes, minlength=decisions)
+        values[self.confidence_base:self.fire_base] += np.bincount(decision_codes, confidence, decisions)
+        values[self.fire_base:self.regime_base] += fired.sum(axis=0)
+        values[self.regime_base:self.regime_base + UNKNOWN_REGIME + 1] += np.bincount(
+            regime_codes, minlength=UNKNOWN_REGIME + 1)
+        values[self.vix_base:self.vix_base + len(VIX_CONDITIONS)] += np.bincount(
+            vix_codes, minlength=len(VIX_CONDITIONS))
+        # Only the newest `capacity` rows still have a history slot
+        skip = max(count - self.capacity, 0)
+        first_sequence = first_location & ((1 << LOCATION_BITS) - 1)
+        positions = (first_sequence + np.arange(skip, count)) % self.capacity
+        values[self.ring_base + positions] = (regime_codes * len(VIX_CONDITIONS) + vix_codes)[skip:]
+
+        minutes = (np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (count,))
+                   // BUCKET_SECONDS).astype(np.int64)
+        for minute in sorted(set(minutes.tolist())):  # np.unique would import numpy.ma on first use
+            base = self._bucket(minute * BUCKET_SECONDS)
+            if base is not None:
+                selected = minutes == minute
+                values[base + 1:base + 1 + decisions] += np.bincount(decision_codes[selected],
+                                                                     minlength=decisions)
+                values[base + 1 + decisions] += confidence[selected].sum()
+
+    def record_outcome(self, timestamp, correct, location=None):
+        """Count one reported outcome, by regime when it is linked to a history location"""
+        row = self._row()
+        row[self.outcome_base] += 1
+        if correct:
+            row[self.outcome_base + 1] += 1
+        base = self._bucket(timestamp)
+        if base is not None:
+            row[base + self.bucket_stride - 2] += 1
+            if correct:
+                row[base + self.bucket_stride - 1] += 1
+        if location is None:
+            return
+        row[self.outcome_base + 2] += 1
+        slot = location >> LOCATION_BITS
+        sequence = location & ((1 << LOCATION_BITS) - 1)
+        regime_code, vix_code = divmod(int(self._rows()[slot, self.ring_base + sequence % self.capacity]),
+                                       len(VIX_CONDITIONS))
+        regimes = UNKNOWN_REGIME + 1
+        row[self.regime_base + regimes + regime_code] += 1
+        row[self.vix_base + len(VIX_CONDITIONS) + vix_code] += 1
+        if correct:
+            row[self.regime_base + 2 * regimes + regime_code] += 1
+            row[self.vix_base + 2 * len(VIX_CONDITIONS) + vix_code] += 1
+
+    def restore_outcomes(self, correct, total):
+        """Add outcome counts recovered from the decision journal (no regime, no window)"""
+        row = self._row()
+        row[self.outcome_base] += total
+        row[self.outcome_base + 1] += correct
+
+    def _decisions(self, counts, confidence):
+        """Decision counts and mean confidence from summed counters"""
+        predictions = int(counts.sum())
+        return {
+            'predictions': predictions,
+            'decisions': dict(zip(self.decision_names, counts.astype(np.int64).tolist())),
+            'mean_confidence': round(float(confidence.sum()) / predictions, 3) if predictions else 0.0
+        }
+
+    @staticmethod
+    def _accuracy(outcomes, correct):
+        return {'outcomes': int(outcomes), 'correct': int(correct),
+                'accuracy': round(float(correct) / outcomes, 3) if outcomes else 0.0}
+
+    def lifetime(self):
+        """Aggregates since the counters were created"""
+        self.fold()
+        totals = self._rows()[:, :self.bucket_base].sum(axis=0)
+        decisions = len(self.decision_names)
+        summary = self._decisions(totals[:decisions], totals[self.confidence_base:self.fire_base])
+        predictions = summary['predictions']
+        summary['mean_confidence_by_decision'] = {
+            name: round(float(totals[self.confidence_base + code] / totals[code]), 3) if totals[code] else 0.0
+            for code, name in enumerate(self.decision_names)
+        }
+        summary['signal_fire_rates'] = {
+            name: round(float(totals[self.fire_base + code]) / predictions, 4) if predictions else 0.0
+            for code, name in enumerate(self.signal_names)
+        }
+        outcomes, correct, linked = totals[self.outcome_base:self.outcome_base + 3]
+        summary.update(self._accuracy(outcomes, correct), linked_outcomes=int(linked))
+        for key, names, base, stride in (('regimes', MARKET_REGIMES, self.regime_base, UNKNOWN_REGIME + 1),
+                                         ('vix_conditions', VIX_CONDITIONS, self.vix_base, len(VIX_CONDITIONS))):
+            summary[key] = {
+                name: {'predictions': int(totals[base + code]),
+                       **self._accuracy(totals[base + stride + code], totals[base + 2 * stride + code])}
+                for code, name in enumerate(names)
+            }
+        return summary
+
+    def window(self, seconds, now):
+        """Aggregates over the buckets of the last `seconds` up to now"""
+        buckets = self._rows()[:, self.bucket_base:self.ring_base].reshape(-1, self.bucket_stride)
+        newest = int(now // BUCKET_SECONDS)
+        oldest = newest - min(seconds // BUCKET_SECONDS, BUCKETS) + 1
+        stamps = buckets[:, 0]
+        totals = buckets[(stamps >= oldest) & (stamps <= newest), 1:].sum(axis=0)
+        decisions = len(self.decision_names)
+        summary = self._decisions(totals[:decisions], totals[decisions:decisions + 1])
+        summary.update(self._accuracy(totals[-2], totals[-1]), seconds=seconds)
+        return summary
@@ -0,0 +1,179 @@
+"""Compact ring-buffer history of generated signals
+
+Each entry is one fixed-size record in a preallocated NumPy array instead of a
+dict holding the whole request payload: epoch timestamp, decision code,
+confidence, strength, a bitmask of fired signals and a few key features.
+"""
+import heapq
+import threading
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+HISTORY_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('signal', 'i1'),
+    ('confidence', 'f8'),
+    ('strength', 'f8'),
+    ('signal_mask', 'u8'),
+    ('ltp', 'f8'),
+    ('vix', 'f8'),
+    ('rsi', 'f8'),
+    ('writers_confidence', 'f8'),
+])
+
+
+class SignalHistory:
+    """Fixed-capacity ring buffer with O(1) append and O(k) tail reads"""
+
+    def __init__(self, capacity, decision_names, signal_names, records=None, counter=None):
+        if len(signal_names) > 64:
+            raise ValueError("Signal bitmask supports at most 64 signals")
+        self.capacity = capacity
+        self.decision_names = tuple(decision_names)
+        self.signal_names = tuple(signal_names)
+        self.signal_bits = {name: 1 << code for code, name in enumerate(signal_names)}
+        # Callers may pass views into shared memory for the records and counter
+        self.records = np.zeros(capacity, dtype=HISTORY_DTYPE) if records is None else records
+        self.counter = np.zeros(1, dtype=np.int64) if counter is None else counter
+        self.lock = threading.Lock()
+
+    @property
+    def appended(self):
+        """Total records ever written; the head is appended % capacity"""
+        return int(self.counter[0])
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def signal_mask(self, signals):
+        """Encode a list of signal names as a bitmask"""
+        mask = 0
+        for name in signals:
+            mask |= self.signal_bits[name]
+        return mask
+
+    def append(self, timestamp, signal_code, confidence, strength, signal_mask,
+               ltp, vix, rsi, writers_confidence):
+        """Write one record over the oldest slot; returns its sequence number"""
+        with self.lock:
+            sequence = self.appended
+            self.records[sequence % self.capacity] = (
+                timestamp, signal_code, confidence, strength, signal_mask,
+                ltp, vix, rsi, writers_confidence
+            )
+            # Publish after the record is written so readers never see it half-filled
+            self.counter[0] += 1
+        return sequence
+
+    def extend(self, **columns):
+        """Write many records at once from equal-length column arrays
+
+        Returns the sequence number of the first record.
+        """
+        count = len(columns['timestamp'])
+        with self.lock:
+            sequence = self.appended
+            if count == 0:
+                return sequence
+            # Only the newest `capacity` rows can survive the write
+            skip = max(count - self.capacity, 0)
+            start = (sequence + skip) % self.capacity
+            positions = (start + np.arange(count - skip)) % self.capacity
+            for name, values in columns.items():
+                self.records[name][positions] = np.asarray(values)[skip:]
+            self.counter[0] += count
+        return sequence
+
+    def tail(self, k):
+        """Return the newest k records (oldest first) as a structured array copy"""
+        with self.lock:
+            appended = self.appended
+            k = min(k, appended, self.capacity)
+            positions = (appended - k + np.arange(k)) % self.capacity
+            return self.records[positions]
+
+    def record_at(self, sequence):
+        """Return a copy of the record with this sequence number, or None once overwritten"""
+        with self.lock:
+            if not max(self.appended - self.capacity, 0) <= sequence < self.appended:
+                return None
+            return self.records[sequence % self.capacity].copy()
+
+    def before(self, end, limit):
+        """(first sequence, records) of up to `limit` records before sequence `end`, oldest first"""
+        with self.lock:
+            appended = self.appended
+            end = min(end, appended)
+            first = max(appended - self.capacity, end - limit, 0)
+            positions = np.arange(first, max(end, first)) % self.capacity
+            return first, self.records[positions]
+
+    def page(self, cursor, limit):
+        """(records newest first, their locations, next cursor) of one page of history"""
+        records, positions, next_cursor = page_rings([self], cursor, limit)
+        return records, [sequence for _, sequence in positions], next_cursor
+
+    def decode_signals(self, mask):
+        """Decode a bitmask back into signal names in rule order"""
+        mask = int(mask)
+        return [name for code, name in enumerate(self.signal_names) if mask >> code & 1]
+
+    def recent(self, k):
+        """Return the newest k records (oldest first) as JSON-ready dicts"""
+        return self.to_dicts(self.tail(k))
+
+    def to_dicts(self, records):
+        """Convert structured history records to JSON-ready dicts"""
+        return [
+            {
+                'timestamp': datetime.fromtimestamp(record['timestamp']).isoformat(),
+                'signal': self.decision_names[record['signal']],
+                'confidence': float(record['confidence']),
+                'strength': float(record['strength']),
+                'all_signals': self.decode_signals(record['signal_mask']),
+                'ltp': float(record['ltp']),
+                'vix': float(record['vix']),
+                'rsi': float(record['rsi']),
+                'writers_confidence': float(record['writers_confidence'])
+            }
+            for record in records
+        ]
+
+
+def page_rings(rings, cursor, limit):
+    """One page of the newest records across rings, read back from a cursor
+
+    A cursor holds one end sequence number per ring, so paging only reads
+    `limit` records per ring and records appended meanwhile never shift a
+    page. Returns (records newest first, (ring, sequence) pairs, next cursor
+    or None once the history is exhausted); raises ValueError on a bad cursor.
+    """
+    if cursor is None:
+        ends = [ring.appended for ring in rings]
+    else:
+        try:
+            ends = [int(part, 16) for part in cursor.split('.')]
+        except ValueError:
+            ends = []
+        if len(ends) != len(rings) or min(ends) < 0:
+            raise ValueError(f"Invalid history cursor {cursor!r}")
+
+    parts = [ring.before(end, limit) for ring, end in zip(rings, ends)]
+    # Newest first; taking from each ring's newest end keeps every ring's page contiguous
+    streams = [
+        [(float(records['timestamp'][offset]), index, first + offset) for offset in range(len(records) - 1, -1, -1)]
+        for index, (first, records) in enumerate(parts)
+    ]
+    chosen = list(islice(heapq.merge(*streams, reverse=True), limit))
+    records = np.array([parts[index][1][sequence - parts[index][0]] for _, index, sequence in chosen],
+                       dtype=HISTORY_DTYPE)
+
+    taken = [0] * len(rings)
+    for _, index, _ in chosen:
+        taken[index] += 1
+    ends = [first + len(records) - count for (first, records), count in zip(parts, taken)]
+    remaining = any(end > max(ring.appended - ring.capacity, 0) for ring, end in zip(rings, ends))
+    next_cursor = '.'.join(f'{end:x}' for end in ends) if remaining else None
+    return records, [(index, sequence) for _, index, sequence in chosen], next_cursor
@@ -0,0 +1,65 @@
+"""Cold start timings up to a process's first prediction
+
+A process times importing the app module and building the app (models,
+rule tables, restored history, first-request warm-up), then the wait until
+it has answered its first prediction. That wait is what a new worker costs
+when Render scales out or gunicorn replaces a worker.
+
+With gunicorn's preload_app (see gunicorn.conf.py) the master imports and
+builds the app once and forks its workers from it. A forked worker restarts
+its clock at the fork and keeps the master's build timings, marked as
+preloaded, so /health shows how much of the cold start every worker skipped.
+
+The clock starts when this module is imported, which the app module does
+before any of its own imports.
+"""
+import logging
+import os
+from time import perf_counter
+
+IMPORT_STARTED = perf_counter()  # when the app module started importing
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Phase durations of this process's start and its time to first prediction"""
+
+    def __init__(self, started):
+        self.started = started  # perf_counter() when the process started
+        self.phases = {}
+        self.pid = os.getpid()
+        self.preloaded = False
+        self.first_prediction = None
+
+    def phase(self, name, since):
+        """Record a startup phase that began at `since`; returns now, the start of the next one"""
+        now = perf_counter()
+        self.phases[name] = now - since
+        return now
+
+    def forked(self):
+        """Restart the clock in a worker forked from a process that already built the app"""
+        self.started = perf_counter()
+        self.pid = os.getpid()
+        self.preloaded = True
+        self.first_prediction = None
+
+    def predicted(self):
+        """Note an answered prediction; the first one is timed and logged"""
+        if self.first_prediction is None:
+            self.first_prediction = perf_counter() - self.started
+            logger.info(f"First prediction {self.first_prediction * 1000:.1f} ms after "
+                        f"{'fork' if self.preloaded else 'start'} of worker {self.pid} ("
+                        + ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+                        + (', preloaded)' if self.preloaded else ')'))
+
+    def stats(self):
+        """Startup timings of this process in milliseconds"""
+        return {
+            'pid': self.pid,
+            'preloaded': self.preloaded,
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            'first_prediction_ms': (round(self.first_prediction * 1000, 1)
+                                    if self.first_prediction is not None else None)
+        }
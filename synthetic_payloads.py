@@ -0,0 +1,107 @@
+"""Seeded synthetic n8n payloads for the benchmarks and the tests
+
+synthetic_payload builds one snapshot with every indicator block and
+statuses consistent with its values, with or without writers zone data;
+tick_payloads drifts a few fields around a base snapshot the way
+consecutive ticks do. isolate_environment pins the configuration the app
+module reads at import so that a run scores in-process only.
+"""
+import json
+import os
+import random
+
+TICKS_PER_BASE = 20  # consecutive ticks around one base snapshot in the ticks scenario
+
+# Settings that would attach the model to state files, journals, audit logs,
+# weight profiles or the online learner
+SIDE_STORE_SETTINGS = ('SHARED_STATE_FILE', 'DECISION_JOURNAL_DIR', 'AUDIT_LOG_DIR', 'WEIGHT_PROFILES_FILE')
+
+
+def isolate_environment():
+    """Clear every side store setting and turn off online learning; call before importing the app"""
+    for name in SIDE_STORE_SETTINGS:
+        os.environ.pop(name, None)
+    os.environ['ONLINE_LEARNING'] = '0'
+
+
+def _status(value, low, high, below, above, between):
+    return below if value < low else above if value > high else between
+
+
+def synthetic_payload(rng, writers=True):
+    """One n8n-shaped snapshot with every indicator block and consistent statuses"""
+    ltp = rng.uniform(21000, 26000)
+    rsi = rng.uniform(10, 90)
+    vix = rng.uniform(9, 28)
+    ema = ltp * (1 + rng.gauss(0, 0.002))
+    sma = ltp * (1 + rng.gauss(0, 0.004))
+    histogram = rng.gauss(0, 3)
+    upper = ltp * (1 + rng.uniform(-0.001, 0.006))
+    lower = ltp * (1 - rng.uniform(-0.001, 0.006))
+    cci = rng.uniform(-250, 250)
+    aroon_up, aroon_down = rng.uniform(0, 100), rng.uniform(0, 100)
+    psar = ltp * (1 + rng.gauss(0, 0.003))
+    mfi = rng.uniform(0, 100)
+    stochastic = rng.uniform(0, 100)
+    payload = {
+        'LTP': round(ltp, 2),
+        'RSI': {'rsi': f'{rsi:.2f}', 'status': _status(rsi, 30, 70, 'Oversold', 'Overbought', 'Neutral')},
+        'EMA20': {'ema': f'{ema:.2f}', 'status': 'Bullish' if ltp > ema else 'Bearish'},
+        'SMA50': {'sma': f'{sma:.2f}', 'status': 'Bullish' if ltp > sma else 'Bearish'},
+        'MACD': {'macd': f'{histogram * 2:.2f}', 'signal': f'{histogram:.2f}', 'histogram': f'{histogram:.2f}',
+                 'status': _status(histogram, -0.5, 0.5, 'Bearish', 'Bullish', 'Neutral')},
+        'VIX': {'vix': f'{vix:.2f}', 'status': _status(vix, 14, 20, 'Calm Market', 'High Volatility', 'Normal')},
+        'BollingerBands': {'upper': f'{upper:.2f}', 'lower': f'{lower:.2f}',
+                           'status': 'Above Upper' if ltp > upper else 'Below Lower' if ltp < lower
+                           else 'Within Bands'},
+        'CCI': {'value': f'{cci:.2f}', 'status': _status(cci, -100, 100, 'Buy', 'Sell', 'Neutral')},
+        'SuperTrend': {'status': rng.choice(('Bullish', 'Bearish'))},
+        'VolumeIndicators': {'obv': rng.randint(-5000000, 5000000), 'status': rng.choice(('Weak', 'Strong', 'Normal'))},
+        'Aroon': {'up': f'{aroon_up:.2f}', 'down': f'{aroon_down:.2f}',
+                  'status': _status(aroon_up - aroon_down, -30, 30, 'Downtrend', 'Uptrend', 'Neutral')},
+        'ParabolicSAR': {'value': f'{psar:.2f}', 'status': 'Bullish' if ltp > psar else 'Bearish'},
+        'MFI': {'value': f'{mfi:.2f}', 'status': _status(mfi, 20, 80, 'Oversold', 'Overbought', 'Neutral')},
+        'PriceAction': {'score': rng.randint(-3, 3), 'type': rng.choice(('Ranging', 'Trending', 'Breakout'))},
+        'VolumeSpike': {'spike': rng.random() < 0.1, 'latestVol': rng.randint(0, 900000),
+                        'avgVol': f'{rng.uniform(0, 600000):.2f}'},
+        'VolumeStrength': {'score': rng.randint(-2, 2),
+                           'type': rng.choice(('Weak Volume', 'Strong Volume', 'Normal Volume'))},
+        'ATR': {'value': f'{rng.uniform(8, 40):.2f}'},
+        'ADX': {'value': f'{rng.uniform(8, 50):.2f}'},
+        'Stochastic': {'value': f'{stochastic:.2f}',
+                       'status': _status(stochastic, 20, 80, 'Oversold', 'Overbought', 'Neutral')},
+    }
+    if writers:
+        max_ce, max_pe = rng.uniform(0, 60), rng.uniform(0, 60)
+        payload.update({
+            'writersZone': rng.choice(('BULLISH', 'BEARISH', 'NEUTRAL')),
+            'confidence': round(rng.uniform(0, 1), 2),
+            'maxCELTP': round(max_ce, 2),
+            'maxPELTP': round(max_pe, 2),
+            'putCallPremiumRatio': round(rng.uniform(0.5, 1.6), 3),
+            'marketStructure': rng.choice(('CALL_PREMIUM_HIGH', 'PUT_PREMIUM_HIGH', 'BALANCED')),
+            'supportLevels': sorted(round(ltp - rng.uniform(50, 400), -1) for _ in range(rng.randint(0, 3))),
+            'resistanceLevels': sorted(round(ltp + rng.uniform(50, 400), -1) for _ in range(rng.randint(0, 3))),
+        })
+    return [payload]  # n8n posts a one-element array
+
+
+def tick_payloads(rng, count):
+    """Consecutive ticks: LTP and oscillators drift a little around each base snapshot"""
+    ticks = []
+    while len(ticks) < count:
+        base = synthetic_payload(rng)[0]
+        for _ in range(min(TICKS_PER_BASE, count - len(ticks))):
+            tick = json.loads(json.dumps(base))
+            tick['LTP'] = round(base['LTP'] + rng.gauss(0, 3), 2)
+            tick['RSI']['rsi'] = f"{float(base['RSI']['rsi']) + rng.gauss(0, 0.3):.2f}"
+            ticks.append([tick])
+    return ticks
+
+
+def scenario_payloads(scenario, count, seed):
+    """Deterministic payload list for a scenario"""
+    rng = random.Random(f'{seed}-{scenario}')
+    if scenario == 'ticks':
+        return tick_payloads(rng, count)
+    return [synthetic_payload(rng, writers=scenario == 'writers') for _ in range(count)]
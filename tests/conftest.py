@@ -0,0 +1,27 @@
+"""Shared fixtures; every test runs against a fresh, in-process model with no side stores"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_payloads import isolate_environment, synthetic_payload  # noqa: E402
+
+# The app module reads its configuration at import; keep tests off real state
+# files, journals, audit logs, weight profiles and the online learner
+isolate_environment()
+
+
+@pytest.fixture
+def payloads():
+    """Flat n8n snapshots, half of them with writers zone data"""
+    rng = random.Random(7)
+    return [synthetic_payload(rng, writers=index % 2 == 0)[0] for index in range(2000)]
+
+
+@pytest.fixture
+def engine():
+    from ai_model_api_fixed import ProfessionalTradingAI
+    return ProfessionalTradingAI()
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import ai_model_api_fixed
+from admission import AdmissionController, parse_epoch
+
+
+@pytest.fixture
+def client():
+    return ai_model_api_fixed.create_app().test_client()
+
+
+@pytest.fixture
+def single_slot(client, monkeypatch):
+    """One request in flight at a time and no queue, counted in the app's /metrics"""
+    controller = AdmissionController(1, 0, 0.0, ai_model_api_fixed.trading_ai.metrics)
+    monkeypatch.setattr(ai_model_api_fixed, 'admission', controller)
+    return controller
+
+
+def _shed_total(client, reason):
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(f'trading_ai_shed_total{{reason="{reason}"}}'):
+            return int(line.rsplit(' ', 1)[1])
+    raise AssertionError(f"no shed counter for {reason}")
+
+
+@pytest.mark.parametrize('value', ['1718000000.25', '1718000000250', '1718000000250000', 't=1718000000250'])
+def test_epochs_in_seconds_milliseconds_or_microseconds(value):
+    assert parse_epoch(value) == pytest.approx(1718000000.25)
+
+
+def test_max_age_counts_from_the_proxy_request_start():
+    controller = AdmissionController(default_max_age=5.0)
+    now = 1718000000.0
+    assert controller.deadline({}, now) == now + 5.0
+    assert controller.deadline({'X-Max-Age-Ms': '250'}, now) == now + 0.25
+    assert controller.deadline({'X-Max-Age-Ms': '250', 'X-Request-Start': 't=1717999999900'},
+                               now) == pytest.approx(now - 0.1 + 0.25)
+    assert controller.deadline({'X-Request-Deadline': str(now + 1)}, now) == now + 1
+    assert controller.deadline({'X-Request-Deadline': str(now + 1), 'X-Max-Age-Ms': '250'}, now) == now + 0.25
+
+
+@pytest.mark.parametrize('headers, field', [
+    ({'X-Request-Deadline': 'soon'}, 'X-Request-Deadline'),
+    ({'X-Max-Age-Ms': '-5'}, 'X-Max-Age-Ms'),
+])
+def test_bad_deadline_headers_are_a_400(client, payloads, headers, field):
+    response = client.post('/predict', json=payloads[0], headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['field'] == field
+
+
+def test_queue_waits_for_a_slot_until_the_deadline():
+    controller = AdmissionController(1, 1)
+    assert controller.enter() is None
+    assert controller.enter(blocking=False) == 'overloaded'
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.enter(time.time() + 5)))
+    waiter.start()
+    while controller.queued == 0:
+        time.sleep(0.001)
+    assert controller.enter(time.time() + 5) == 'overloaded'  # the one queue place is taken
+    controller.exit()
+    waiter.join(5)
+    assert results == [None] and controller.stats()['in_flight'] == 1
+    assert controller.enter(time.time() + 0.02) == 'deadline_exceeded'
+    controller.exit()
+    assert controller.stats() == {'max_in_flight': 1, 'max_queue': 1, 'in_flight': 0, 'queued': 0}
+
+
+def test_overloaded_request_is_a_503_hold_and_counted(client, single_slot, payloads):
+    shed = _shed_total(client, 'overloaded')
+    assert single_slot.enter() is None  # another request holds the only slot
+    try:
+        response = client.post('/predict', json=payloads[0])
+    finally:
+        single_slot.exit()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['signal'] == 'HOLD' and response.get_json()['reason'] == 'overloaded'
+    assert _shed_total(client, 'overloaded') == shed + 1
+    assert client.post('/predict', json=payloads[0]).status_code == 200
+
+
+def test_late_request_is_a_503_hold_and_counted(client, single_slot, payloads):
+    shed = _shed_total(client, 'deadline_exceeded')
+    response = client.post('/predict', json=payloads[0], headers={'X-Request-Deadline': str(time.time() - 1)})
+    assert response.status_code == 503
+    assert 'Retry-After' not in response.headers
+    assert response.get_json()['reason'] == 'deadline_exceeded'
+    assert _shed_total(client, 'deadline_exceeded') == shed + 1
@@ -0,0 +1,56 @@
+import pytest
+
+import ai_model_api_fixed
+
+
+@pytest.fixture
+def client():
+    return ai_model_api_fixed.create_app().test_client()
+
+
+def test_get_stats_pages_through_history_once(client, payloads):
+    snapshots = [dict(payload, symbol='PAGING') for payload in payloads[:120]]
+    scored = client.post('/predict_batch', json=snapshots).get_json()['results']
+    seen = []
+    cursor = None
+    while True:
+        query = {'symbol': 'PAGING', 'history': 25}
+        if cursor:
+            query['cursor'] = cursor
+        history = client.get('/get_stats', query_string=query).get_json()['history']
+        assert len(history['signals']) <= 25
+        seen += [entry['prediction_id'] for entry in history['signals']]
+        cursor = history['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [result['prediction_id'] for result in reversed(scored)]
+
+
+def test_get_stats_rejects_a_bad_cursor(client):
+    response = client.get('/get_stats', query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+    assert response.get_json()['field'] == 'cursor'
+
+
+@pytest.mark.parametrize('method, path, kwargs, field', [
+    ('post', '/predict', {'json': {'RSI': {'status': 5}}}, 'RSI.status'),
+    ('post', '/predict', {'json': {'LTP': 'cheap'}}, 'LTP'),
+    ('post', '/predict', {'data': '{"MFI": {"value": 1' + '0' * 400 + '}}', 'content_type': 'application/json'},
+     'MFI.value'),
+    ('post', '/predict', {'json': {'symbol': 'no spaces'}}, 'symbol'),
+    ('get', '/get_stats', {'query_string': {'aggregates': 'weekly'}}, 'aggregates'),
+    ('get', '/get_stats', {'query_string': {'history': 'all'}}, 'history'),
+])
+def test_malformed_input_is_a_400_naming_its_field(client, method, path, kwargs, field):
+    response = getattr(client, method)(path, **kwargs)
+    assert response.status_code == 400
+    assert response.get_json()['field'] == field
+
+
+def test_first_prediction_is_timed_on_a_successful_decision(client, payloads, monkeypatch):
+    monkeypatch.setattr(ai_model_api_fixed.startup, 'first_prediction', None)
+    assert client.post('/predict', json={}).status_code == 400
+    assert client.post('/predict', json={'RSI': {'status': 5}}).status_code == 400
+    assert ai_model_api_fixed.startup.first_prediction is None
+    assert client.post('/predict', json=payloads[0]).status_code == 200
+    assert ai_model_api_fixed.startup.first_prediction is not None
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+
+import ai_model_api_fixed
+import asgi_app
+
+OVERSIZED = '{"MFI": {"value": 1' + '0' * 400 + '}}'
+
+
+async def _post(body):
+    """Status and JSON body of one /predict call through the ASGI app"""
+    scope = {'type': 'http', 'method': 'POST', 'path': '/predict', 'query_string': b'',
+             'headers': [(b'content-type', b'application/json')]}
+    messages = [{'type': 'http.request', 'body': body.encode(), 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app.app(scope, receive, send)
+    return sent[0]['status'], json.loads(b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def _coalesced(bodies):
+    """Post every body at once so they share one batch"""
+    async def post_all():
+        return await asyncio.gather(*(_post(body) for body in bodies))
+    return asyncio.run(post_all())
+
+
+def _shape(status, payload):
+    return status, payload['signal'], 'field' in payload, 'error' in payload
+
+
+@pytest.fixture
+def flask_client():
+    return ai_model_api_fixed.create_app().test_client()
+
+
+def test_bad_payload_in_a_batch_gets_the_flask_response_alone(flask_client, payloads):
+    bodies = [json.dumps(payloads[0]), OVERSIZED, json.dumps(payloads[1]), '{"RSI": {"status": 5}}']
+    answered = _coalesced(bodies)
+    for body, (status, payload) in zip(bodies, answered):
+        expected = flask_client.post('/predict', data=body, content_type='application/json')
+        assert _shape(status, payload) == _shape(expected.status_code, expected.get_json())
+    assert answered[0][0] == answered[2][0] == 200
+    assert 'error' not in answered[0][1] and 'error' not in answered[2][1]
+
+
+def test_failed_batch_is_scored_one_by_one(monkeypatch, payloads):
+    def fail(snapshots):
+        raise RuntimeError('batch failed')
+    monkeypatch.setattr(asgi_app.registry, 'batch_signal_generation', fail)
+    answered = _coalesced([json.dumps(payload) for payload in payloads[:8]])
+    expected = [ai_model_api_fixed.registry.professional_signal_generation(payload) for payload in payloads[:8]]
+    for (status, payload), result in zip(answered, expected):
+        assert status == 200
+        assert (payload['signal'], payload['analysis']) == (result['signal'], result['analysis'])
+
+
+def test_batch_of_rejected_payloads_is_not_a_first_prediction(monkeypatch, payloads):
+    monkeypatch.setattr(asgi_app.startup, 'first_prediction', None)
+    assert [status for status, _ in _coalesced([OVERSIZED, '{"RSI": {"status": 5}}'])] == [400, 400]
+    assert asgi_app.startup.first_prediction is None
+    assert _coalesced([json.dumps(payloads[0])])[0][0] == 200
+    assert asgi_app.startup.first_prediction is not None
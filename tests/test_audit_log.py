@@ -0,0 +1,97 @@
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from ai_model_api_fixed import SIGNAL_CODES, ProfessionalTradingAI
+from audit_log import AuditLog
+from indicator_rules import RULE_TABLE
+
+
+def _audit_log(directory, **options):
+    """An audit log the test flushes by hand: no writer thread is started"""
+    audit_log = AuditLog(str(directory), RULE_TABLE, SIGNAL_CODES, flush_interval=3600.0, **options)
+    audit_log.writer_pid = os.getpid()
+    return audit_log
+
+
+def _read(directory):
+    """Audit files oldest first, each as its list of records"""
+    return [[json.loads(line) for line in gzip.open(path, 'rt')]
+            for path in sorted(glob.glob(os.path.join(str(directory), 'audit-*.jsonl.gz')))]
+
+
+def _record(audit_log, engine, payload, prediction_id):
+    market, writers = engine.parse_snapshot(payload)
+    audit_log.record(prediction_id, None, market, writers, ['RSI_OVERSOLD'], 1.5, 'BUY_CE', 0.7, False, {})
+
+
+@pytest.mark.parametrize('policy, kept', [('oldest', list(range(6, 10))), ('newest', list(range(4)))])
+def test_full_buffer_drops_by_policy(tmp_path, engine, payloads, policy, kept):
+    audit_log = _audit_log(tmp_path, max_pending=4, drop_policy=policy)
+    for index in range(10):
+        _record(audit_log, engine, payloads[index], str(index))
+    assert audit_log.stats()['dropped'] == 6 and audit_log.stats()['pending'] == 4
+    audit_log.flush()
+    [records] = _read(tmp_path)
+    assert [int(record['prediction_id']) for record in records] == kept
+    assert audit_log.stats()['written'] == 4
+
+
+def test_block_policy_waits_for_the_writer(tmp_path, engine, payloads):
+    audit_log = _audit_log(tmp_path, max_pending=2, drop_policy='block')
+    for index in range(2):
+        _record(audit_log, engine, payloads[index], str(index))
+    blocked = threading.Thread(target=_record, args=(audit_log, engine, payloads[2], '2'))
+    blocked.start()
+    time.sleep(0.05)
+    assert blocked.is_alive()
+    audit_log.flush()
+    blocked.join(5)
+    audit_log.flush()
+    assert [[record['prediction_id'] for record in records] for records in _read(tmp_path)] == [['0', '1', '2']]
+    assert audit_log.stats()['dropped'] == 0
+
+
+def test_batches_append_gzip_members_until_rotation(tmp_path, engine, payloads):
+    audit_log = _audit_log(tmp_path / 'size', rotate_bytes=1 << 20)
+    for index in range(3):
+        _record(audit_log, engine, payloads[index], str(index))
+        audit_log.flush()
+    assert [len(records) for records in _read(tmp_path / 'size')] == [3]
+
+    audit_log = _audit_log(tmp_path / 'rotated', rotate_bytes=1)
+    for index in range(3):
+        _record(audit_log, engine, payloads[index], str(index))
+        audit_log.flush()
+    assert [len(records) for records in _read(tmp_path / 'rotated')] == [1, 1, 1]
+
+    audit_log = _audit_log(tmp_path / 'aged', rotate_seconds=0.0)
+    for index in range(2):
+        _record(audit_log, engine, payloads[index], str(index))
+        audit_log.flush()
+    assert [len(records) for records in _read(tmp_path / 'aged')] == [1, 1]
+
+
+def test_records_match_the_decisions(tmp_path, payloads):
+    audit_log = _audit_log(tmp_path)
+    engine = ProfessionalTradingAI(audit=audit_log)
+    scalar = [engine.professional_signal_generation(payload) for payload in payloads[:5]]
+    batch = engine.batch_signal_generation(payloads[5:10])
+    audit_log.record_error('NIFTY', RuntimeError('scoring failed'))
+    audit_log.flush()
+    [records] = _read(tmp_path)
+    assert len(records) == 11
+    for record, result in zip(records, scalar + batch):
+        assert record['prediction_id'] == result['prediction_id']
+        assert record['decision'] == result['signal']
+        assert record['confidence'] == pytest.approx(result['confidence'], abs=5e-4)
+        assert record['signals'] == result['analysis']['detected_signals']
+        assert record['input']['ltp'] == result['analysis']['ltp']
+    assert [record['cached'] for record in records[:5]] == [False] * 5
+    assert records[10]['symbol'] == 'NIFTY' and records[10]['error'] == 'scoring failed'
+    assert 'traceback' in records[10]
@@ -0,0 +1,60 @@
+import json
+import os
+import random
+import stat
+
+import pytest
+
+from candle_indicators import CandleEngine, IndicatorState, parse_candles
+
+
+def _bars(count):
+    rng = random.Random(3)
+    price = 25000.0
+    bars = []
+    for timestamp in range(count):
+        close = price + rng.gauss(0, 20)
+        bars.append([timestamp, price, max(price, close) + 3, min(price, close) - 3, close, rng.randint(100, 900)])
+        price = close
+    return bars
+
+
+def test_engines_sharing_a_directory_follow_one_series(tmp_path):
+    bars = _bars(90)
+    reference = CandleEngine()
+    workers = [CandleEngine(directory=str(tmp_path)), CandleEngine(directory=str(tmp_path))]
+    reference.update('NIFTY', parse_candles(bars[:60]))
+    workers[0].update('NIFTY', parse_candles(bars[:60]))
+    for position, bar in enumerate(bars[60:]):
+        expected = reference.update('NIFTY', parse_candles([bar]))
+        state = workers[position % 2].update('NIFTY', parse_candles([bar]))
+        assert state.bars == expected.bars
+        assert state.payload(None) == expected.payload(None)
+
+
+def test_retried_bar_is_counted_once(tmp_path):
+    engine = CandleEngine(directory=str(tmp_path))
+    bars = parse_candles(_bars(3))
+    engine.update('NIFTY', bars)
+    assert engine.update('NIFTY', bars[-1:]).bars == 3
+
+
+def test_state_files_hold_json_not_pickles(tmp_path):
+    engine = CandleEngine(directory=str(tmp_path))
+    state = engine.update('NIFTY', parse_candles(_bars(80)))
+    with open(tmp_path / 'NIFTY.state') as state_file:
+        restored = IndicatorState.from_json(json.load(state_file))
+    reference = CandleEngine()
+    reference.update('NIFTY', parse_candles(_bars(80)))
+    bar = parse_candles([[80, 25000.0, 25010.0, 24990.0, 25005.0, 500]])
+    assert restored.payload(None) == state.payload(None)
+    assert reference.update('NIFTY', bar).payload(None) == engine.update('NIFTY', bar).payload(None)
+
+
+def test_state_directory_writable_by_others_is_refused(tmp_path):
+    directory = tmp_path / 'candles'
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        CandleEngine(directory=str(directory))
+    assert stat.S_IMODE(os.stat(CandleEngine(directory=str(tmp_path / 'new')).directory).st_mode) == 0o700
@@ -0,0 +1,76 @@
+from ai_model_api_fixed import ProfessionalTradingAI
+from decision_cache import DecisionCache
+
+
+def _decision(result):
+    """A result without the fields that differ per call"""
+    return {key: value for key, value in result.items() if key not in ('prediction_id', 'timestamp')}
+
+
+def test_batch_scalar_and_cached_decisions_agree(engine, payloads):
+    batch = engine.batch_signal_generation(payloads)
+    scored = [engine.professional_signal_generation(payload) for payload in payloads]
+    hits = engine.decision_cache.hits
+    cached = [engine.professional_signal_generation(payload) for payload in payloads]
+    assert engine.decision_cache.hits - hits == len(payloads)
+    for batch_result, scored_result, cached_result in zip(batch, scored, cached):
+        assert _decision(scored_result) == _decision(batch_result)
+        assert _decision(cached_result) == _decision(batch_result)
+
+
+def test_weight_change_invalidates_cached_decisions(engine, payloads):
+    flipped = {name: -weight for name, weight in engine.model_data['pattern_weights'].items()}
+    reference = ProfessionalTradingAI()
+    reference.set_pattern_weights(flipped)
+    expected = reference.batch_signal_generation(payloads)
+    for payload in payloads:
+        engine.professional_signal_generation(payload)
+    invalidations = engine.decision_cache.invalidations
+    engine.set_pattern_weights(flipped)
+    assert engine.decision_cache.invalidations == invalidations + 1
+    assert engine.decision_cache.stats()['size'] == 0
+    for payload, expected_result in zip(payloads, expected):
+        assert _decision(engine.professional_signal_generation(payload)) == _decision(expected_result)
+
+
+def test_decision_scored_before_a_clear_is_not_stored():
+    cache = DecisionCache(16, 60)
+    version = cache.version
+    cache.clear()
+    cache.put('key', 'old decision', version)
+    assert cache.get('key') is None
+    assert cache.stale_puts == 1
+    cache.put('key', 'new decision', cache.version)
+    assert cache.get('key') == 'new decision'
+
+
+def test_a_row_that_fails_unexpectedly_does_not_fail_the_batch(engine, payloads, monkeypatch):
+    parse_snapshot = engine.parse_snapshot
+
+    def parse(request_data):
+        if request_data.get('broken'):
+            raise RuntimeError('broken row')
+        return parse_snapshot(request_data)
+    monkeypatch.setattr(engine, 'parse_snapshot', parse)
+    snapshots = payloads[:50] + [dict(payloads[50], broken=True)] + payloads[51:100]
+    results = engine.batch_signal_generation(snapshots)
+    expected = ProfessionalTradingAI().batch_signal_generation(payloads[:100])
+    assert results[50]['signal'] == 'HOLD' and results[50]['error'] == 'broken row'
+    assert 'field' not in results[50]
+    for position in list(range(50)) + list(range(51, 100)):
+        assert _decision(results[position]) == _decision(expected[position])
+
+
+def test_a_failed_vectorized_pass_is_scored_row_by_row(engine, payloads, monkeypatch):
+    score_columns = engine.score_columns
+
+    def score(rows):
+        if len(rows) > 1 or rows[0][0].ltp == payloads[3]['LTP']:
+            raise RuntimeError('scoring failed')
+        return score_columns(rows)
+    monkeypatch.setattr(engine, 'score_columns', score)
+    results = engine.batch_signal_generation(payloads[:10])
+    expected = ProfessionalTradingAI().batch_signal_generation(payloads[:10])
+    assert results[3]['signal'] == 'HOLD' and results[3]['error'] == 'scoring failed'
+    for position in [0, 1, 2, 4, 5, 6, 7, 8, 9]:
+        assert _decision(results[position]) == _decision(expected[position])
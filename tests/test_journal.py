@@ -0,0 +1,28 @@
+import numpy as np
+
+import ai_model_api_fixed
+from ai_model_api_fixed import ProfessionalTradingAI
+
+
+def test_journal_snapshot_and_replay_restore_history_and_accuracy(tmp_path, monkeypatch, payloads):
+    monkeypatch.setattr(ai_model_api_fixed, 'DECISION_JOURNAL_DIR', str(tmp_path))
+    writer = ProfessionalTradingAI()
+    results = [writer.professional_signal_generation(payload) for payload in payloads[:300]]
+    results += writer.batch_signal_generation(payloads[300:600])
+    for position, result in enumerate(results[:200]):
+        writer.record_outcome(position % 3 == 0, result['prediction_id'])
+    writer.journal.flush()
+    assert writer.journal.snapshot()['total'] == 200
+    for position, result in enumerate(results[200:250]):
+        writer.record_outcome(position % 2 == 0, result['prediction_id'])
+    writer.journal.flush()
+
+    restored = ProfessionalTradingAI()
+    tracker = writer.model_data['accuracy_tracker']
+    assert (restored.model_data['accuracy_tracker'].correct, restored.model_data['accuracy_tracker'].total) == (
+        tracker.correct, tracker.total)
+    written = writer.model_data['signals'].tail(len(results))
+    replayed = restored.model_data['signals'].tail(len(results))
+    assert len(replayed) == len(results)
+    for name in written.dtype.names:
+        assert np.array_equal(replayed[name], written[name]), name
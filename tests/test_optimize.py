@@ -0,0 +1,34 @@
+import numpy as np
+
+import optimize
+from indicator_rules import RULE_TABLE
+from online_learner import key_matrix
+from weight_profiles import DEFAULT_THRESHOLDS
+
+
+def test_key_matrix_resolves_signed_weights(engine):
+    weights = np.array([engine.default_pattern_weights[name] for name in RULE_TABLE.weight_names])
+    assert (weights @ key_matrix(RULE_TABLE).T).tolist() == RULE_TABLE.signed_weights(engine.default_pattern_weights)
+
+
+def test_baseline_candidate_reproduces_score_columns(engine, payloads):
+    for payload in payloads:
+        payload['outcome'] = 'UP'
+    optimize._engine = engine
+    _, history = optimize.prepare_chunk((payloads, 'outcome'))
+    live = engine.score_columns([engine.parse_snapshot(payload) for payload in payloads])
+
+    weights = np.array([[engine.default_pattern_weights[name] for name in RULE_TABLE.weight_names]])
+    thresholds = {name: np.array([DEFAULT_THRESHOLDS[name]]) for name in optimize.THRESHOLD_NAMES}
+    strength = optimize.candidate_strength(history['features'], weights @ optimize.KEY_MATRIX.T)
+    codes, _ = engine.batch_decisions({name: history[name][:, None] for name in optimize.DECISION_FIELDS},
+                                      strength, history['bullish'][:, None], history['bearish'][:, None],
+                                      thresholds)
+
+    assert np.array_equal(strength[:, 0], live['strength'])
+    assert np.array_equal(np.asarray(codes)[:, 0], np.asarray(live['signal_codes']))
+
+    optimize._init_evaluator(history)
+    decisions, _ = optimize.evaluate((weights, np.array([[DEFAULT_THRESHOLDS[name]
+                                                          for name in optimize.THRESHOLD_NAMES]])))
+    assert decisions[0].tolist() == np.bincount(live['signal_codes'], minlength=3).tolist()
@@ -0,0 +1,80 @@
+import pytest
+
+from market_snapshot import SnapshotError
+from option_chain import derive_writers_zone
+
+# Five strikes around 120. By hand:
+#   imbalance = (peOIChange 200 - ceOIChange 100) / activity 300 = 0.333
+#   call premium = 22*100 + 13*200 + 6*400 + 2*1000 + 1*600 = 9800
+#   put premium  = 1*800 + 2*1200 + 5*500 + 11*200 + 20*100 = 9900, ratio 1.010
+#   support: put OI at or below 120 is 800/1200/500, half the max is 600 -> 110, 100;
+#     OI weighted (100*800 + 110*1200 + 120*500) / 2500 = 108.8
+#   resistance: call OI at or above 120 is 400/1000/600, half the max is 500 -> 130, 140;
+#     OI weighted (120*400 + 130*1000 + 140*600) / 2000 = 131.0
+CHAIN = {
+    'spot': 120,
+    'strikes': [100, 110, 120, 130, 140],
+    'ceLTP': [22, 13, 6, 2, 1],
+    'peLTP': [1, 2, 5, 11, 20],
+    'ceOI': [100, 200, 400, 1000, 600],
+    'peOI': [800, 1200, 500, 200, 100],
+    'ceOIChange': [0, 10, 20, 50, 20],
+    'peOIChange': [50, 100, 30, 10, 10],
+}
+
+
+def test_hand_computed_chain():
+    assert derive_writers_zone(CHAIN) == {
+        'writersZone': 'BULLISH',
+        'confidence': 0.333,
+        'putCallPremiumRatio': 1.01,
+        'marketStructure': 'BALANCED',
+        'maxCELTP': 2.0,
+        'maxPELTP': 2.0,
+        'supportLevels': [110, 100],
+        'resistanceLevels': [130, 140],
+        'oiWeightedSupport': 108.8,
+        'oiWeightedResistance': 131.0,
+        'spot': 120.0,
+    }
+
+
+@pytest.mark.parametrize('ce_change, pe_change, zone, confidence', [
+    ([0, 0, 0, 55, 0], [0, 45, 0, 0, 0], 'NEUTRAL', 0.1),       # exactly at the threshold
+    ([0, 0, 0, 45, 0], [0, 55, 0, 0, 0], 'NEUTRAL', 0.1),
+    ([0, 0, 0, 70, 0], [0, 30, 0, 0, 0], 'BEARISH', 0.4),
+    ([0, 0, 0, 0, 0], [0, 0, 0, 0, 0], 'NEUTRAL', 0.0),         # no writing at all
+])
+def test_zone_thresholds(ce_change, pe_change, zone, confidence):
+    derived = derive_writers_zone(dict(CHAIN, ceOIChange=ce_change, peOIChange=pe_change))
+    assert (derived['writersZone'], derived['confidence']) == (zone, confidence)
+
+
+@pytest.mark.parametrize('pe_ltp, ratio, structure', [
+    ([1, 2, 5, 11, 20], 1.01, 'BALANCED'),
+    ([2, 4, 10, 22, 40], 2.02, 'PUT_PREMIUM_HIGH'),         # 19800 / 9800
+    ([0.5, 1, 2.5, 5.5, 10], 0.505, 'CALL_PREMIUM_HIGH'),   # 4950 / 9800
+])
+def test_premium_ratio_and_structure(pe_ltp, ratio, structure):
+    derived = derive_writers_zone(dict(CHAIN, peLTP=pe_ltp))
+    assert (derived['putCallPremiumRatio'], derived['marketStructure']) == (ratio, structure)
+
+
+def test_spot_falls_back_to_ltp_then_the_parity_strike():
+    chain = {key: value for key, value in CHAIN.items() if key != 'spot'}
+    derived = derive_writers_zone(chain, ltp=131)
+    assert derived['spot'] == 131.0
+    assert (derived['resistanceLevels'], derived['oiWeightedResistance']) == ([140], 140.0)
+    # |ceLTP - peLTP| is smallest (1) at the 120 strike
+    assert derive_writers_zone(chain)['spot'] == 120.0
+
+
+@pytest.mark.parametrize('key, value', [
+    ('ceOI', [100, 200, 4 * 10 ** 400, 1000, 600]),
+    ('peLTP', [1, 2, 'five', 11, 20]),
+    ('spot', 10 ** 400),
+])
+def test_unconvertible_values_name_their_field(key, value):
+    with pytest.raises(SnapshotError) as error:
+        derive_writers_zone(dict(CHAIN, **{key: value}))
+    assert error.value.field == f"optionChain.{key}"
@@ -0,0 +1,76 @@
+import gzip
+import json
+from datetime import datetime
+
+import msgpack
+import pytest
+
+import ai_model_api_fixed
+
+STATS = {'symbol': 'FORMATS', 'history': 20}
+
+
+@pytest.fixture
+def client(payloads):
+    client = ai_model_api_fixed.create_app().test_client()
+    client.post('/predict_batch', json=[dict(payload, symbol='FORMATS') for payload in payloads[:20]])
+    return client
+
+
+def _compact(payload, codes):
+    """The compact form of a /get_stats payload, built from /codes"""
+    def entry(record):
+        mask = sum(1 << codes['signals'].index(name) for name in record['all_signals'])
+        compact = {key: value for key, value in record.items() if key != 'all_signals'}
+        compact.update(signal=codes['decisions'].index(record['signal']), signal_mask=mask,
+                       timestamp=round(datetime.fromisoformat(record['timestamp']).timestamp(), 6))
+        return compact
+    return [entry(record) for record in payload['history']['signals']]
+
+
+def test_compact_and_msgpack_carry_the_json_payload(client):
+    codes = client.get('/codes').get_json()
+    payload = client.get('/get_stats', query_string=STATS).get_json()
+    expected = _compact(payload, codes)
+
+    compact = client.get('/get_stats', query_string=STATS,
+                         headers={'Accept': 'application/vnd.trading-ai.compact+json'})
+    assert compact.headers['Content-Type'] == 'application/vnd.trading-ai.compact+json'
+    assert [{key: entry[key] for key in expected[0]} for entry in compact.get_json()['history']['signals']] == expected
+
+    packed = client.get('/get_stats', query_string=dict(STATS, format='msgpack'))
+    assert packed.headers['Content-Type'] == 'application/msgpack'
+    assert msgpack.unpackb(packed.data) == compact.get_json()
+
+
+def test_format_parameter_wins_over_accept(client):
+    response = client.get('/get_stats', query_string=dict(STATS, format='json'),
+                          headers={'Accept': 'application/msgpack'})
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.get_json() == client.get('/get_stats', query_string=STATS).get_json()
+    response = client.get('/get_stats', query_string=STATS, headers={'Accept': 'application/x-msgpack, */*;q=0.1'})
+    assert response.headers['Content-Type'] == 'application/msgpack'
+    assert response.headers['Vary'] == 'Accept, Accept-Encoding'
+
+
+def test_fields_keep_only_the_listed_paths(client):
+    payload = client.get('/get_stats', query_string=STATS).get_json()
+    response = client.get('/get_stats', query_string=dict(
+        STATS, fields='total_predictions,history.signals.signal,history.signals.no_such_field,no_such_field'))
+    assert response.get_json() == {
+        'total_predictions': payload['total_predictions'],
+        'history': {'signals': [{'signal': entry['signal']} for entry in payload['history']['signals']]}
+    }
+    compact = client.get('/get_stats', query_string=dict(STATS, format='compact', fields='history.signals.signal_mask'))
+    assert set(compact.get_json()['history']['signals'][0]) == {'signal_mask'}
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(client):
+    plain = client.get('/get_stats', query_string=STATS)
+    assert len(plain.data) >= ai_model_api_fixed.RESPONSE_GZIP_MIN_BYTES and 'Content-Encoding' not in plain.headers
+    zipped = client.get('/get_stats', query_string=STATS, headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(zipped.data)) == plain.get_json()
+    small = client.get('/get_stats', query_string=dict(STATS, fields='total_predictions'),
+                       headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from shared_state import OWNER, SharedAccuracyTracker, SharedSignalHistory, SharedStateFile
+
+SLOTS = 4
+CAPACITY = 64
+DECISIONS = ('HOLD', 'BUY_CE', 'BUY_PE')
+SIGNALS = ('rsi_oversold', 'ema_bullish')
+
+fork = multiprocessing.get_context('fork')
+
+
+def _open(path, slots=SLOTS):
+    shared = SharedStateFile(path, slots, CAPACITY, weight_count=3)
+    return shared, SharedAccuracyTracker(shared), SharedSignalHistory(shared, DECISIONS, SIGNALS)
+
+
+def _work(path, outcomes, decisions, slots=SLOTS):
+    """A worker recording outcomes and decisions in its own slot"""
+    _, tracker, history = _open(path, slots)
+    for correct in outcomes:
+        tracker.record(correct)
+    for index in range(decisions):
+        history.append(float(index), index % 3, 0.5, 1.0, 1, 25000.0, 14.0, 40.0, 0.0)
+
+
+def _run(target, *args):
+    process = fork.Process(target=target, args=args)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    return process
+
+
+def _run_together(*calls):
+    processes = [fork.Process(target=target, args=args) for target, args in calls]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    return processes
+
+
+def test_workers_counts_and_history_are_summed(tmp_path):
+    path = str(tmp_path / 'state')
+    _open(path)
+    processes = _run_together((_work, (path, [True, False, True], 10)),
+                              (_work, (path, [False] * 5, 7)))
+    shared, tracker, history = _open(path)
+    assert (tracker.correct, tracker.total) == (2, 8)
+    assert len(history) == 17
+    assert len(history.tail(100)) == 17
+    owners = sorted(int(owner) for owner in shared.counters[:, OWNER] if owner)
+    assert owners == sorted(process.pid for process in processes)
+
+
+def test_slot_of_an_exited_worker_is_reused_with_its_counts(tmp_path):
+    path = str(tmp_path / 'state')
+    first = _run(_work, path, [True, True], 3, 1)
+    second = _run(_work, path, [False], 2, 1)
+    shared, tracker, history = _open(path, 1)
+    assert int(shared.counters[0, OWNER]) == second.pid != first.pid
+    assert (tracker.correct, tracker.total) == (2, 3)
+    assert len(history) == 5
+
+
+def _publish(path, weights, published):
+    shared, _, _ = _open(path)
+    shared.publish_weights(lambda current: weights)
+    published.set()
+
+
+def _adopt(path, published, received):
+    shared, _, _ = _open(path)
+    published.wait(30)
+    version, weights = shared.read_weights()
+    shared.publish_weights(lambda current: current + 1)
+    received.put((version, weights.tolist()))
+
+
+def test_weights_published_by_one_worker_are_read_by_another(tmp_path):
+    path = str(tmp_path / 'state')
+    _open(path)
+    published = fork.Event()
+    received = fork.Queue()
+    _run_together((_adopt, (path, published, received)), (_publish, (path, [0.1, -0.2, 0.3], published)))
+    version, weights = received.get(timeout=30)
+    assert version == 2 and weights == [0.1, -0.2, 0.3]
+    version, weights = _open(path)[0].read_weights()
+    assert version == 4
+    assert np.allclose(weights, [1.1, 0.8, 1.3])
+
+
+def test_layout_change_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'state')
+    assert _open(path)[0].created
+    assert not _open(path)[0].created
+    assert SharedStateFile(path, SLOTS + 1, CAPACITY, weight_count=3).created
+    assert os.path.getsize(path) == SharedStateFile(path, SLOTS + 1, CAPACITY, weight_count=3).size
@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import ai_model_api_fixed
+from ai_model_api_fixed import SIGNAL_CODES, ProfessionalTradingAI
+from weight_profiles import DEFAULT_THRESHOLDS, ProfileStore
+
+PROFILES = {
+    'active': 'calm',
+    'profiles': {
+        'calm': {'pattern_weights': {'rsi_oversold': 0.9}, 'thresholds': {'max_vix': 16}},
+        'bold': {'pattern_weights': {'rsi_oversold': 1.4, 'vix_high': 0.0}, 'thresholds': {'min_confidence': 0.5}},
+        'never': {'thresholds': {'max_vix': 0}},
+    }
+}
+
+
+def _write(path, document):
+    """Replace the profiles file the way operators are told to: write aside, rename over"""
+    staging = f"{path}.tmp"
+    with open(staging, 'w') as profiles_file:
+        profiles_file.write(document if isinstance(document, str) else json.dumps(document))
+    os.replace(staging, path)
+
+
+@pytest.fixture
+def profiles_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'profiles.json')
+    _write(path, PROFILES)
+    monkeypatch.setattr(ai_model_api_fixed, 'WEIGHT_PROFILES_FILE', path)
+    monkeypatch.setattr(ai_model_api_fixed, 'WEIGHT_PROFILES_RELOAD_INTERVAL', 0.0)
+    monkeypatch.setattr(ai_model_api_fixed, 'SHADOW_SCORING_INTERVAL', 3600.0)  # the test scores by hand
+    return path
+
+
+def test_changed_profiles_file_is_picked_up(profiles_path, payloads):
+    engine = ProfessionalTradingAI()
+    assert engine.profile.name == 'calm'
+    assert engine.model_data['pattern_weights']['rsi_oversold'] == 0.9
+    assert engine.thresholds == {**DEFAULT_THRESHOLDS, 'max_vix': 16.0}
+
+    _write(profiles_path, dict(PROFILES, active='bold'))
+    engine.sync_weights()
+    assert engine.profile.name == 'bold'
+    assert engine.model_data['pattern_weights']['rsi_oversold'] == 1.4
+    assert engine.thresholds['min_confidence'] == 0.5 and engine.thresholds['max_vix'] == 18.0
+    reference = ProfessionalTradingAI(offline=True)
+    reference.set_pattern_weights({'rsi_oversold': 1.4, 'vix_high': 0.0})
+    assert np.array_equal(engine.signal_weights, reference.signal_weights)
+
+
+@pytest.mark.parametrize('document', [
+    '{"active": "calm", "profiles": ',
+    dict(PROFILES, active='missing'),
+    {'active': 'calm', 'profiles': {'calm': {'pattern_weights': {'rsi_oversld': 0.9}}}},
+    {'active': 'calm', 'profiles': {'calm': {'thresholds': {'max_vix': 'high'}}}},
+])
+def test_invalid_profiles_file_keeps_the_last_good_profile(profiles_path, document):
+    engine = ProfessionalTradingAI()
+    _write(profiles_path, document)
+    engine.sync_weights()
+    assert engine.profile.name == 'calm'
+    assert engine.model_data['pattern_weights']['rsi_oversold'] == 0.9
+    with pytest.raises(ValueError):
+        ProfileStore(profiles_path, engine.default_pattern_weights).load()
+
+
+def test_shadow_profiles_count_agreement_with_live_decisions(profiles_path, payloads):
+    _write(profiles_path, dict(PROFILES, shadows=['calm', 'never']))
+    engine = ProfessionalTradingAI()
+    live = [engine.professional_signal_generation(payload)['signal'] for payload in payloads[:200]]
+    live += [result['signal'] for result in engine.batch_signal_generation(payloads[200:400])]
+    engine.shadow.score()
+    stats = engine.shadow.stats()
+    assert stats['calm'] == {'scored': 400, 'agreement': 1.0,
+                             'decisions': {name: live.count(name) for name in SIGNAL_CODES}}
+    assert stats['never']['decisions'] == {'HOLD': 400, 'BUY_CE': 0, 'BUY_PE': 0}
+    assert stats['never']['agreement'] == round(live.count('HOLD') / 400, 3)
+    assert live.count('HOLD') < 400
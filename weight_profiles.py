@@ -0,0 +1,262 @@
+"""Versioned pattern_weights and decision threshold profiles
+
+WEIGHT_PROFILES_FILE names a JSON file of profiles, for example
+
+    {
+      "active": "2024-06-v3",
+      "shadows": ["2024-07-aggressive"],
+      "symbols": {"BANKNIFTY": {"active": "2024-06-bank"}},
+      "profiles": {
+        "2024-06-v3": {"pattern_weights": {"rsi_oversold": 0.9}, "thresholds": {"max_vix": 18}},
+        "2024-06-bank": {"thresholds": {"max_vix": 22}},
+        "2024-07-aggressive": {"thresholds": {"strong_strength": 1.6, "min_confidence": 0.7}}
+      }
+    }
+
+Profiles override the built-in weights and DEFAULT_THRESHOLDS. The model
+re-reads the file when it changes and swaps the active profile in whole.
+Writing the file elsewhere and renaming it over the old one keeps readers
+from seeing half a file.
+
+Shadow profiles never decide anything. ShadowScorer queues every scored
+prediction and a background thread scores the queue against all shadow
+profiles at once, as a fired-signal matrix times a profile x signal weight
+matrix, then logs the shadow decisions next to the live one on the
+'shadow_decisions' logger.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple, deque
+from operator import attrgetter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+shadow_logger = logging.getLogger('shadow_decisions')
+
+# Decision thresholds a profile may override
+DEFAULT_THRESHOLDS = {
+    'strong_strength': 2.0,  # |strength| above this with 4+ agreeing signals is a strong setup
+    'moderate_strength': 1.5,  # |strength| above this is a moderate setup
+    'max_vix': 18.0,  # no trades while VIX is above this
+    'min_confidence': 0.75,  # moderate setups below this confidence report 0.0
+}
+
+# Snapshot fields the decision reads besides the fired signals
+DECISION_FIELDS = ('rsi', 'vix', 'supertrend_status', 'aroon_status', 'writers_zone', 'writers_confidence')
+
+Profile = namedtuple('Profile', 'name pattern_weights thresholds tag')
+
+
+def _overrides(values, allowed, what, profile):
+    """Validate a profile's name -> number overrides"""
+    if not isinstance(values, dict):
+        raise ValueError(f"Profile {profile!r}: {what} must be an object")
+    unknown = set(values) - set(allowed)
+    if unknown:
+        raise ValueError(f"Profile {profile!r}: unknown {what} {', '.join(sorted(unknown))}")
+    for name, value in values.items():
+        if value.__class__ is bool or not isinstance(value, (int, float)) or value - value != 0:
+            raise ValueError(f"Profile {profile!r}: {what} {name} must be a finite number, got {value!r}")
+    return {name: float(value) for name, value in values.items()}
+
+
+def parse_profiles(document, default_weights, symbol=None):
+    """Active profile and shadow profiles for a symbol from a parsed profiles file"""
+    if not isinstance(document, dict) or not isinstance(document.get('profiles'), dict):
+        raise ValueError("Profiles file must be an object with a 'profiles' object")
+    selection = document
+    symbols = document.get('symbols') or {}
+    if symbol is not None and symbol in symbols:
+        selection = {'active': document.get('active'), 'shadows': document.get('shadows', []), **symbols[symbol]}
+
+    def profile(name):
+        spec = document['profiles'].get(name)
+        if not isinstance(spec, dict):
+            raise ValueError(f"Unknown profile {name!r}")
+        weights = _overrides(spec.get('pattern_weights', {}), default_weights, 'pattern_weights', name)
+        thresholds = _overrides(spec.get('thresholds', {}), DEFAULT_THRESHOLDS, 'thresholds', name)
+        # Tag identifies the profile's content, e.g. in the shared state file
+        canonical = json.dumps([name, weights, thresholds], sort_keys=True).encode()
+        tag = int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), 'little', signed=True)
+        return Profile(name, {**default_weights, **weights}, {**DEFAULT_THRESHOLDS, **thresholds}, tag)
+
+    shadows = selection.get('shadows') or []
+    if not isinstance(shadows, list):
+        raise ValueError("'shadows' must be a list of profile names")
+    return profile(selection.get('active')), [profile(name) for name in shadows]
+
+
+class ProfileStore:
+    """Profiles file that is re-read whenever it changes on disk"""
+
+    def __init__(self, path, default_weights, symbol=None, reload_interval=5.0):
+        self.path = path
+        self.default_weights = default_weights
+        self.symbol = symbol
+        self.reload_interval = reload_interval
+        self.next_check = 0.0
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """Read the file now; returns (active, shadows) or raises ValueError/OSError"""
+        stamp = self._stamp()
+        with open(self.path) as profiles_file:
+            document = json.load(profiles_file)
+        profiles = parse_profiles(document, self.default_weights, self.symbol)
+        self.stamp = stamp
+        return profiles
+
+    def poll(self):
+        """(active, shadows) when the file changed since the last load, else None
+
+        Checks the file at most once per reload_interval. A file that cannot be
+        read or validated is logged and skipped, keeping the current profiles.
+        """
+        now = time.monotonic()
+        if now < self.next_check or not self.lock.acquire(blocking=False):
+            return None
+        try:
+            self.next_check = now + self.reload_interval
+            try:
+                stamp = self._stamp()
+                if stamp == self.stamp:
+                    return None
+                self.stamp = stamp  # a bad file is reported once, not on every check
+                return self.load()
+            except (OSError, ValueError) as e:
+                logger.error(f"Keeping current weight profile, cannot load {self.path}: {e}")
+                return None
+        finally:
+            self.lock.release()
+
+
+class ShadowScorer:
+    """Scores queued predictions against every shadow profile off the request path"""
+
+    def __init__(self, rules, decide, decision_names, interval=1.0, max_pending=10000):
+        self.rules = rules
+        self.decide = decide  # (cols, strength, bullish, bearish, thresholds) -> (codes, confidence)
+        self.decision_names = decision_names
+        self.interval = interval
+        writers_names = {field[0] for field in rules.writers_fields}
+        categories = {field[0] for field in rules.technical_fields + rules.writers_fields if field[4] == 'category'}
+        scale_fields = tuple(field for field in rules.scale_fields if field is not None)
+        self.fields = [(name, name in writers_names, object if name in categories else np.float64)
+                       for name in dict.fromkeys(DECISION_FIELDS + scale_fields)]
+        self.scaled = [(code, field) for code, field in enumerate(rules.scale_fields) if field is not None]
+        self.bullish = np.array(rules.bullish)
+        self.bearish = np.array(rules.bearish)
+        self.state = ([], None, None)  # (profiles, profile x signal weights, threshold columns)
+        self.counts = {}  # profile name -> live x shadow decision counts
+
+        self.pending = deque(maxlen=max_pending)
+        self.lock = threading.Lock()
+        self.worker_pid = None
+
+    def set_profiles(self, profiles):
+        """Swap in a new list of shadow profiles"""
+        weights = np.array([self.rules.signed_weights(p.pattern_weights) for p in profiles]).reshape(
+            len(profiles), len(self.rules.signal_names))
+        thresholds = {name: np.array([p.thresholds[name] for p in profiles]) for name in DEFAULT_THRESHOLDS}
+        for profile in profiles:
+            self.counts.setdefault(profile.name, np.zeros((len(self.decision_names),) * 2, dtype=np.int64))
+        self.state = (profiles, weights, thresholds)
+
+    @property
+    def active(self):
+        return bool(self.state[0])
+
+    def submit(self, prediction_id, decision_code, fired_codes, market, writers):
+        """Queue one scored prediction for shadow scoring"""
+        self._ensure_worker()
+        self.pending.append((prediction_id, decision_code, fired_codes, market, writers))
+
+    def _ensure_worker(self):
+        """Start the scoring thread in this process (again after a fork)"""
+        pid = os.getpid()
+        if self.worker_pid != pid:
+            with self.lock:
+                if self.worker_pid != pid:
+                    self.pending.clear()
+                    self.worker_pid = pid
+                    threading.Thread(target=self._run, name='shadow-scorer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.score()
+            except Exception as e:
+                logger.error(f"Error scoring shadow profiles: {e}")
+
+    def score(self):
+        """Score everything queued against all shadow profiles in one pass"""
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        profiles, weights, thresholds = self.state
+        if not batch or not profiles:
+            return
+        count = len(batch)
+        fired = np.zeros((count, len(self.rules.signal_names)), dtype=bool)
+        for row, entry in enumerate(batch):
+            fired[row, entry[2]] = True
+        cols = {}
+        for name, in_writers, dtype in self.fields:
+            column = list(map(attrgetter(name), [entry[4 if in_writers else 3] for entry in batch]))
+            cols[name] = np.array(column, dtype=dtype)[:, None]  # broadcast against the profile axis
+
+        features = fired.astype(np.float64)
+        for code, field in self.scaled:
+            features[:, code] *= cols[field][:, 0]
+        # Fired-signal matrix times the profile weight matrix, accumulated column
+        # by column in rule order so each strength matches the live scalar sum
+        technical = self.rules.technical_count
+        tech_strength = np.zeros((count, len(profiles)))
+        writers_strength = np.zeros((count, len(profiles)))
+        for code in range(features.shape[1]):
+            term = features[:, code, None] * weights[:, code]
+            if code < technical:
+                tech_strength += term
+            else:
+                writers_strength += term
+        strength = tech_strength + writers_strength  # predictions x profiles
+        codes, confidence = self.decide(cols, strength, (fired @ self.bullish)[:, None],
+                                        (fired @ self.bearish)[:, None], thresholds)
+        codes = np.asarray(codes).reshape(count, len(profiles))
+
+        live = np.array([entry[1] for entry in batch])
+        for index, profile in enumerate(profiles):
+            np.add.at(self.counts[profile.name], (live, codes[:, index]), 1)
+        if shadow_logger.isEnabledFor(logging.INFO):
+            names = self.decision_names
+            for row, entry in enumerate(batch):
+                shadow_logger.info(json.dumps({
+                    'prediction_id': entry[0],
+                    'live': names[entry[1]],
+                    'shadows': {profile.name: [names[codes[row, index]], round(float(confidence[row, index]), 3)]
+                                for index, profile in enumerate(profiles)}
+                }))
+
+    def stats(self):
+        """Agreement with the live decisions per shadow profile"""
+        summary = {}
+        for profile in self.state[0]:
+            counts = self.counts[profile.name]
+            scored = int(counts.sum())
+            summary[profile.name] = {
+                'scored': scored,
+                'agreement': round(float(np.trace(counts)) / scored, 3) if scored else 0.0,
+                'decisions': dict(zip(self.decision_names, counts.sum(axis=0).tolist()))
+            }
+        return summary